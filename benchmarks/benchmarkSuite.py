@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+from datetime import datetime
+
+# Allow the benchmark to be run from the repository root: python benchmarks/benchmarkSuite.py
+benchmarkDirectoryPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmarkDirectoryPath))
+from modules import dataExtractor, extractionSchema, imagePreprocessing, ocrBackends, tesseractData
+import syntheticCorpus
+import PIL
+
+# Rendering and reading text layers need Wand (and ghostscript), without them those stages are skipped
+try:
+    from modules import pdfToTxt
+except ImportError as importError:
+    pdfToTxt = None
+    pdfToTxtImportError = str(importError).splitlines()[0]
+
+# Bump when the stages change so results from an older suite are not compared against
+suiteVersion = 1
+
+# A stage is flagged as a regression when it is this much slower than the baseline
+defaultRegressionThreshold = 0.15
+
+defaultResultsPath = os.path.join(benchmarkDirectoryPath, 'results', 'latest.json')
+defaultCorpusDirectoryPath = os.path.join(benchmarkDirectoryPath, 'corpus')
+
+# The fields extracted from the form documents
+formFields = [
+    {'name': 'policyNumber', 'type': 'between', 'start': 'Policy Number:', 'end': 'Name of Insured'},
+    {'name': 'insured', 'type': 'remaining', 'match': 'Name of Insured:'},
+    {'name': 'claimDate', 'type': 'remaining', 'match': 'Date of Claim:'},
+    {'name': 'smoker', 'type': 'question', 'question': 'Smoker?', 'answers': ['Yes', 'No'], 'checkStrings': ['[X]']}
+]
+
+
+# Returns the best time in seconds of a few runs of a function, and the result of the last run
+def timeStage(function, repeat):
+    bestSeconds = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        bestSeconds = seconds if bestSeconds is None else min(bestSeconds, seconds)
+    return bestSeconds, result
+
+
+# Returns the result of a stage: its time, the number of items (pages, documents, tables...) it ran over and the
+# time per item
+def getStageResult(seconds, items, itemName):
+    return {'seconds': seconds, 'items': items, 'itemName': itemName,
+            'millisecondsPerItem': seconds * 1000 / items if items else None}
+
+
+# Returns the name of the OCR backend to benchmark when none is given: tesseract when it is installed, otherwise the
+# fake backend so the rest of the pipeline can still be timed
+def getDefaultOcrBackendName():
+    if ocrBackends.pytesseract and shutil.which('tesseract'):
+        return 'pytesseract'
+    return 'fake'
+
+
+# Renders every page of the scanned documents with Wand, as scrapePdf does. Returns the pages as PIL images.
+def rasterizeDocuments(corpus, documentNames, resolution):
+    return [pdfToTxt.renderPdfPage(corpus[name]['path'], pageNumber, resolution)
+            for name in documentNames for pageNumber in range(corpus[name]['pages'])]
+
+
+# Reads the text layer of every page of the text documents
+def readTextLayers(corpus, documentNames, resolution):
+    return [pdfToTxt.getTextLayerPages(corpus[name]['path'], resolution)[1] for name in documentNames]
+
+
+# Returns the tables of the table documents, one per page
+def getTables(data):
+    tables = []
+    startIndex = 0
+    while True:
+        preLines = dataExtractor.getDataLinesMatchingString('Schedule of items', data, startIndex)
+        if not preLines:
+            return tables
+
+        # Data lines end with their line index, the headers and footer are searched for after the table title
+        titleIndex = preLines[-1][12]
+        postLines = dataExtractor.getDataLinesMatchingString('End of schedule', data, titleIndex)
+        firstHeader = dataExtractor.getDataLinesMatchingString('Item', data, titleIndex)
+        lastHeader = dataExtractor.getDataLinesMatchingString('Total', data, titleIndex)
+        tables.append(dataExtractor.getTableColumns(preLines, postLines, firstHeader, lastHeader,
+                                                    len(syntheticCorpus.tableColumns), data))
+        startIndex = (postLines or preLines)[-1][12] + 1
+
+
+# Extracts the form fields from the text of each document with the dataExtractor functions
+def extractFields(documentStrings):
+    records = []
+    for documentString in documentStrings:
+        records.append({
+            'policyNumber': dataExtractor.getTextBetweenStrings('Policy Number:', 'Name of Insured', documentString),
+            'insured': dataExtractor.getRemainingTextInString('Name of Insured:', documentString),
+            'claimDate': dataExtractor.getRemainingTextInString('Date of Claim:', documentString),
+            'smoker': dataExtractor.getQuestionAnswer('Smoker?', documentString, ['Yes', 'No'], ['[X]'])
+        })
+    return records
+
+
+# Runs every stage over the corpus and returns the results
+def runSuite(corpus, resolution, ocrBackendName, repeat):
+    stages = {}
+    imageDocuments = [name for name in corpus if corpus[name]['storage'] == 'image']
+    textDocuments = [name for name in corpus if corpus[name]['storage'] == 'text']
+    imagePageCount = sum(corpus[name]['pages'] for name in imageDocuments)
+
+    if pdfToTxt is None:
+        stages['rasterize'] = {'skipped': 'pdfToTxt could not be imported: ' + pdfToTxtImportError}
+    else:
+        try:
+            seconds, _ = timeStage(lambda: rasterizeDocuments(corpus, imageDocuments, resolution), 1)
+            stages['rasterize'] = getStageResult(seconds, imagePageCount, 'page')
+        except Exception as ex:
+            stages['rasterize'] = {'skipped': 'pages could not be rendered: ' + str(ex)}
+
+    if pdfToTxt is None:
+        stages['textLayer'] = {'skipped': 'pdfToTxt could not be imported: ' + pdfToTxtImportError}
+    elif not pdfToTxt.pymupdf:
+        stages['textLayer'] = {'skipped': 'PyMuPDF is not installed'}
+    else:
+        textPageCount = sum(corpus[name]['pages'] for name in textDocuments)
+        seconds, _ = timeStage(lambda: readTextLayers(corpus, textDocuments, resolution), repeat)
+        stages['textLayer'] = getStageResult(seconds, textPageCount, 'page')
+
+    # Pages are preprocessed and recognised from the images the scanned documents were made from, so these stages time
+    # the same pixels whether or not pdfs can be rendered here
+    pageImages = [image for name in imageDocuments
+                  for image in syntheticCorpus.getPageImages(name, corpus[name]['pageLines'])]
+    settings = imagePreprocessing.getPreprocessingSettings()
+    seconds, preprocessedImages = timeStage(
+        lambda: [imagePreprocessing.preprocessPageImage(image, settings) for image in pageImages], repeat)
+    stages['preprocess'] = getStageResult(seconds, len(pageImages), 'page')
+
+    ocrBackend = ocrBackends.getOcrBackend(ocrBackendName)
+    seconds, _ = timeStage(lambda: [ocrBackend.imageToData(image) for image in preprocessedImages], 1)
+    stages['ocr'] = getStageResult(seconds, len(preprocessedImages), 'page')
+
+    # The data stages run over the data tesseract would ideally give for every document, so they do not depend on
+    # tesseract being installed
+    documentData = [corpus[name]['data'] for name in corpus]
+    dataPageCount = sum(corpus[name]['pages'] for name in corpus)
+    seconds, dataArrays = timeStage(lambda: [dataExtractor.getTesseractDataAsArrays(data) for data in documentData],
+                                    repeat)
+    stages['getTesseractDataAsArrays'] = getStageResult(seconds, dataPageCount, 'page')
+
+    seconds, _ = timeStage(lambda: [dataExtractor.getTesseractDataAsColumns(data) for data in documentData], repeat)
+    stages['getTesseractDataAsColumns'] = getStageResult(seconds, dataPageCount, 'page')
+
+    tableData = [dataExtractor.getTesseractDataAsArrays(corpus[name]['data']) for name in corpus
+                 if corpus[name]['kind'] == 'table']
+    seconds, tables = timeStage(lambda: [table for data in tableData for table in getTables(data)], repeat)
+    stages['getTableColumns'] = getStageResult(seconds, len(tables), 'table')
+
+    anchors = ['Policy Number:', 'Name of Insured:', 'Date of Claim:', 'Smoker?']
+    seconds, _ = timeStage(lambda: [dataExtractor.getDataLinesMatchingStrings(anchors, data) for data in dataArrays],
+                           repeat)
+    stages['getDataLinesMatchingStrings'] = getStageResult(seconds, len(dataArrays), 'document')
+
+    # Extract the form fields from the text of every page of the form documents
+    documentStrings = [dataExtractor.getTesseractDataAsText(page)
+                       for name in corpus if corpus[name]['kind'] == 'form'
+                       for page in corpus[name]['data'].split(tesseractData.tesseractDataHeader)[1:]]
+    seconds, records = timeStage(lambda: extractFields(documentStrings), repeat)
+    stages['regexExtractors'] = getStageResult(seconds, len(documentStrings), 'page')
+
+    schema = extractionSchema.compileSchema(formFields)
+    seconds, schemaRecords = timeStage(lambda: [schema.extract(text) for text in documentStrings], repeat)
+    stages['extractionSchema'] = getStageResult(seconds, len(documentStrings), 'page')
+
+    if schemaRecords != records:
+        raise AssertionError('The extraction schema and the dataExtractor functions extracted different fields')
+
+    return stages
+
+
+# Returns the stages which are slower than the baseline by more than the threshold, as a dictionary of stage name to
+# how many times slower it is
+def getRegressions(results, baseline, threshold):
+    regressions = {}
+    for name, stage in results['stages'].items():
+        baselineStage = baseline.get('stages', {}).get(name, {})
+        if 'seconds' not in stage or not baselineStage.get('seconds'):
+            continue
+
+        ratio = stage['seconds'] / baselineStage['seconds']
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+# Prints the results of a run, compared with the baseline when there is one
+def printResults(results, baseline=None):
+    print('Benchmark suite ' + str(suiteVersion) + ' at ' + str(results['settings']['resolution']) + ' dpi with the '
+          + results['settings']['ocrBackend'] + ' OCR backend')
+
+    for name, stage in results['stages'].items():
+        if 'skipped' in stage:
+            print(name.ljust(30) + ' skipped, ' + stage['skipped'])
+            continue
+
+        line = (name.ljust(30) + format(stage['seconds'] * 1000, '10.2f') + 'ms  '
+                + format(stage['millisecondsPerItem'] or 0, '8.3f') + 'ms per ' + stage['itemName'])
+        baselineStage = (baseline or {}).get('stages', {}).get(name, {})
+        if baselineStage.get('seconds'):
+            line += '  ' + format(stage['seconds'] / baselineStage['seconds'], '.2f') + 'x baseline'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times each stage of scraping and extracting over a synthetic corpus')
+    parser.add_argument('--output', default=defaultResultsPath, help='the json file results are written to')
+    parser.add_argument('--baseline', help='a results file to compare against, regressions exit with status 1')
+    parser.add_argument('--threshold', type=float, default=defaultRegressionThreshold,
+                        help='the fraction slower than the baseline a stage must be to be a regression')
+    parser.add_argument('--corpus', default=defaultCorpusDirectoryPath, help='the directory the corpus is made in')
+    parser.add_argument('--resolution', type=int, default=200)
+    parser.add_argument('--ocr-backend', default=getDefaultOcrBackendName(), choices=ocrBackends.ocrBackendClasses)
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage, the fastest is kept')
+    arguments = parser.parse_args()
+
+    corpus = syntheticCorpus.getCorpus(arguments.corpus)
+    results = {
+        'suiteVersion': suiteVersion,
+        'corpusVersion': syntheticCorpus.corpusVersion,
+        'created': datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'pillow': PIL.__version__, 'numpy': getattr(imagePreprocessing.numpy, '__version__', None)},
+        'settings': {'resolution': arguments.resolution, 'ocrBackend': arguments.ocr_backend,
+                     'repeat': arguments.repeat},
+        'stages': runSuite(corpus, arguments.resolution, arguments.ocr_backend, arguments.repeat)
+    }
+
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline, 'r') as baselineFile:
+            baseline = json.load(baselineFile)
+        if (baseline.get('suiteVersion'), baseline.get('corpusVersion'), baseline.get('settings')) \
+                != (suiteVersion, syntheticCorpus.corpusVersion, results['settings']):
+            print('Warning: the baseline was run with a different suite, corpus or settings')
+
+    printResults(results, baseline)
+
+    os.makedirs(os.path.dirname(os.path.abspath(arguments.output)), exist_ok=True)
+    with open(arguments.output, 'w') as resultsFile:
+        json.dump(results, resultsFile, indent=2)
+    print('Results written to ' + arguments.output)
+
+    if baseline:
+        regressions = getRegressions(results, baseline, arguments.threshold)
+        for name, ratio in regressions.items():
+            print('Regression: ' + name + ' is ' + format(ratio, '.2f') + 'x slower than the baseline')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
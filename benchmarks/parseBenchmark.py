@@ -0,0 +1,79 @@
+import os
+import sys
+import random
+import timeit
+import tracemalloc
+
+# Allow the benchmark to be run from the repository root: python benchmarks/parseBenchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import dataExtractor, tesseractData
+
+# Size of the synthetic document
+totalPages = 50
+linesPerPage = 40
+wordsPerLine = 10
+
+
+# Returns synthetic tesseract data for a document, the same every run
+def getSyntheticData():
+    generator = random.Random(0)
+    pages = []
+
+    for page in range(totalPages):
+        rows = [tesseractData.tesseractDataHeader, '1\t1\t0\t0\t0\t0\t0\t0\t1700\t2200\t-1\t']
+        for line in range(linesPerPage):
+            for word in range(wordsPerLine):
+                text = ''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(generator.randint(1, 9)))
+                columns = [5, 1, 1, 1, line + 1, word + 1, 100 + word * 150, 100 + line * 50, 120, 40,
+                           generator.randint(50, 96), text]
+                rows.append('\t'.join(str(column) for column in columns))
+        pages.append('\n'.join(rows))
+
+    return '\n'.join(pages)
+
+
+# Returns the seconds a function takes to run, the best of a few repeats. Garbage collection stays on as it is in a
+# scrape, where it is part of the cost of parsing into many small lists.
+def getSeconds(function, repeat=5):
+    return min(timeit.repeat(function, setup='gc.enable()', number=1, repeat=repeat))
+
+
+# Returns the bytes a function allocates and keeps hold of in its result
+def getRetainedBytes(function):
+    tracemalloc.start()
+    result = function()
+    retainedBytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return retainedBytes
+
+
+# Returns the columns of a table of the synthetic data (the first page, its first line as the header)
+def getTable(data):
+    headers = data[0:wordsPerLine]
+    footerIndex = wordsPerLine * (linesPerPage - 1)
+    return dataExtractor.getTableColumns(headers[0:1], data[footerIndex:footerIndex + 1], headers[0:1],
+                                         headers[-1:], wordsPerLine, data)
+
+
+def main():
+    rawData = getSyntheticData()
+    arrays = dataExtractor.getTesseractDataAsArrays(rawData)
+    columns = dataExtractor.getTesseractDataAsColumns(rawData)
+
+    if getTable(arrays) != getTable(columns):
+        raise AssertionError('getTableColumns differs between the list and column representations')
+
+    print('Parsing ' + str(len(arrays)) + ' data lines (' + str(totalPages) + ' pages)')
+    for name, parse, data in (('getTesseractDataAsArrays', dataExtractor.getTesseractDataAsArrays, arrays),
+                              ('getTesseractDataAsColumns', dataExtractor.getTesseractDataAsColumns, columns)):
+        parseSeconds = getSeconds(lambda: parse(rawData))
+        retainedBytes = getRetainedBytes(lambda: parse(rawData))
+        tableSeconds = getSeconds(lambda: getTable(data))
+        print(name.ljust(28) + ' parse ' + format(parseSeconds * 1000, '8.2f') + 'ms'
+              + '  retained ' + format(retainedBytes / 1024 / 1024, '7.2f') + 'MB'
+              + '  getTableColumns ' + format(tableSeconds * 1000, '8.2f') + 'ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import random
+import shutil
+import timeit
+import difflib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Allow the benchmark to be run from the repository root: python benchmarks/preprocessBenchmark.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import imagePreprocessing, ocrBackends, customLogger
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+# Size of the synthetic page, a letter page at 200 dpi
+pageWidth = 1700
+pageHeight = 2200
+linesPerPage = 45
+
+# The preprocessing compared: the ImageEnhance chain and the numpy pipeline
+methods = (('enhance', {'method': 'enhance'}),
+           ('numpy', {'method': 'numpy'}),
+           ('numpy binarize', {'method': 'numpy', 'binarize': True}))
+
+
+# Returns a synthetic scanned page and the words on it, the same every run: dark text on an off white page with
+# scanner noise
+def getSyntheticPage():
+    generator = random.Random(0)
+    page = Image.new('RGB', (pageWidth, pageHeight), (236, 231, 220))
+    draw = ImageDraw.Draw(page)
+    pageWords = []
+
+    for line in range(linesPerPage):
+        words = [''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(generator.randint(2, 9)))
+                 for _ in range(10)]
+        draw.text((120, 100 + line * 44), ' '.join(words), fill=(35, 35, 60), font_size=28)
+        pageWords.extend(words)
+
+    noise = Image.effect_noise((pageWidth, pageHeight), 24).convert('RGB')
+    return Image.blend(page, noise, 0.15), pageWords
+
+
+# Returns the seconds a function takes to run, the best of a few repeats
+def getSeconds(function, repeat=5):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+# Returns the peak memory in bytes preprocessing a page took above the memory of holding the page, or None where it
+# can not be measured. Linux lets a process reset its peak resident memory (VmHWM) so only preprocessing is measured.
+# Run in a fresh worker process so each method is measured from the same starting point, with large allocations always
+# given back to the system when they are freed (see main) so the peak is the memory preprocessing actually held.
+def getPeakBytes(settings):
+    page = getSyntheticPage()[0]
+    try:
+        with open('/proc/self/clear_refs', 'w') as clearRefs:
+            clearRefs.write('5')
+    except OSError:
+        return None
+
+    residentBytes = customLogger.getResidentMemory()
+    preprocessed = imagePreprocessing.preprocessPageImage(page, settings)
+    with open('/proc/self/status', 'r') as status:
+        peakKilobytes = next(int(line.split()[1]) for line in status if line.startswith('VmHWM'))
+
+    del preprocessed
+    return peakKilobytes * 1024 - residentBytes
+
+
+# Returns the text tesseract reads from a page, or None when tesseract is not installed
+def getPageText(page):
+    if not shutil.which('tesseract') or not ocrBackends.pytesseract:
+        return None
+    return ocrBackends.pytesseract.image_to_string(page)
+
+
+def main():
+    # Glibc keeps freed memory for reuse once large blocks have been freed, which hides how much a method holds at once
+    os.environ['MALLOC_MMAP_THRESHOLD_'] = str(128 * 1024)
+    workerContext = multiprocessing.get_context('spawn')
+
+    page, pageWords = getSyntheticPage()
+    print('Preprocessing a ' + str(pageWidth) + 'x' + str(pageHeight) + ' page')
+
+    results = {}
+    for name, settings in methods:
+        settings = imagePreprocessing.getPreprocessingSettings(settings)
+        seconds = getSeconds(lambda: imagePreprocessing.preprocessPageImage(page, settings))
+        with ProcessPoolExecutor(max_workers=1, mp_context=workerContext) as executor:
+            peakBytes = executor.submit(getPeakBytes, settings).result()
+
+        results[name] = imagePreprocessing.preprocessPageImage(page, settings).convert('L')
+        print(name.ljust(16) + ' ' + format(seconds * 1000, '8.2f') + 'ms'
+              + '  peak memory ' + (customLogger.megabytes(peakBytes) if peakBytes is not None else 'unknown'))
+
+    # How far the numpy pipeline strays from the ImageEnhance chain, pixel by pixel
+    for name in results:
+        if name != 'enhance':
+            difference = ImageStat.Stat(ImageChops.difference(results['enhance'], results[name])).mean[0]
+            print(name.ljust(16) + ' mean pixel difference from enhance ' + format(difference, '.2f'))
+
+    # How many of the words on the page tesseract reads after each method
+    if getPageText(page) is None:
+        print('Tesseract is not installed, skipping the OCR comparison')
+        return
+
+    for name in results:
+        similarity = difflib.SequenceMatcher(None, pageWords, getPageText(results[name]).split()).ratio()
+        print(name.ljust(16) + ' OCR word accuracy ' + format(similarity * 100, '.1f') + '%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import os
+import json
+import random
+import time
+from PIL import Image, ImageDraw
+
+# Bump when the documents change so an old corpus on disk is generated again
+corpusVersion = 1
+
+# Pages are US letter, in pdf points
+pageWidthPoints = 612
+pageHeightPoints = 792
+
+# The resolution pages of scanned documents are drawn at, and the resolution the expected tesseract data is given at
+imageResolution = 150
+dataResolution = 200
+
+# The documents of the corpus: the kind of document, how its pages are stored ('text' as a text layer or 'image' as
+# scanned images) and its number of pages
+corpusDocuments = {
+    'textLayer': {'kind': 'form', 'storage': 'text', 'pages': 3},
+    'scanned': {'kind': 'form', 'storage': 'image', 'pages': 2},
+    'multiPage': {'kind': 'letter', 'storage': 'image', 'pages': 8},
+    'tableHeavy': {'kind': 'table', 'storage': 'image', 'pages': 3},
+    'largeDocument': {'kind': 'letter', 'storage': 'text', 'pages': 120}
+}
+
+# The words letters and forms are written with
+vocabulary = ('policy', 'claim', 'insured', 'amount', 'date', 'premium', 'cover', 'benefit', 'payment', 'account',
+              'address', 'holder', 'period', 'notice', 'renewal', 'excess', 'limit', 'schedule', 'section', 'terms')
+
+# The columns of the tables in table documents
+tableColumns = ('Item', 'Quantity', 'Price', 'Total')
+
+# The creation date written to pdfs, fixed so the files are the same every run
+corpusDate = time.gmtime(1577836800)
+
+fontSize = 11
+lineHeight = 16
+marginPoints = 54
+
+
+# Returns the words of a line as (text, left, top, width, height) in points, the width estimated from the text length.
+# With a spacing each word is centred in a column of that width, as in a table.
+def getLineWords(texts, left, top, spacing=None):
+    words = []
+    for index, text in enumerate(texts):
+        width = int(len(text) * fontSize * 0.55) + 1
+        wordLeft = left + index * spacing + (spacing - width) // 2 if spacing else left
+        words.append((text, wordLeft, top, width, fontSize))
+        if not spacing:
+            left = wordLeft + width + fontSize // 3
+    return words
+
+
+# Returns the pages of a document, each a list of lines of words (see getLineWords). The same every run.
+def getDocumentPages(name):
+    document = corpusDocuments[name]
+    generator = random.Random(name)
+    pages = []
+
+    for pageNumber in range(document['pages']):
+        lines = []
+        top = marginPoints
+
+        if document['kind'] == 'form':
+            fields = (('Policy Number:', str(generator.randint(100000, 999999))),
+                      ('Name of Insured:', generator.choice(('Jane Smith', 'John Brown', 'Alex Green'))),
+                      ('Date of Claim:', '0' + str(generator.randint(1, 9)) + '/0' + str(generator.randint(1, 9))
+                       + '/2020'),
+                      ('Smoker?', '[X] Yes [ ] No' if generator.random() < 0.5 else '[ ] Yes [X] No'))
+            for label, value in fields:
+                lines.append(getLineWords(label.split() + value.split(), marginPoints, top))
+                top += lineHeight * 2
+
+        if document['kind'] == 'table':
+            lines.append(getLineWords(['Schedule', 'of', 'items'], marginPoints, top))
+            top += lineHeight * 2
+            columnWidth = (pageWidthPoints - marginPoints * 2) // len(tableColumns)
+            lines.append(getLineWords(tableColumns, marginPoints, top, columnWidth))
+            top += lineHeight
+            for row in range(36):
+                quantity = generator.randint(1, 20)
+                price = generator.randint(1, 500)
+                lines.append(getLineWords([generator.choice(vocabulary), str(quantity), str(price),
+                                           str(quantity * price)], marginPoints, top, columnWidth))
+                top += lineHeight
+            lines.append(getLineWords(['End', 'of', 'schedule'], marginPoints, top))
+            top += lineHeight * 2
+
+        while top < pageHeightPoints - marginPoints - lineHeight:
+            lines.append(getLineWords([generator.choice(vocabulary) for _ in range(generator.randint(6, 11))],
+                                      marginPoints, top))
+            top += lineHeight
+
+        pages.append(lines)
+
+    return pages
+
+
+# Returns the tesseract data tesseract would ideally give for the pages of a document at dataResolution
+def getExpectedData(pages):
+    scale = dataResolution / 72
+    header = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+    pageData = []
+
+    for lines in pages:
+        rows = [header, '\t'.join(map(str, (1, 1, 0, 0, 0, 0, 0, 0, int(pageWidthPoints * scale),
+                                           int(pageHeightPoints * scale), -1, '')))]
+        for lineNumber, words in enumerate(lines, 1):
+            for wordNumber, (text, left, top, width, height) in enumerate(words, 1):
+                rows.append('\t'.join(map(str, (5, 1, 1, 1, lineNumber, wordNumber, int(left * scale),
+                                               int(top * scale), int(width * scale), int(height * scale), 95, text))))
+        pageData.append('\n'.join(rows))
+
+    return '\n'.join(pageData)
+
+
+# Returns an image of a page drawn at imageResolution, as a scanner would see it
+def getPageImage(lines, noise):
+    scale = imageResolution / 72
+    page = Image.new('RGB', (int(pageWidthPoints * scale), int(pageHeightPoints * scale)), (238, 234, 226))
+    draw = ImageDraw.Draw(page)
+
+    for words in lines:
+        for text, left, top, width, height in words:
+            draw.text((left * scale, top * scale), text, fill=(30, 30, 45), font_size=int(fontSize * scale))
+
+    return Image.blend(page, noise, 0.12)
+
+
+# Escapes text for a pdf string
+def getPdfString(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+# Writes a pdf whose pages are a text layer of the words of each page, in Helvetica. The file is written byte for byte
+# the same every run.
+def writeTextPdf(filePath, pages):
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    pageReferences = []
+
+    for lines in pages:
+        operations = []
+        for words in lines:
+            for text, left, top, width, height in words:
+                operations.append('BT /F1 ' + str(fontSize) + ' Tf ' + str(left) + ' '
+                                  + str(pageHeightPoints - top - fontSize) + ' Td ' + getPdfString(text) + ' Tj ET')
+        content = '\n'.join(operations)
+        objects.append('<< /Length ' + str(len(content)) + ' >>\nstream\n' + content + '\nendstream')
+        objects.append('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 ' + str(pageWidthPoints) + ' '
+                       + str(pageHeightPoints) + '] /Resources << /Font << /F1 3 0 R >> >> /Contents '
+                       + str(len(objects)) + ' 0 R >>')
+        pageReferences.append(str(len(objects)) + ' 0 R')
+
+    objects[1] = '<< /Type /Pages /Kids [' + ' '.join(pageReferences) + '] /Count ' + str(len(pages)) + ' >>'
+
+    contents = b'%PDF-1.4\n'
+    offsets = []
+    for number, pdfObject in enumerate(objects, 1):
+        offsets.append(len(contents))
+        contents += (str(number) + ' 0 obj\n' + pdfObject + '\nendobj\n').encode('latin-1')
+
+    crossReference = len(contents)
+    contents += ('xref\n0 ' + str(len(objects) + 1) + '\n0000000000 65535 f \n'
+                 + ''.join(str(offset).zfill(10) + ' 00000 n \n' for offset in offsets)
+                 + 'trailer\n<< /Size ' + str(len(objects) + 1) + ' /Root 1 0 R >>\nstartxref\n'
+                 + str(crossReference) + '\n%%EOF\n').encode('latin-1')
+
+    with open(filePath, 'wb') as pdfFile:
+        pdfFile.write(contents)
+
+
+# Returns images of the pages of a scanned document, drawn with the same scanner noise on every page
+def getPageImages(name, pages):
+    size = (int(pageWidthPoints * imageResolution / 72), int(pageHeightPoints * imageResolution / 72))
+    noise = Image.frombytes('L', size, random.Random(name).randbytes(size[0] * size[1])).convert('RGB')
+    return [getPageImage(lines, noise) for lines in pages]
+
+
+# Writes a pdf whose pages are scanned images
+def writeImagePdf(filePath, images):
+    images[0].save(filePath, 'PDF', resolution=imageResolution, save_all=True, append_images=images[1:],
+                   creationDate=corpusDate, modDate=corpusDate)
+
+
+# Generates the corpus in a directory, unless it is already there at the current version.
+# Returns a dictionary of document name to its description with its pdf 'path', expected tesseract 'data' and the
+# 'pageLines' of words on each page.
+def getCorpus(corpusDirectoryPath):
+    os.makedirs(corpusDirectoryPath, exist_ok=True)
+    manifestPath = os.path.join(corpusDirectoryPath, 'corpus.json')
+
+    manifest = {}
+    if os.path.exists(manifestPath):
+        with open(manifestPath, 'r') as manifestFile:
+            manifest = json.load(manifestFile)
+
+    isCurrent = manifest.get('version') == corpusVersion
+    corpus = {}
+    for name, document in corpusDocuments.items():
+        pages = getDocumentPages(name)
+        pdfPath = os.path.join(corpusDirectoryPath, name + '.pdf')
+
+        if not isCurrent or not os.path.exists(pdfPath):
+            if document['storage'] == 'text':
+                writeTextPdf(pdfPath, pages)
+            else:
+                writeImagePdf(pdfPath, getPageImages(name, pages))
+
+        corpus[name] = dict(document, path=pdfPath, data=getExpectedData(pages), pageLines=pages)
+
+    with open(manifestPath, 'w') as manifestFile:
+        json.dump({'version': corpusVersion, 'documents': corpusDocuments}, manifestFile, indent=2)
+
+    return corpus
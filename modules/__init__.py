@@ -1 +1,3 @@
-__all__ = ["customLogger", "dataExtractor", "pdfToTxt"]
+__all__ = ["adaptiveResolution", "anchorIndex", "batchScraper", "customLogger", "dataExtractor", "extractionSchema",
+           "folderWatcher", "formTemplates", "imagePreprocessing", "ocrBackends", "pageDedup", "pdfToTxt",
+           "renderCache", "renderStore", "searchIndex", "spatialIndex", "tesseractData"]
@@ -0,0 +1,107 @@
+from modules import tesseractData
+
+# The default settings of adaptive resolution:
+# 'firstPassResolution'       the resolution every page is scraped at first
+# 'minimumConfidence'         blocks of words with a lower average confidence are scraped again at the full resolution
+# 'maximumEscalatedFraction'  when more than this fraction of a page's words need scraping again, the whole page is
+#                             scraped again rather than each block
+defaultAdaptiveSettings = {'firstPassResolution': 100, 'minimumConfidence': 70, 'maximumEscalatedFraction': 0.5}
+
+# Pixels around a block, at the full resolution, included in its crop so the edges of its words are not cut off
+cropPadding = 12
+
+
+# Returns the settings of adaptive resolution, the default settings updated with any given settings
+def getAdaptiveSettings(settings=None):
+    return dict(defaultAdaptiveSettings, **(settings or {}))
+
+
+# Returns the rows of tesseract data split into columns, without the headers and blank lines
+def getDataRows(data):
+    return [line.split('\t') for line in data.split('\n')
+            if line and not line.startswith('level') and len(line.split('\t')) >= 12]
+
+
+# Returns a tuple of:
+# - a dictionary of block number to the left, top, right and bottom of each block of words with an average confidence
+#   below minimumConfidence
+# - the number of words in those blocks
+# - the number of words on the page
+def getLowConfidenceBlocks(data, minimumConfidence):
+    blocks = {}
+    for columns in getDataRows(data):
+        # Only words have a confidence, the rows of blocks, paragraphs and lines have -1
+        confidence = float(columns[10])
+        if columns[0] != '5' or confidence < 0 or not columns[11].strip():
+            continue
+
+        left, top, width, height = (int(column) for column in columns[6:10])
+        block = blocks.setdefault(int(columns[2]), [0, 0, left, top, left + width, top + height])
+        block[0] += 1
+        block[1] += confidence
+        block[2:] = min(block[2], left), min(block[3], top), max(block[4], left + width), max(block[5], top + height)
+
+    lowConfidenceBlocks = {}
+    escalatedWords = 0
+    for blockNumber, (words, confidence, left, top, right, bottom) in blocks.items():
+        if confidence / words < minimumConfidence:
+            lowConfidenceBlocks[blockNumber] = (left, top, right, bottom)
+            escalatedWords += words
+
+    return lowConfidenceBlocks, escalatedWords, sum(block[0] for block in blocks.values())
+
+
+# Returns the box of a block scaled to the full resolution and padded, kept within the page
+def getCropBox(box, scale, pageSize):
+    left, top, right, bottom = box
+    return (max(0, int(left * scale) - cropPadding), max(0, int(top * scale) - cropPadding),
+            min(pageSize[0], int(right * scale + 0.5) + cropPadding),
+            min(pageSize[1], int(bottom * scale + 0.5) + cropPadding))
+
+
+# Returns the tesseract data of a first pass with the blocks scraped again put in place of the first pass blocks.
+# The coordinates of the first pass are scaled up to the full resolution and the coordinates of each crop are moved to
+# where the crop is on the page. Blocks are numbered again in page order so the blocks of crops do not clash.
+# blockData is a dictionary of first pass block number to the data of its crop and the left and top of the crop.
+def mergeBlockData(data, scale, blockData, pageSize):
+    rows = [tesseractData.tesseractDataHeader, '\t'.join(['1', '1', '0', '0', '0', '0', '0', '0', str(pageSize[0]),
+                                                          str(pageSize[1]), '-1', ''])]
+    blockNumbers = {}
+    mergedBlocks = set()
+
+    def getBlockNumber(key):
+        if key not in blockNumbers:
+            blockNumbers[key] = len(blockNumbers) + 1
+        return str(blockNumbers[key])
+
+    for columns in getDataRows(data):
+        if columns[0] == '1':
+            continue
+
+        blockNumber = int(columns[2])
+        if blockNumber not in blockData:
+            columns[2] = getBlockNumber(('page', blockNumber))
+            columns[6:10] = [str(int(int(column) * scale + 0.5)) for column in columns[6:10]]
+            rows.append('\t'.join(columns))
+            continue
+
+        # The crop of a block replaces all of its rows, where its first row was
+        if blockNumber in mergedBlocks:
+            continue
+        mergedBlocks.add(blockNumber)
+
+        cropData, cropLeft, cropTop = blockData[blockNumber]
+        for cropColumns in getDataRows(cropData):
+            if cropColumns[0] == '1':
+                continue
+            cropColumns[2] = getBlockNumber(('crop', blockNumber, cropColumns[2]))
+            cropColumns[6] = str(int(cropColumns[6]) + cropLeft)
+            cropColumns[7] = str(int(cropColumns[7]) + cropTop)
+            rows.append('\t'.join(cropColumns))
+
+    return '\n'.join(rows) + '\n'
+
+
+# Returns the tesseract data of a first pass scaled up to the full resolution
+def scaleData(data, scale, pageSize):
+    return mergeBlockData(data, scale, {}, pageSize)
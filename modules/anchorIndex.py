@@ -0,0 +1,114 @@
+import re
+from array import array
+from bisect import bisect_left
+from modules import tesseractData
+
+
+# The text of every data line with spaces removed, concatenated into one string, with the offsets that map a position
+# in the string back to a data line. A phrase which spans several lines is found with a single search of the string.
+class AnchorIndex:
+    __slots__ = ('text', 'lineStarts', 'wordStarts', 'wordLines', 'wordEnds')
+
+    def __init__(self, lineTexts):
+        parts = []
+        offset = 0
+
+        # The offset each data line starts at
+        self.lineStarts = array('i')
+
+        # The start offset and data line of each line with text (empty lines can not start or end a match)
+        self.wordStarts = array('i')
+        self.wordLines = array('i')
+        self.wordEnds = set()
+
+        for lineIndex, lineText in enumerate(lineTexts):
+            lineText = lineText.replace(' ', '')
+            self.lineStarts.append(offset)
+
+            if lineText:
+                parts.append(lineText)
+                self.wordStarts.append(offset)
+                self.wordLines.append(lineIndex)
+                offset += len(lineText)
+                self.wordEnds.add(offset)
+
+        self.text = ''.join(parts)
+
+    # Returns the data line indexes of a match from its start and end offsets, or None if the match does not start at
+    # the start of a line and end at the end of a line
+    def getMatchLines(self, start, end):
+        if end not in self.wordEnds:
+            return None
+
+        first = bisect_left(self.wordStarts, start)
+        if first == len(self.wordStarts) or self.wordStarts[first] != start:
+            return None
+
+        return self.wordLines[first:bisect_left(self.wordStarts, end)].tolist()
+
+    # Returns the offset the search for a match after a data line index starts at
+    def getStartOffset(self, startIndex):
+        return self.lineStarts[startIndex] if startIndex < len(self.lineStarts) else len(self.text)
+
+    # Returns the data line indexes of the first sequence of lines after startIndex which match a string, ignoring
+    # spaces. Returns an empty list if there is no match.
+    def find(self, matchingString, startIndex=0):
+        matchingString = matchingString.replace(' ', '')
+        if not matchingString:
+            return []
+
+        start = self.text.find(matchingString, self.getStartOffset(startIndex))
+        while start != -1:
+            lines = self.getMatchLines(start, start + len(matchingString))
+            if lines is not None:
+                return lines
+            start = self.text.find(matchingString, start + 1)
+
+        return []
+
+    # Returns a dictionary of each matching string to the data line indexes of its first match after startIndex (see
+    # find). Every string is found in one pass over the text.
+    def findAll(self, matchingStrings, startIndex=0):
+        anchors = sorted({s.replace(' ', '') for s in matchingStrings if s.replace(' ', '')}, key=len, reverse=True)
+        anchorMatches = {}
+
+        if anchors:
+            # The anchors are alternatives in a lookahead so overlapping anchors are all seen. The longest anchor at a
+            # position is reported, so the anchors it starts with are checked at the same position.
+            expression = re.compile('(?=' + '|'.join('(' + re.escape(anchor) + ')' for anchor in anchors) + ')')
+            prefixes = [[other for other in anchors if other != anchor and anchor.startswith(other)]
+                        for anchor in anchors]
+
+            for match in expression.finditer(self.text, self.getStartOffset(startIndex)):
+                anchorIndex = match.lastindex - 1
+                for anchor in [anchors[anchorIndex]] + prefixes[anchorIndex]:
+                    if anchor in anchorMatches:
+                        continue
+                    lines = self.getMatchLines(match.start(), match.start() + len(anchor))
+                    if lines is not None:
+                        anchorMatches[anchor] = lines
+
+                # Stop as soon as every anchor has been found
+                if len(anchorMatches) == len(anchors):
+                    break
+
+        return {s: anchorMatches.get(s.replace(' ', ''), []) for s in matchingStrings}
+
+
+# Returns the anchor index of a document's data, building it on first use.
+# Typed data and the data lines of getTesseractDataAsArrays keep their index, so it is dropped with the data. Other
+# lists of lines are indexed every time. The data must not be changed once it has been indexed.
+def getAnchorIndex(data):
+    if isinstance(data, tesseractData.TesseractData):
+        if 'anchor' not in data.indexes:
+            data.indexes['anchor'] = AnchorIndex(data.columns[tesseractData.textColumn])
+        return data.indexes['anchor']
+
+    if not isinstance(data, tesseractData.DataLines):
+        return AnchorIndex(line[11] for line in data)
+
+    # Lines added to the list since it was indexed are indexed again
+    cached = data.indexes.get('anchor')
+    if not cached or cached[0] != len(data):
+        cached = data.indexes['anchor'] = (len(data), AnchorIndex(line[11] for line in data))
+    return cached[1]
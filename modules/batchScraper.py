@@ -0,0 +1,333 @@
+from modules import customLogger, pdfToTxt, renderCache, searchIndex, tesseractData
+import os
+import signal
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Documents with more pages than this are split into page ranges so a large document is shared between workers
+# rather than holding up a single worker while the others sit idle
+defaultPagesPerTask = 8
+
+
+# Sets up a worker process to scrape pages the same way as the process which started it.
+# With ignoreInterrupts the worker ignores SIGINT and SIGTERM, leaving the process which started it to decide when to
+# stop (eg. a folder watch finishing its batch, see folderWatcher).
+# A forked worker starts with a copy of the metrics of the process which started it, they are reset so the worker only
+# hands back the metrics of its own tasks.
+def initializeWorker(memoryBudget, ocrBackendName, preprocessingSettings, adaptiveSettings, templateSettings=None,
+                     dedupSettings=None, ignoreInterrupts=False):
+    customLogger.resetMetrics()
+    if ignoreInterrupts:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    pdfToTxt.setMemoryBudget(memoryBudget)
+    pdfToTxt.setOcrBackend(ocrBackendName)
+    pdfToTxt.setPreprocessing(preprocessingSettings)
+    pdfToTxt.setAdaptiveResolution(adaptiveSettings)
+    pdfToTxt.setFormTemplates(templateSettings)
+    pdfToTxt.setPageDedup(dedupSettings)
+
+
+# Writes the logs of a task run in a worker process and returns the metrics it collected, to be merged into the
+# metrics of the batch. Worker processes are not guaranteed to run exit handlers, so this is done after every task.
+def finishWorkerTask():
+    customLogger.flush()
+    return customLogger.takeMetrics()
+
+
+# A pool of worker processes set up to scrape the same way as the process which started it (see initializeWorker).
+# A pool can be kept across batches (eg. the batches of a folder watch, see folderWatcher), so each worker keeps its
+# OCR engine and page cache from one batch to the next. The workers are started on the first batch with the settings
+# of this process at the time, and started again after a worker dies.
+class WorkerPool:
+
+    def __init__(self, workers=None, memoryBudget=pdfToTxt.memoryBudget, ignoreInterrupts=False):
+        self.workers = workers
+        self.memoryBudget = memoryBudget
+        self.ignoreInterrupts = ignoreInterrupts
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    # Returns the executor of the pool, starting its worker processes if they are not running
+    def getExecutor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializeWorker,
+                                                initargs=(self.memoryBudget, pdfToTxt.ocrBackendName,
+                                                          pdfToTxt.preprocessingSettings, pdfToTxt.adaptiveSettings,
+                                                          pdfToTxt.templateSettings, pdfToTxt.dedupSettings,
+                                                          self.ignoreInterrupts))
+        return self.executor
+
+    # Stops the worker processes of the pool once their tasks are done
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+# Looks up a pdf in the render cache, returning a tuple of its cache key, whether it has already been rendered with
+# the same settings, its extract when it has and collectExtract is set, and its page count when it has not; or the
+# exception raised while reading it; and the metrics of the task. Without collectExtract a cached render is only
+# checked to exist, it is not read.
+# This runs inside a worker process so the pdfs of a batch are hashed and looked up in parallel, and one bad pdf can not
+# stop the batch.
+def lookupPdf(readerFilePath, settings, renderDirectoryPath, collectExtract=True):
+    try:
+        cacheKey = renderCache.getCacheKey(readerFilePath, settings)
+        renderCache.adoptLegacyRender(renderDirectoryPath, readerFilePath, cacheKey)
+        extract = None
+        if collectExtract:
+            renderFileContents = renderCache.readCacheEntry(renderDirectoryPath, cacheKey)
+            cached = bool(renderFileContents)
+            extract = renderFileContents.split('<data>') if cached else None
+        else:
+            cached = renderCache.hasCacheEntry(renderDirectoryPath, cacheKey)
+
+        pageCount = None if cached else pdfToTxt.getPdfPageCount(readerFilePath)
+        result = (cacheKey, cached, extract, pageCount), None
+    except Exception as ex:
+        customLogger.log(ex, 'error')
+        result = None, str(ex)
+    return result + (finishWorkerTask(),)
+
+
+# Scrapes a range of pages of a pdf, returning the page results or the exception raised while scraping, and the
+# metrics of the task. Each page is saved to the pdf's checkpoint as soon as it is scraped, so the page is kept if the
+# batch is stopped.
+# This runs inside a worker process so one bad pdf can not stop the batch.
+def scrapePageRange(readerFilePath, resolution, workingDirectory, firstPage, lastPage, checkpointDirectoryPath,
+                    debugImages=False):
+    try:
+        pageResults = []
+        for pageResult in pdfToTxt.iterPdfPages(readerFilePath, resolution, workingDirectory, firstPage, lastPage,
+                                                debugImages):
+            renderCache.writeCheckpointPage(checkpointDirectoryPath, pageResult)
+            pageResults.append(pageResult)
+        result = pageResults, None
+    except Exception as ex:
+        customLogger.log(ex, 'error')
+        result = None, str(ex)
+    return result + (finishWorkerTask(),)
+
+
+# Splits a list of page numbers into inclusive (firstPage, lastPage) ranges of consecutive pages, at most pagesPerTask
+# pages long
+def getPageRanges(pageNumbers, pagesPerTask):
+    pageRanges = []
+    for runFirstPage, runLastPage in pdfToTxt.getPageRuns(pageNumbers):
+        for firstPage in range(runFirstPage, runLastPage + 1, pagesPerTask):
+            pageRanges.append((firstPage, min(firstPage + pagesPerTask - 1, runLastPage)))
+    return pageRanges
+
+
+# Saves the render of a pdf from its page results and removes its checkpoint, returning its extract, or None without
+# collectExtract. The render is added to a search index when one is given (see searchIndex).
+def saveRender(readerFilePath, pageResults, renderDirectoryPath, cacheKey, resolution, checkpointDirectoryPath,
+               index=None, collectExtract=True):
+    pageResults = sorted(pageResults, key=lambda page: page['page'])
+    renderFileContents = None
+    metadata = pdfToTxt.getRenderMetadata(readerFilePath, resolution, pageResults)
+    if pdfToTxt.renderFormat == 'store':
+        renderCache.writeCacheStore(renderDirectoryPath, cacheKey, pageResults, metadata)
+    else:
+        renderFileContents = pdfToTxt.getRenderContents(pageResults)
+        renderCache.writeCacheEntry(renderDirectoryPath, cacheKey, renderFileContents, metadata)
+    renderCache.removeCheckpoint(checkpointDirectoryPath)
+    # A render which can not be indexed is still saved, it is indexed again at the end of the batch
+    if index:
+        try:
+            index.indexDocument(cacheKey, metadata['source'],
+                                [tesseractData.parseTesseractData(page['data']) for page in pageResults])
+        except Exception as ex:
+            customLogger.log(ex, 'error')
+    customLogger.log("Peak resident memory scraping '" + os.path.basename(readerFilePath) + "' was "
+                     + customLogger.megabytes(pdfToTxt.getPeakResidentMemory(pageResults)))
+    pdfToTxt.logEscalation(readerFilePath, resolution, pageResults)
+
+    if not collectExtract:
+        return None
+    return (renderFileContents or pdfToTxt.getRenderContents(pageResults)).split('<data>')
+
+
+# Scrapes a list of pdfs over a pool of worker processes.
+# The metrics the workers collect (see customLogger) are merged into the metrics of this process and summarised at the
+# end of the batch.
+# Each pdf is hashed and looked up in the render cache by the workers. Pdfs which have already been rendered with the
+# same settings are not scraped again, the cache is kept within cacheMaxBytes and cacheMaxAgeDays when they are given.
+# The remaining pdfs are split into page ranges which are scheduled largest document first so long documents start
+# early and small documents fill the gaps.
+# Scraped pages are saved to a checkpoint per pdf, so running the batch again after it is stopped resumes each pdf from
+# the pages it had scraped. Each worker renders pages within memoryBudget bytes (see pdfToTxt.memoryBudget) and
+# scrapes them with the OCR backend, preprocessing, adaptive resolution, form templates and page deduplication of this
+# process (see pdfToTxt.setOcrBackend, pdfToTxt.setPreprocessing, pdfToTxt.setAdaptiveResolution,
+# pdfToTxt.setFormTemplates and pdfToTxt.setPageDedup), keeping one engine and page cache for all its pages.
+# With ignoreInterrupts the workers ignore SIGINT and SIGTERM so the batch always finishes.
+# The batch is scraped by a pool of its own workers, or by the workers of a WorkerPool kept across batches when pool is
+# given, in which case workers, memoryBudget and ignoreInterrupts are those of the pool.
+# Each render is added to the search index of the render directory as it is saved when indexRenders is set, and the
+# index is brought up to date with the render directory at the end of the batch (see searchIndex).
+# Returns a tuple of:
+# - a dictionary of pdf path to its extract (the same split text and data getFileExtract returns). Without
+#   collectExtracts the extracts are not read or kept, so a batch of any size is not held in memory, and each pdf
+#   rendered maps to None.
+# - a dictionary of pdf path to the error that stopped it from being scraped
+def scrapePdfs(pdfPaths, workingDirectory, renderDirectoryName, resolution, workers=None,
+               pagesPerTask=defaultPagesPerTask, debugImages=False, cacheMaxBytes=None, cacheMaxAgeDays=None,
+               memoryBudget=pdfToTxt.memoryBudget, indexRenders=True, ignoreInterrupts=False, collectExtracts=True,
+               pool=None):
+    extracts = {}
+    failures = {}
+    cacheKeys = {}
+    pagesScraped = 0
+    pageMethods = Counter()
+    pdfsScraped = 0
+    batchStart = datetime.now()
+    renderDirectoryPath = pdfToTxt.getRenderDirectoryPath(workingDirectory, renderDirectoryName)
+    settings = pdfToTxt.getScrapeSettings(resolution)
+    index = searchIndex.SearchIndex(searchIndex.getSearchIndexPath(renderDirectoryPath)) if indexRenders else None
+
+    # A batch without a pool of its own starts worker processes for the batch alone
+    ownPool = pool is None
+    if ownPool:
+        pool = WorkerPool(workers, memoryBudget, ignoreInterrupts)
+
+    try:
+        executor = pool.getExecutor()
+
+        # Step 1: Look up each pdf in the render cache, counting the pages of those which have not been rendered
+        # so the work can be split into page ranges
+        pageCounts = {}
+        lookupFutures = {executor.submit(lookupPdf, path, settings, renderDirectoryPath, collectExtracts): path
+                         for path in pdfPaths}
+        for future in as_completed(lookupFutures):
+            path = lookupFutures[future]
+            lookup, error, metrics = future.result()
+            customLogger.mergeMetrics(metrics)
+
+            if error:
+                failures[path] = error
+                continue
+
+            cacheKeys[path], cached, extract, pageCount = lookup
+            if cached:
+                extracts[path] = extract
+            else:
+                pageCounts[path] = pageCount
+
+        customLogger.log(str(len(extracts)) + " / " + str(len(pdfPaths)) + " pdf's were already rendered")
+
+        # Step 2: Schedule the page ranges which are not in a checkpoint from an earlier run, largest documents
+        # first
+        pageFutures = {}
+        documentPages = {}
+        remainingTasks = {}
+        checkpointDirectoryPaths = {}
+        for path in sorted(pageCounts, key=pageCounts.get, reverse=True):
+            renderFilePath = renderCache.getCacheFilePath(renderDirectoryPath, cacheKeys[path])
+            checkpointDirectoryPaths[path] = renderCache.getCheckpointDirectoryPath(renderFilePath)
+            checkpointPages = renderCache.readCheckpointPages(checkpointDirectoryPaths[path])
+
+            if checkpointPages:
+                customLogger.log("Resuming scrape of " + os.path.basename(path) + " with "
+                                 + str(len(checkpointPages)) + " pages already scraped")
+            else:
+                renderCache.writeCheckpointManifest(checkpointDirectoryPaths[path],
+                                                    pdfToTxt.getRenderMetadata(path, resolution))
+
+            pageRanges = getPageRanges([n for n in range(pageCounts[path]) if n not in checkpointPages],
+                                       pagesPerTask)
+            documentPages[path] = list(checkpointPages.values())
+            remainingTasks[path] = len(pageRanges)
+
+            for firstPage, lastPage in pageRanges:
+                future = executor.submit(scrapePageRange, path, resolution, workingDirectory, firstPage, lastPage,
+                                         checkpointDirectoryPaths[path], debugImages)
+                pageFutures[future] = path
+
+            # Every page of the document was scraped by an earlier run
+            if not pageRanges:
+                extracts[path] = saveRender(path, documentPages.pop(path), renderDirectoryPath, cacheKeys[path],
+                                            resolution, checkpointDirectoryPaths[path], index, collectExtracts)
+
+        # Step 3: Collect the page results, saving each document once all of its pages are scraped
+        for future in as_completed(pageFutures):
+            path = pageFutures[future]
+
+            # Ignore the remaining pages of a document which has already failed
+            if future.cancelled() or path in failures:
+                continue
+
+            pageResults, error, metrics = future.result()
+            customLogger.mergeMetrics(metrics)
+
+            if error:
+                failures[path] = error
+
+                # Cancel the pages of the failed document which have not started yet
+                for pendingFuture, pendingPath in pageFutures.items():
+                    if pendingPath == path:
+                        pendingFuture.cancel()
+                continue
+
+            documentPages[path].extend(pageResults)
+            remainingTasks[path] -= 1
+
+            pagesScraped += len(pageResults)
+            pageMethods.update(pageResult['method'] for pageResult in pageResults)
+
+            if not remainingTasks[path]:
+                pdfsScraped += 1
+                extracts[path] = saveRender(path, documentPages.pop(path), renderDirectoryPath, cacheKeys[path],
+                                            resolution, checkpointDirectoryPaths[path], index, collectExtracts)
+
+                customLogger.log("Complete " + str(len(extracts) + len(failures)) + " / " + str(len(pdfPaths))
+                                 + " total Pdf's (" + os.path.basename(path) + ")")
+    except BrokenProcessPool as ex:
+        # A worker died (eg. it ran out of memory), every pdf which has not finished is marked as failed
+        customLogger.log(ex, 'error')
+        for path in pdfPaths:
+            if path not in extracts and path not in failures:
+                failures[path] = str(ex)
+
+        # The processes of a broken pool can not be used again, the next batch of a shared pool starts new ones
+        pool.close()
+    finally:
+        if ownPool:
+            pool.close()
+
+    for path, error in failures.items():
+        customLogger.log("Failed to scrape '" + os.path.basename(path) + "': " + error, 'error')
+    customLogger.increment('pdfs.failed', len(failures))
+    customLogger.increment('pdfs.scraped', pdfsScraped)
+
+    # Remove old renders to keep the cache within its limits
+    if cacheMaxBytes is not None or cacheMaxAgeDays is not None:
+        renderCache.evictCacheEntries(renderDirectoryPath, cacheMaxBytes, cacheMaxAgeDays)
+    renderCache.logCacheStats()
+
+    # Index the renders read from the cache and forget the renders which were evicted
+    if index:
+        added, removed = index.updateRenderDirectory(renderDirectoryPath)
+        customLogger.log("Search index updated, " + str(added) + " earlier renders added and " + str(removed)
+                         + " removed renders dropped")
+        index.close()
+
+    # Report the throughput of the batch
+    seconds = max((datetime.now() - batchStart).total_seconds(), 0.001)
+    customLogger.log("Scraped " + str(pagesScraped) + " pages from " + str(pdfsScraped)
+                     + " pdf's in " + customLogger.duration(batchStart)
+                     + " (" + format(pagesScraped / seconds, '.2f') + " pages/s, "
+                     + str(len(failures)) + " failed)")
+    if pdfToTxt.dedupSettings:
+        customLogger.log(str(pageMethods['dedup']) + " duplicate pages reused the text of pages already scraped and "
+                         + str(pageMethods['blank']) + " blank pages were skipped")
+    customLogger.logMetricsSummary()
+
+    return extracts, failures
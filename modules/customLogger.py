@@ -1,30 +1,334 @@
+import atexit
 import logging
+import os
+import json
+import queue
+import threading
+import time
+from array import array
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
-# Configures logging to a 'logs.log'
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s %(levelname)-8s %(message)s',
-                    datefmt='%m-%d %H:%M',
-                    filename='logs.log',
-                    filemode='a')
+# The file logs are saved to
+logFileName = 'logs.log'
+
+# The names of log levels
+levels = {'debug': logging.DEBUG, 'info': logging.INFO, 'error': logging.ERROR, 'fatal': logging.CRITICAL}
+
+# The lowest level saved to the log file and printed to the console, set with setVerbosity. A console level of None
+# prints nothing. Per page messages are logged at 'debug' so by default they are saved but not printed.
+fileLevel = 'debug'
+consoleLevel = 'info'
 
 logger = logging.getLogger('logger')
+logger.propagate = False
+
+# Log records are put on a queue by the thread logging them and written to the file and console by a listener thread,
+# so logging never waits on disk or console writes. Each process starts its own listener on its first log.
+logQueue = None
+logListener = None
+logListenerProcess = None
+
+# Counters and histograms of this process. Worker processes hand theirs back with takeMetrics to be merged into the
+# metrics of the process which started them.
+metricsLock = threading.Lock()
+counters = {}
+histograms = {}
+metricsStart = time.time()
+
+# The thread writing a periodic metrics summary, see startPeriodicSummary
+summaryThread = None
+summaryStop = threading.Event()
+
+
+# Puts log records on the log queue as they are, with any exception formatted now while its traceback exists
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Formats a log record for the console as just its message, the same as printing it
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        return record.getMessage()
+
+
+# Starts the log listener of this process if it has not been started
+def startLogging():
+    global logQueue, logListener, logListenerProcess
+    if logListenerProcess == os.getpid():
+        return
+
+    # Configures logging to a 'logs.log'
+    fileHandler = logging.FileHandler(logFileName, mode='a')
+    fileHandler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-8s %(message)s', datefmt='%m-%d %H:%M'))
+    fileHandler.setLevel(levels[fileLevel])
+    handlers = [fileHandler]
+
+    if consoleLevel:
+        consoleHandler = logging.StreamHandler()
+        consoleHandler.setFormatter(ConsoleFormatter())
+        consoleHandler.setLevel(levels[consoleLevel])
+        handlers.append(consoleHandler)
+
+    # The listener marks each record done once it is written, so flush can wait for the queue to empty
+    logQueue = queue.Queue()
+    logger.handlers = [LogQueueHandler(logQueue)]
+    logger.setLevel(min(handler.level for handler in handlers))
+
+    # A listener copied from a parent process by fork has no thread in this process
+    logListener = QueueListener(logQueue, *handlers, respect_handler_level=True)
+    logListener.start()
+    logListenerProcess = os.getpid()
+
+
+# Waits for every queued log record to be written and flushes the log file and console, leaving the log listener
+# running. Worker processes call this when they finish a task, as they are not guaranteed to run exit handlers.
+def flush():
+    if logListenerProcess == os.getpid():
+        logQueue.join()
+        for handler in logListener.handlers:
+            handler.flush()
+
+
+# Writes every queued log record and stops the log listener of this process. Logging again starts a new listener.
+def stopLogging():
+    global logListenerProcess
+    if logListenerProcess == os.getpid():
+        logListener.stop()
+        for handler in logListener.handlers:
+            handler.close()
+        logListenerProcess = None
+
+
+atexit.register(stopLogging)
+
+
+# Sets the lowest level of messages saved to the log file and printed to the console ('debug', 'info', 'error' or
+# 'fatal'). A console level of None prints nothing, so scraping does no console writes.
+def setVerbosity(console='info', file='debug'):
+    global consoleLevel, fileLevel
+    stopLogging()
+    consoleLevel = console
+    fileLevel = file
 
 
 # Saves the given text to a log file and prints it to the console
 def log(content, level='info'):
-    # log with the appropriate level
-    if level is 'info':
-        logger.info(content)
-    if level is 'error':
-        logger.error(content)
-    if level is 'fatal':
-        logger.fatal(content, exc_info=True)
+    startLogging()
 
-    # print the message to the console
-    print(content)
+    # log with the appropriate level, skipping messages no handler would write
+    logLevel = levels[level]
+    if logger.isEnabledFor(logLevel):
+        logger.log(logLevel, content, exc_info=level == 'fatal')
 
 
 # Returns a string duration of now from a given time
 def duration(startDuration):
-    return str(datetime.now() - startDuration)
\ No newline at end of file
+    return str(datetime.now() - startDuration)
+
+
+# Adds to a counter
+def increment(name, amount=1):
+    with metricsLock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+# Returns the value of a counter
+def getCounter(name):
+    return counters.get(name, 0)
+
+
+# Adds a value to a histogram
+def observe(name, value):
+    with metricsLock:
+        if name not in histograms:
+            histograms[name] = array('d')
+        histograms[name].append(value)
+
+
+# Times a block of code or a function, adding the seconds it takes to a histogram, eg.
+#   with customLogger.Timer('ocr'):
+#       ...
+# or as a decorator:
+#   @customLogger.Timer('ocr')
+class Timer:
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, function):
+        def timedFunction(*args, **kwargs):
+            with Timer(self.name):
+                return function(*args, **kwargs)
+        return timedFunction
+
+
+# Returns the metrics of this process and resets them, so metrics are only handed back once
+def takeMetrics():
+    with metricsLock:
+        metrics = {'counters': dict(counters),
+                   'histograms': {name: values.tolist() for name, values in histograms.items()}}
+        counters.clear()
+        histograms.clear()
+    return metrics
+
+
+# Adds metrics from another process (see takeMetrics) to the metrics of this process
+def mergeMetrics(metrics):
+    with metricsLock:
+        for name, value in metrics['counters'].items():
+            counters[name] = counters.get(name, 0) + value
+        for name, values in metrics['histograms'].items():
+            if name not in histograms:
+                histograms[name] = array('d')
+            histograms[name].extend(values)
+
+
+# Resets the metrics of this process
+def resetMetrics():
+    global metricsStart
+    with metricsLock:
+        counters.clear()
+        histograms.clear()
+        metricsStart = time.time()
+
+
+# Returns a value at a percentile of sorted values
+def getPercentile(sortedValues, percentile):
+    return sortedValues[min(len(sortedValues) - 1, int(len(sortedValues) * percentile / 100))]
+
+
+# Returns a summary of the metrics of this process: each counter with its rate per second since the metrics started,
+# and the count, total, mean, median, 95th percentile and maximum of each histogram
+def getMetricsSummary():
+    with metricsLock:
+        elapsed = max(time.time() - metricsStart, 1e-9)
+        summary = {'elapsedSeconds': elapsed, 'counters': {}, 'histograms': {}}
+
+        for name, value in sorted(counters.items()):
+            summary['counters'][name] = {'count': value, 'perSecond': value / elapsed}
+
+        for name, values in sorted(histograms.items()):
+            sortedValues = sorted(values)
+            if sortedValues:
+                summary['histograms'][name] = {
+                    'count': len(sortedValues), 'total': sum(sortedValues),
+                    'mean': sum(sortedValues) / len(sortedValues),
+                    'p50': getPercentile(sortedValues, 50), 'p95': getPercentile(sortedValues, 95),
+                    'max': sortedValues[-1]}
+
+    return summary
+
+
+# Logs a summary of the metrics of this process
+def logMetricsSummary():
+    summary = getMetricsSummary()
+    for name, counter in summary['counters'].items():
+        log("Metric " + name + ": " + str(counter['count']) + " (" + format(counter['perSecond'], '.2f') + "/s)")
+    for name, histogram in summary['histograms'].items():
+        log("Metric " + name + ": " + str(histogram['count']) + " timed, mean "
+            + format(histogram['mean'] * 1000, '.1f') + "ms, p50 " + format(histogram['p50'] * 1000, '.1f')
+            + "ms, p95 " + format(histogram['p95'] * 1000, '.1f') + "ms, max " + format(histogram['max'] * 1000, '.1f')
+            + "ms")
+
+
+# Appends a summary of the metrics of this process to a json lines file
+def writeMetrics(filePath):
+    summary = dict(getMetricsSummary(), time=datetime.now().isoformat())
+    with open(filePath, 'a') as metricsFile:
+        metricsFile.write(json.dumps(summary) + '\n')
+
+
+# Logs a summary of the metrics every interval seconds from a background thread, and appends it to a json lines file
+# when one is given, until stopPeriodicSummary is called
+def startPeriodicSummary(interval, filePath=None):
+    global summaryThread
+    stopPeriodicSummary()
+    summaryStop.clear()
+
+    def summarize():
+        while not summaryStop.wait(interval):
+            logMetricsSummary()
+            if filePath:
+                writeMetrics(filePath)
+
+    summaryThread = threading.Thread(target=summarize, name='metricsSummary', daemon=True)
+    summaryThread.start()
+
+
+# Stops the periodic metrics summary
+def stopPeriodicSummary():
+    global summaryThread
+    if summaryThread:
+        summaryStop.set()
+        summaryThread.join()
+        summaryThread = None
+
+
+# Returns the resident memory of this process in bytes.
+# On linux this is the current resident memory, elsewhere it is the peak resident memory of the process so far.
+def getResidentMemory():
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        import sys
+        peakResidentMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes and mac reports bytes
+        return peakResidentMemory if sys.platform == 'darwin' else peakResidentMemory * 1024
+    except ImportError:
+        return 0
+
+
+# Returns the peak resident memory of this process in bytes since resetPeakResidentMemory was last called.
+# Where the peak can not be reset (anywhere but linux) this is the peak resident memory of the process so far.
+def getPeakResidentMemory():
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+
+    try:
+        import resource
+        import sys
+        peakResidentMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes and mac reports bytes
+        return peakResidentMemory if sys.platform == 'darwin' else peakResidentMemory * 1024
+    except ImportError:
+        return 0
+
+
+# Resets the peak resident memory of this process to its current resident memory, so the peak of a long running
+# process can be taken for each task it runs. Returns whether the peak could be reset, which needs linux.
+def resetPeakResidentMemory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clearRefs:
+            clearRefs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# Returns a string of a number of bytes in megabytes
+def megabytes(byteCount):
+    return format(byteCount / 1024 / 1024, '.1f') + 'MB'
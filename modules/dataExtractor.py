@@ -1,5 +1,5 @@
 import re
-from modules import customLogger
+from modules import anchorIndex, customLogger, spatialIndex, tesseractData
 
 
 # True if a string is an integer
@@ -78,32 +78,18 @@ def getQuestionAnswer(question, documentString, answers, checkStrings):
 
 # Returns a list of lines which sequentially match a given string.
 # By giving a startIndex, you can return the first match after the given index.
+# Spaces in the line text are ignored when matching, the data itself is not changed. The match is found with the
+# anchor index of the data (see anchorIndex), which is built on the first search of the data.
 def getDataLinesMatchingString(matchingString, data, startIndex=0):
-    # Strip the whitespace to ensure white spaces do not prevent matches
-    matchingString = matchingString.replace(' ', '')
-    lineMatches = []
-    matchCopy = matchingString
-
-    for line in data[startIndex:]:
-        # Do nothing if we find a match
-        if not matchCopy:
-            break
-        else:
-            # try find a match, if one is found we will add the matching line to our return list and remove that
-            # text from  our matching text
-            line[11] = line[11].replace(' ', '')
+    index = anchorIndex.getAnchorIndex(data)
+    return [data[i] for i in index.find(matchingString, startIndex)]
 
-            # As we are looking for a sequence of matching lines, we should ensure that the line we check matches the
-            # start of the remaining string.
-            if matchCopy.find(line[11]) is 0:
-                if line[11]:
-                    lineMatches.append(line)
-                    matchCopy = matchCopy.replace(line[11], '')
-            else:
-                lineMatches = []
-                matchCopy = matchingString
 
-    return lineMatches
+# Returns a dictionary of each of a list of strings to the lines which match it (see getDataLinesMatchingString).
+# All of the strings are found in one pass over the data.
+def getDataLinesMatchingStrings(matchingStrings, data, startIndex=0):
+    index = anchorIndex.getAnchorIndex(data)
+    return {s: [data[i] for i in lines] for s, lines in index.findAll(matchingStrings, startIndex).items()}
 
 
 # Gets the right coordinate of a data line
@@ -116,9 +102,48 @@ def getBottomOfDataLine(line):
     return int(line[7]) + int(line[9])
 
 
-# Get the text contents of a table split by the column. All rows will be concat to the same string
+# Returns the left coordinates, widths and text of a range of data lines.
+# Typed data is sliced straight from its columns, data from getTesseractDataAsArrays is parsed.
+def getDataLineColumns(data, startIndex, endIndex):
+    if isinstance(data, tesseractData.TesseractData):
+        return data.columns[6][startIndex:endIndex], data.columns[8][startIndex:endIndex], \
+            data.columns[11][startIndex:endIndex]
+
+    lines = data[startIndex:endIndex]
+    return [int(line[6]) for line in lines], [int(line[8]) for line in lines], [line[11] for line in lines]
+
+
+# Returns the first and last (inclusive, 1 based) columns a line of text fits inside. If the text does not fit inside a
+# column the first column will be after the last.
+# A line fits a column when its left is on or after the column left and its right is on or before the column right.
+# The first column always passes the left check and the last column always passes the right check.
+def getLineColumnRange(lineLeft, lineRight, leftOfColumnOne, columnWidth, numberOfColumns):
+    # The last column whose left is on or before the line left, and the first column whose right is on or after the
+    # line right (ceiling division)
+    lastColumnLeftOfLine = (lineLeft - leftOfColumnOne) // columnWidth + 1
+    firstColumnRightOfLine = -((leftOfColumnOne - lineRight) // columnWidth)
+
+    firstColumn = max(1, min(numberOfColumns, firstColumnRightOfLine))
+    lastColumn = min(numberOfColumns, max(1, lastColumnLeftOfLine))
+    return firstColumn, lastColumn
+
+
+# Returns True if an index is in a skip index. A skip index is an inclusive [start, end] pair of indexes, or a list of
+# pairs to skip several ranges (eg. the repeated headers of a table which spans pages).
+def isSkippedIndex(index, skipIndex):
+    if not skipIndex:
+        return False
+    if not isinstance(skipIndex[0], (list, tuple)):
+        skipIndex = [skipIndex]
+    return any(skip[0] and skip[1] and skip[0] <= index <= skip[1] for skip in skipIndex)
+
+
+# Get the text contents of a table split by the column. All rows will be concat to the same string.
+# Every data line in the table is assigned to its column in a single pass over the line coordinates. A table which
+# spans pages can skip the repeated headers and footers between its pages by giving a list of skip index ranges.
 def getTableColumns(
-        preLines, postLines, ODFirstColumnHeader, ODLastColumnHeader, numberOfColumns, data, combineColumns=False, skipIndex=[]):
+        preLines, postLines, ODFirstColumnHeader, ODLastColumnHeader, numberOfColumns, data, combineColumns=False,
+        skipIndex=[]):
     # Null check, parameters should have values.
     if not preLines \
             or not postLines \
@@ -147,52 +172,57 @@ def getTableColumns(
 
     startIndex = ODLastColumnHeader[len(ODLastColumnHeader) - 1][12] + 1
     endIndex = postLines[0][12] - 1
-    tableRange = endIndex - startIndex
 
-    # This is the array which will contain table column text
-    tableText = '' if combineColumns else []
+    # Step 3: Assign the text of each data line in the table to the columns it fits inside
 
-    # Loop through the data rows which contain text in the table
-    for i in range(numberOfColumns):
+    columnTexts = [[] for _ in range(numberOfColumns)]
+    lineLefts, lineWidths, lineTexts = getDataLineColumns(data, startIndex, max(startIndex, endIndex))
 
-        # Step 3: Determine the left and right coordinates for the column iterate
+    for rowIndex, lineLeft, lineWidth, lineText in zip(range(startIndex, endIndex), lineLefts, lineWidths, lineTexts):
+        # If the row we are looping through has an index that matches our skip index, we will ignore it
+        if isSkippedIndex(rowIndex, skipIndex):
+            continue
 
-        columnNumber = i + 1
-        columnLeft = leftOfColumnOne + ((columnNumber - 1) * columnWidth)
-        columnRight = leftOfColumnOne + (columnNumber * columnWidth)
+        lineRight = lineLeft + lineWidth
 
-        # This is the string that will contain
-        columnText = ''
+        if columnWidth > 0:
+            firstColumn, lastColumn = getLineColumnRange(lineLeft, lineRight, leftOfColumnOne, columnWidth,
+                                                         numberOfColumns)
+        else:
+            # Columns without a width can not be binned, so test the line against each column
+            firstColumn, lastColumn = 1, 0
+            for columnNumber in range(1, numberOfColumns + 1):
+                columnLeft = leftOfColumnOne + ((columnNumber - 1) * columnWidth)
+                columnRight = leftOfColumnOne + (columnNumber * columnWidth)
+                if (columnNumber == 1 or lineLeft >= columnLeft) \
+                        and (columnNumber == numberOfColumns or lineRight <= columnRight):
+                    columnTexts[columnNumber - 1].append(lineText)
+
+        for columnNumber in range(firstColumn, lastColumn + 1):
+            columnTexts[columnNumber - 1].append(lineText)
+
+    # Step 4: Join the text of each column
+    if combineColumns:
+        tableText = ''
+        for texts in columnTexts:
+            tableText = (tableText + ' ' + ' '.join(texts).lstrip()).lstrip()
+        return tableText
 
-        # Loop for the number of data rows that contain the table text
-        for loopIndex in range(tableRange):
+    # Return all table data in their respective columns
+    return [' '.join(texts).lstrip() for texts in columnTexts]
 
-            # Step 4: Determine if the text of the data line is within the column. If true, add it to the column string
-            rowIndex = startIndex + loopIndex
 
-            # If the row we are looping through has an index that matches our skip index, we will ignore it
-            if skipIndex and skipIndex[0] and skipIndex[1]:
-                if skipIndex[0] <= rowIndex <= skipIndex[1]:
-                    continue
+# Returns the tables of a document for a list of tables, each a dictionary of getTableColumns arguments other than data
+def getTablesColumns(tables, data):
+    return [getTableColumns(data=data, **table) for table in tables]
 
-            # Define the left and right coordinates of the line
-            lineLeft = int(data[rowIndex][6])
-            lineRight = lineLeft + int(data[rowIndex][8])
 
-            # If the coordinates fit inside our column, add the text to our column string.
-            # The first column should always pass the left check and the last column should always pass the right check.
-            if (columnNumber is 1 or lineLeft >= columnLeft) and (columnNumber is numberOfColumns or lineRight <= columnRight):
-                columnText = columnText + ' ' + data[rowIndex][11]
-
-        # Once we have looped through the table text data lines, add the column text to our table text array
-        if combineColumns:
-            tableText = tableText + ' ' + columnText.lstrip()
-            tableText = tableText.lstrip()
-        else:
-            tableText.append(columnText.lstrip())
-
-    # Return all table data in their respective columns
-    return tableText
+# Returns the data lines on a page of typed data (see getTesseractDataAsColumns) which overlap a rectangular region.
+# Pages are 1 based. When contained is True, only lines entirely inside the region are returned.
+# The spatial index used to find the lines is built on first use and kept with the data.
+def getDataLinesInRegion(data, page, left, top, right, bottom, contained=False):
+    index = spatialIndex.getSpatialIndex(data)
+    return [data[i] for i in index.query(page, left, top, right, bottom, contained)]
 
 
 # Takes a tesseract data output and converts it to an array of pages containing an array of lines containing an
@@ -201,7 +231,7 @@ def getTableColumns(
 # [0]level [1]page_num [2]block_num [3]par_num [4]line_num [5]word_num [6]left [7]top [8]width [9]height [10]conf
 # [11]text [12] line_index
 def getTesseractDataAsArrays(data):
-    processedLines = []
+    processedLines = tesseractData.DataLines()
     index = 0
 
     # Split the file into an array of lines
@@ -234,3 +264,43 @@ def getTesseractDataAsArrays(data):
         processedLines.append(columns)
 
     return processedLines
+
+
+# Takes a tesseract data output and converts it to typed columns (see tesseractData.TesseractData).
+# This keeps the same lines as getTesseractDataAsArrays and each line can be indexed by the same column numbers, but
+# coordinates are parsed to integers once and the data takes a fraction of the memory.
+def getTesseractDataAsColumns(data):
+    return tesseractData.parseTesseractData(data)
+
+
+# Rebuilds the plain text tesseract would output for a page from its tesseract data, so a page only has to be
+# recognised once. Words are separated by a space, lines by a new line and paragraphs by a blank line.
+def getTesseractDataAsText(data):
+    paragraphs = []
+    lines = []
+    words = []
+    currentLine = None
+    currentParagraph = None
+
+    for columns in getTesseractDataAsArrays(data):
+        # [1]page_num [2]block_num [3]par_num identify the paragraph and [4]line_num the line within it
+        paragraph = (columns[1], columns[2], columns[3])
+        line = paragraph + (columns[4],)
+
+        if line != currentLine and words:
+            lines.append(' '.join(words))
+            words = []
+        if paragraph != currentParagraph and lines:
+            paragraphs.append('\n'.join(lines))
+            lines = []
+
+        currentLine = line
+        currentParagraph = paragraph
+        words.append(columns[11])
+
+    if words:
+        lines.append(' '.join(words))
+    if lines:
+        paragraphs.append('\n'.join(lines))
+
+    return '\n\n'.join(paragraphs)
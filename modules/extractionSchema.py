@@ -0,0 +1,163 @@
+import os
+import re
+from modules import customLogger, dataExtractor, renderCache, renderStore
+
+# The flags every field expression is compiled with, the same as getCleanRegexSearch
+searchFlags = re.M | re.I
+
+
+# A set of fields to extract from documents, compiled once and reused for every document.
+# Fields are dictionaries with a 'name', a 'type' and the arguments of the dataExtractor function of the same type:
+# - {'name': ..., 'type': 'between', 'start': ..., 'end': ...}                         see getTextBetweenStrings
+# - {'name': ..., 'type': 'remaining', 'match': ...}                                  see getRemainingTextInString
+# - {'name': ..., 'type': 'question', 'question': ..., 'answers': [...], 'checkStrings': [...]}  see getQuestionAnswer
+# The values extracted are the same as those functions return.
+class ExtractionSchema:
+
+    def __init__(self, fields):
+        self.fields = []
+        anchors = []
+
+        for field in fields:
+            # Each expression is kept with the group of its match which is returned
+            if field['type'] == 'between':
+                anchor = field['start']
+                expressions = [(re.compile(re.escape(field['start']) + '(.*?)' + re.escape(field['end']),
+                                           searchFlags | re.S), 1)]
+            elif field['type'] == 'remaining':
+                anchor = field['match']
+                expressions = [getRemainingTextExpression(field['match'])]
+            elif field['type'] == 'question':
+                anchor = field['question']
+                expressions = [getRemainingTextExpression(field['question']),
+                               getRemainingTextExpression(field['checkStrings']),
+                               (re.compile(dataExtractor.getArrayAsRegexOr(field['answers']) + '(.*)$',
+                                           searchFlags), 1)]
+            else:
+                raise ValueError("Unknown extraction field type '" + str(field['type']) + "' for " + field['name'])
+
+            # A field can be found after the first occurrence of any of its anchors
+            fieldAnchors = [a for a in (anchor if isinstance(anchor, list) else [anchor]) if a]
+            anchors.extend(fieldAnchors)
+            self.fields.append((field['name'], field['type'], expressions, fieldAnchors))
+
+        # Every anchor is found with one pass over a document. The anchors are alternatives inside a lookahead so
+        # overlapping anchors are all seen, longest first so an anchor which starts another is never hidden by it.
+        self.anchors = sorted(set(anchors), key=len, reverse=True)
+        self.anchorExpression = re.compile(
+            '(?=' + '|'.join('(' + re.escape(anchor) + ')' for anchor in self.anchors) + ')', searchFlags) \
+            if self.anchors else None
+
+        # The anchors which start each anchor. Where an anchor is found, these are found at the same position.
+        self.anchorPrefixes = [[j for j, other in enumerate(self.anchors) if j != i
+                                and anchor.lower().startswith(other.lower())] for i, anchor in enumerate(self.anchors)]
+
+    # Returns a dictionary of anchor to the position it is first found in a document
+    def getAnchorPositions(self, documentString):
+        positions = {}
+        if not self.anchorExpression:
+            return positions
+
+        for match in self.anchorExpression.finditer(documentString):
+            anchorIndex = match.lastindex - 1
+            for i in [anchorIndex] + self.anchorPrefixes[anchorIndex]:
+                positions.setdefault(self.anchors[i], match.start())
+
+            # Stop as soon as every anchor has been found
+            if len(positions) == len(self.anchors):
+                break
+
+        return positions
+
+    # Returns a record of field name to extracted value for a document
+    def extract(self, documentString):
+        positions = self.getAnchorPositions(documentString)
+        record = {}
+
+        for name, fieldType, expressions, fieldAnchors in self.fields:
+            anchorPositions = [positions[anchor] for anchor in fieldAnchors if anchor in positions]
+
+            # Skip the search when none of the field anchors are in the document
+            if fieldAnchors and not anchorPositions:
+                record[name] = None
+                continue
+
+            position = min(anchorPositions) if anchorPositions else 0
+            try:
+                if fieldType == 'question':
+                    record[name] = getQuestionAnswer(documentString, position, expressions)
+                else:
+                    expression, group = expressions[0]
+                    record[name] = getCleanMatch(expression.search(documentString, position), group)
+            except Exception as ex:
+                customLogger.log(ex, 'error')
+                record[name] = False
+
+        return record
+
+
+# Returns a compiled expression for the text after a string, or after any of a list of strings, and the group of its
+# match which is returned (see getRemainingTextInString)
+def getRemainingTextExpression(match):
+    isList = isinstance(match, list)
+    processedMatchText = dataExtractor.getArrayAsRegexOr(match) if isList else re.escape(match)
+    return re.compile(processedMatchText + '(.*)$', searchFlags), 0 if isList else 1
+
+
+# Returns a clean version of a match, the same as getCleanRegexSearch
+def getCleanMatch(match, group):
+    if match:
+        return match.group(group).lstrip().replace('\n', '')
+    return match
+
+
+# Returns the answer of a question field from its compiled question, check and answer expressions
+def getQuestionAnswer(documentString, position, expressions):
+    (questionExpression, questionGroup), (checkExpression, checkGroup), (answerExpression, answerGroup) = expressions
+
+    # Find the line of text containing your question
+    questionLine = getCleanMatch(questionExpression.search(documentString, position), questionGroup)
+    if not questionLine:
+        return None
+
+    # Get the remaining text of the first checkbox that is checked
+    checkText = getCleanMatch(checkExpression.search(questionLine), checkGroup)
+    if not checkText:
+        return None
+
+    # Find the answer for the checked box
+    return getCleanMatch(answerExpression.search(checkText), answerGroup)
+
+
+# Returns a compiled extraction schema for a list of fields
+def compileSchema(fields):
+    return ExtractionSchema(fields)
+
+
+# Extracts a schema from every render in a render directory.
+# Returns a dictionary of the cache key of each render to its record. Pdfs with the same name in different directories,
+# and a pdf rendered with different settings, have different cache keys so their records are kept apart. The pdf a
+# render was scraped from is in its metadata (see renderCache.readCacheMetadata).
+def extractRenderDirectory(schema, renderDirectoryPath):
+    records = {}
+
+    with os.scandir(renderDirectoryPath) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            cacheKey, extension = os.path.splitext(entry.name)
+            if not entry.is_file() or entry.name.startswith('.') or extension not in renderCache.renderFileExtensions:
+                continue
+
+            # A render saved in both formats is read once, from its render store
+            if renderCache.getCachedRenderPath(renderDirectoryPath, cacheKey) != entry.path:
+                continue
+
+            if extension == renderStore.renderStoreExtension:
+                with renderStore.RenderStore(entry.path) as render:
+                    documentString = render.getText()
+            else:
+                with open(entry.path, 'r') as renderFile:
+                    documentString = renderFile.read().split('<data>')[0]
+
+            records[cacheKey] = schema.extract(documentString)
+
+    return records
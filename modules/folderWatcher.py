@@ -0,0 +1,202 @@
+from modules import customLogger, pdfToTxt, renderCache
+import os
+import json
+import queue
+import signal
+import threading
+import time
+
+# Seconds between scans of the watched directories
+defaultScanInterval = 30
+
+# The most pdfs waiting to be scraped. When the queue is full, scanning waits for the scraper to catch up rather than
+# holding every new pdf in memory.
+defaultQueueSize = 64
+
+# The most pdfs scraped together in one batch (see batchScraper.scrapePdfs)
+defaultBatchSize = 8
+
+# Pdfs modified within this many seconds may still be being copied in, they are left for a later scan
+settleSeconds = 5
+
+
+# Returns the saved state of a watch: a dictionary of pdf path to the 'mtime' (in nanoseconds), 'size' and 'hash' of
+# the pdf when it was last scraped, and its 'error' if it failed
+def readWatchState(statePath):
+    if not os.path.exists(statePath):
+        return {}
+
+    with open(statePath, 'r') as stateFile:
+        return json.load(stateFile)
+
+
+# Saves the state of a watch (see readWatchState)
+def writeWatchState(statePath, state):
+    renderCache.writeFileAtomically(statePath, json.dumps(state))
+
+
+# Watches directories for new and changed pdfs and scrapes them as they arrive.
+# A scanner thread scans the directories every interval seconds and puts pdfs which are new or changed since they were
+# last scraped on a bounded queue; the thread calling run takes them off the queue in batches and scrapes them.
+# A pdf is only read to hash it when its modified time or size has changed, and only queued when its hash has changed.
+# The state is saved after each batch, so a pdf is scraped again after a restart only if its batch did not finish.
+class FolderWatcher:
+
+    def __init__(self, directories, statePath, recursive=True, interval=defaultScanInterval,
+                 queueSize=defaultQueueSize):
+        self.directories = directories
+        self.statePath = statePath
+        self.recursive = recursive
+        self.interval = interval
+        self.state = readWatchState(statePath)
+        self.queue = queue.Queue(maxsize=queueSize)
+
+        # Paths which are queued or being scraped, so a pdf is not queued twice
+        self.pending = set()
+        self.lock = threading.Lock()
+
+        # Set once to stop scanning and finish the queued pdfs, and again to stop after the current batch
+        self.stopping = threading.Event()
+        self.draining = True
+
+    # Stops the watch (see stopping). Used as the handler of SIGINT and SIGTERM.
+    def stop(self, signalNumber=None, frame=None):
+        if self.stopping.is_set():
+            self.draining = False
+            customLogger.log("Stopping after the current batch, queued pdf's will be scraped on the next run")
+        else:
+            self.stopping.set()
+            customLogger.log("Stopping, finishing the " + str(self.queue.qsize()) + " queued pdf's (stop again to "
+                             "stop after the current batch)")
+
+    # Returns the absolute paths of pdfs which are new or have a different modified time or size since they were last
+    # scraped, with their stat, and removes pdfs which no longer exist from the state
+    def getChangedPdfs(self):
+        changed = []
+        seen = set()
+        now = time.time()
+
+        for directory in self.directories:
+            for entry in pdfToTxt.iterPdfFileEntries(directory, self.recursive):
+                path = os.path.abspath(entry.path)
+                seen.add(path)
+                entryStat = entry.stat()
+                known = self.state.get(path)
+
+                if known and known['mtime'] == entryStat.st_mtime_ns and known['size'] == entryStat.st_size:
+                    continue
+                if now - entryStat.st_mtime < settleSeconds:
+                    continue
+                changed.append((path, entryStat))
+
+        with self.lock:
+            for path in set(self.state) - seen:
+                del self.state[path]
+
+        return changed
+
+    # Scans the directories once, queueing the pdfs whose contents have changed. Waits while the queue is full.
+    # Returns the number of pdfs queued.
+    def scan(self):
+        queued = 0
+        for path, entryStat in self.getChangedPdfs():
+            with self.lock:
+                if path in self.pending:
+                    continue
+
+            fileHash = renderCache.getFileHash(path)
+            stateEntry = {'mtime': entryStat.st_mtime_ns, 'size': entryStat.st_size, 'hash': fileHash}
+
+            # A pdf which was touched or copied over with the same contents is not scraped again
+            with self.lock:
+                known = self.state.get(path)
+                if known and known['hash'] == fileHash:
+                    known.update(stateEntry)
+                    continue
+                self.pending.add(path)
+
+            while not self.stopping.is_set():
+                try:
+                    self.queue.put((path, stateEntry), timeout=1)
+                    queued += 1
+                    customLogger.increment('watch.queued')
+                    break
+                except queue.Full:
+                    continue
+            else:
+                with self.lock:
+                    self.pending.discard(path)
+                break
+
+        return queued
+
+    # Scans the directories every interval seconds until the watch is stopped
+    def scanContinuously(self):
+        while not self.stopping.is_set():
+            try:
+                queued = self.scan()
+                if queued:
+                    customLogger.log("Queued " + str(queued) + " new or changed pdf's")
+            except Exception as ex:
+                customLogger.log(ex, 'error')
+            self.stopping.wait(self.interval)
+
+    # Returns up to batchSize queued pdfs, waiting up to timeout seconds for the first
+    def takeBatch(self, batchSize, timeout=1):
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < batchSize:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # Saves the state of a scraped batch. Failed pdfs keep their error and are not scraped again until they change.
+    def recordBatch(self, batch, failures):
+        with self.lock:
+            for path, stateEntry in batch:
+                self.state[path] = dict(stateEntry, error=failures[path]) if path in failures else stateEntry
+                self.pending.discard(path)
+            writeWatchState(self.statePath, self.state)
+
+    # Scrapes pdfs as they are queued until the watch is stopped and, unless it is stopped twice, the queue is empty.
+    # scrape is called with a list of pdf paths and returns the extracts and failures of batchScraper.scrapePdfs.
+    def run(self, scrape, batchSize=defaultBatchSize):
+        scanner = threading.Thread(target=self.scanContinuously, name='folderScanner', daemon=True)
+        scanner.start()
+
+        while not self.stopping.is_set() or (self.draining and (scanner.is_alive() or not self.queue.empty())):
+            batch = self.takeBatch(batchSize)
+            if not batch:
+                continue
+
+            extracts, failures = scrape([path for path, _ in batch])
+            self.recordBatch(batch, failures)
+
+        scanner.join()
+        with self.lock:
+            writeWatchState(self.statePath, self.state)
+
+
+# Watches directories and scrapes new and changed pdfs as they arrive until SIGINT (ctrl+c) or SIGTERM is received
+# (see FolderWatcher). The first signal stops scanning and finishes the queued pdfs, a second stops after the current
+# batch.
+def watchDirectories(directories, statePath, scrape, recursive=True, interval=defaultScanInterval,
+                     queueSize=defaultQueueSize, batchSize=defaultBatchSize):
+    watcher = FolderWatcher(directories, statePath, recursive, interval, queueSize)
+    previousHandlers = {signalNumber: signal.signal(signalNumber, watcher.stop)
+                        for signalNumber in (signal.SIGINT, signal.SIGTERM)}
+
+    customLogger.log("Watching " + ', '.join(directories) + " for pdf's every " + str(interval) + " seconds")
+    try:
+        watcher.run(scrape, batchSize)
+    finally:
+        for signalNumber, handler in previousHandlers.items():
+            signal.signal(signalNumber, handler)
+
+    customLogger.log("Stopped watching " + ', '.join(directories))
+    return watcher.state
@@ -0,0 +1,140 @@
+from modules import adaptiveResolution, dataExtractor, tesseractData
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from unidecode import unidecode
+
+# The default settings of form templates:
+# 'templates'            the form templates pages are matched against (see FormTemplate)
+# 'detectionResolution'  the resolution pages are scraped at to find the anchors of the templates. Anchors only need to
+#                        be read well enough to be found, so a fraction of the pixels of the full resolution are
+#                        scraped.
+# 'regionWorkers'        the number of regions of a page scraped at once. Regions are scraped on a pool of threads,
+#                        tesseract runs outside of python (as a process with pytesseract, or releasing the GIL with
+#                        tesserocr) so the regions are scraped in parallel.
+defaultTemplateSettings = {'templates': [], 'detectionResolution': 100, 'regionWorkers': 4}
+
+# The thread pools regions are scraped on by process and number of workers (see getRegionExecutor)
+regionExecutors = {}
+regionExecutorsLock = threading.Lock()
+
+
+# Returns the settings of form templates, the default settings updated with any given settings. The templates are
+# compiled to check them.
+def getTemplateSettings(settings=None):
+    settings = dict(defaultTemplateSettings, **(settings or {}))
+    compileTemplates(settings['templates'])
+    return settings
+
+
+# A known form layout: the anchors which identify it and the regions of the page to scrape, placed relative to them.
+# Templates are dictionaries of:
+# - 'name'     the name of the template, saved with each page scraped with it
+# - 'anchors'  strings which are all on a page of the form (matched ignoring spaces, see getDataLinesMatchingString)
+# - 'regions'  the regions to scrape, dictionaries of a 'name', the 'anchor' the region is placed from and the 'left',
+#              'top', 'right' and 'bottom' of the region in pdf points (1/72 inch) from the top left of the anchor.
+#              Regions the text of the page is extracted from by anchors (eg. getQuestionAnswer) should include the
+#              anchor.
+# eg. {'name': 'claim', 'anchors': ['Policy Number:'],
+#      'regions': [{'name': 'policy', 'anchor': 'Policy Number:', 'left': -4, 'top': -4, 'right': 300, 'bottom': 16}]}
+class FormTemplate:
+
+    def __init__(self, template):
+        self.name = template['name']
+        self.anchors = list(template['anchors'])
+        self.regions = []
+
+        for region in template['regions']:
+            if region['anchor'] not in self.anchors:
+                raise ValueError("Region '" + str(region.get('name')) + "' of form template '" + self.name
+                                 + "' is placed from '" + str(region['anchor']) + "' which is not one of its anchors")
+            if region['left'] >= region['right'] or region['top'] >= region['bottom']:
+                raise ValueError("Region '" + str(region.get('name')) + "' of form template '" + self.name
+                                 + "' is empty")
+            self.regions.append(dict(region))
+
+    # Returns the boxes (left, top, right, bottom) in pixels at a resolution of the regions of the template on a page,
+    # or None if any of the template anchors are not on the page. data is the typed tesseract data of the page scraped
+    # at detectionResolution (see tesseractData.parseTesseractData). Boxes are kept within pageSize.
+    def getRegionBoxes(self, data, detectionResolution, resolution, pageSize):
+        anchorPositions = {}
+        for anchor, lines in dataExtractor.getDataLinesMatchingStrings(self.anchors, data).items():
+            if not lines:
+                return None
+            anchorPositions[anchor] = (min(line[6] for line in lines) * 72 / detectionResolution,
+                                       min(line[7] for line in lines) * 72 / detectionResolution)
+
+        scale = resolution / 72
+        boxes = []
+        for region in self.regions:
+            anchorLeft, anchorTop = anchorPositions[region['anchor']]
+            boxes.append((max(0, int((anchorLeft + region['left']) * scale)),
+                          max(0, int((anchorTop + region['top']) * scale)),
+                          min(pageSize[0], int((anchorLeft + region['right']) * scale + 0.5)),
+                          min(pageSize[1], int((anchorTop + region['bottom']) * scale + 0.5))))
+        return boxes
+
+
+# Returns compiled form templates from a list of template dictionaries (see FormTemplate)
+def compileTemplates(templates):
+    return [FormTemplate(template) for template in templates]
+
+
+# Returns the first template which matches a page and the boxes of its regions at a resolution, or (None, None) if no
+# template matches. detectionData is the tesseract data of the page scraped at detectionResolution.
+def matchTemplate(templates, detectionData, detectionResolution, resolution, pageSize):
+    data = tesseractData.parseTesseractData(detectionData)
+    for template in templates:
+        boxes = template.getRegionBoxes(data, detectionResolution, resolution, pageSize)
+        if boxes is not None:
+            return template, boxes
+    return None, None
+
+
+# Returns the thread pool this process scrapes regions on with a number of workers. The pool is kept for the life of the
+# process, so an OCR backend which keeps an engine per thread (eg. tesserocr) loads it once per thread rather than once
+# per page. A forked process does not have the threads of its parent's pools, so pools are kept per process.
+def getRegionExecutor(workers=defaultTemplateSettings['regionWorkers']):
+    key = (os.getpid(), max(1, workers))
+    with regionExecutorsLock:
+        if key not in regionExecutors:
+            regionExecutors[key] = ThreadPoolExecutor(max_workers=key[1], thread_name_prefix='formRegion')
+        return regionExecutors[key]
+
+
+# Returns the tesseract data of the regions of a page, each region cropped from the page image, preprocessed with
+# preprocess when it is given and scraped on a thread of the region pool (see getRegionExecutor). The regions are put
+# in place on the page, so coordinates are the same as scraping the whole page. Regions which are off the page are
+# skipped.
+def getRegionData(image, boxes, ocrBackend, workers=defaultTemplateSettings['regionWorkers'], preprocess=None):
+    boxes = [(max(0, left), max(0, top), min(image.size[0], right), min(image.size[1], bottom))
+             for left, top, right, bottom in boxes]
+    boxes = [box for box in boxes if box[0] < box[2] and box[1] < box[3]]
+
+    def scrapeRegion(box):
+        region = image.crop(box)
+        if preprocess:
+            region = preprocess(region)
+        return unidecode(ocrBackend.imageToData(region))
+
+    regionData = list(getRegionExecutor(workers).map(scrapeRegion, boxes))
+    return mergeRegionData(regionData, boxes, image.size)
+
+
+# Returns the tesseract data of a page made of the data of its regions, each moved to where its region is on the page.
+# Blocks are numbered again in region order so the blocks of regions do not clash.
+def mergeRegionData(regionData, boxes, pageSize):
+    rows = [tesseractData.tesseractDataHeader, '\t'.join(['1', '1', '0', '0', '0', '0', '0', '0', str(pageSize[0]),
+                                                          str(pageSize[1]), '-1', ''])]
+    blockNumbers = {}
+
+    for region, (data, (left, top, right, bottom)) in enumerate(zip(regionData, boxes)):
+        for columns in adaptiveResolution.getDataRows(data):
+            if columns[0] == '1':
+                continue
+            columns[2] = str(blockNumbers.setdefault((region, columns[2]), len(blockNumbers) + 1))
+            columns[6] = str(int(columns[6]) + left)
+            columns[7] = str(int(columns[7]) + top)
+            rows.append('\t'.join(columns))
+
+    return '\n'.join(rows) + '\n'
@@ -0,0 +1,191 @@
+from PIL import Image, ImageEnhance
+
+# Install NumPy (https://numpy.org/install/) (optional)
+# Mac		- pip install numpy
+# Windows	- pip install numpy
+# When installed, pages are preprocessed as a single grey array rather than by a chain of full colour ImageEnhance
+# passes
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The default preprocessing of a page image before it is scraped:
+# 'method'      'numpy' to preprocess the grey page as an array, or 'enhance' for the chain of ImageEnhance passes
+# 'sharpness'   sharpness factor, 1.0 leaves the page as it is (the same as ImageEnhance.Sharpness)
+# 'contrast'    contrast factor, 1.0 leaves the page as it is (the same as ImageEnhance.Contrast)
+# 'binarize'    turn the page black and white with an Otsu threshold
+# 'deskew'      straighten pages scanned at an angle of up to maximumSkewAngle degrees
+defaultPreprocessingSettings = {'method': 'numpy', 'sharpness': 4.0, 'contrast': 2.0, 'binarize': False,
+                                'deskew': False}
+
+# Rows of a page sharpened at a time. Only a strip of this many rows is held as floats, the rest of the page stays as
+# bytes.
+sharpenStripRows = 128
+
+# The largest angle in degrees a page is straightened by, and the step between the angles tried
+maximumSkewAngle = 5.0
+skewAngleStep = 0.25
+
+# Pages are measured for skew at this size, which is plenty to see the lines of text
+skewMeasureSize = 800
+
+
+# Returns the settings of preprocessing, the default settings updated with any given settings.
+# The 'numpy' method falls back to 'enhance' when NumPy is not installed.
+def getPreprocessingSettings(settings=None):
+    settings = dict(defaultPreprocessingSettings, **(settings or {}))
+    if settings['method'] not in ('numpy', 'enhance'):
+        raise ValueError("Unknown preprocessing method '" + str(settings['method']) + "', choose numpy or enhance")
+    if settings['method'] == 'numpy' and numpy is None:
+        settings['method'] = 'enhance'
+    return settings
+
+
+# Returns a page image prepared for scraping
+def preprocessPageImage(image, settings=None):
+    settings = getPreprocessingSettings(settings)
+    if settings['method'] == 'enhance':
+        image = enhancePageImage(image, settings)
+    else:
+        image = sharpenContrastPageImage(image, settings)
+
+    if settings['deskew']:
+        image = deskewPageImage(image)
+    return image
+
+
+# Returns a page image enhanced with a Sharpness, Contrast and Color ImageEnhance pass, each making a full size copy of
+# the page. Binarizing uses the same threshold as the numpy method.
+def enhancePageImage(image, settings):
+    image = ImageEnhance.Sharpness(image).enhance(settings['sharpness'])
+    image = ImageEnhance.Contrast(image).enhance(settings['contrast'])
+    image = ImageEnhance.Color(image).enhance(0.0)
+
+    if settings['binarize']:
+        image = image.convert('L')
+        threshold = getOtsuThreshold(image.histogram())
+        image = image.point([0 if value <= threshold else 255 for value in range(256)])
+    return image
+
+
+# Returns a grey page image sharpened and contrasted as an array. The page is made grey first so every step works on
+# one byte per pixel, it is sharpened in place a strip of rows at a time, and contrast and binarizing are applied
+# together as a single lookup table.
+def sharpenContrastPageImage(image, settings):
+    grey = numpy.array(image.convert('L'))
+    sharpenArray(grey, settings['sharpness'])
+    sharpened = Image.fromarray(grey)
+
+    # Contrast stretches values away from the mean of the page
+    histogram = sharpened.histogram()
+    mean = int(sum(value * count for value, count in enumerate(histogram)) / max(grey.size, 1) + 0.5)
+    lookupTable = [min(255, max(0, round(mean + (value - mean) * settings['contrast']))) for value in range(256)]
+
+    if settings['binarize']:
+        # The histogram after contrast, without applying it to the page
+        contrastHistogram = [0] * 256
+        for value, count in enumerate(histogram):
+            contrastHistogram[lookupTable[value]] += count
+        threshold = getOtsuThreshold(contrastHistogram)
+        lookupTable = [0 if value <= threshold else 255 for value in lookupTable]
+
+    return sharpened.point(lookupTable)
+
+
+# Sharpens a grey page array in place, the same as ImageEnhance.Sharpness: a blend of the page and the page smoothed
+# with PIL's SMOOTH filter. Border pixels are left as they are, as PIL does.
+def sharpenArray(grey, factor):
+    height, width = grey.shape
+    if height < 3 or width < 3 or factor == 1.0:
+        return
+
+    # factor * page + (1 - factor) * smooth, where smooth is (5 * page + the 8 neighbours) / 13
+    pageWeight = factor + 5 * (1 - factor) / 13
+    neighbourWeight = (1 - factor) / 13
+
+    # The row above each strip, kept as it was before it was sharpened
+    aboveRow = grey[0].astype(numpy.float32)
+
+    for top in range(1, height - 1, sharpenStripRows):
+        bottom = min(top + sharpenStripRows, height - 1)
+        rows = bottom - top
+        window = numpy.empty((rows + 2, width), numpy.float32)
+        window[0] = aboveRow
+        window[1:] = grey[top:bottom + 1]
+        aboveRow = window[-2].copy()
+
+        strip = numpy.zeros((rows, width - 2), numpy.float32)
+        for rowOffset in (0, 1, 2):
+            for columnOffset in (0, 1, 2):
+                if rowOffset != 1 or columnOffset != 1:
+                    strip += window[rowOffset:rowOffset + rows, columnOffset:columnOffset + width - 2]
+        strip *= neighbourWeight
+        strip += window[1:-1, 1:-1] * pageWeight
+        strip += 0.5
+        numpy.clip(strip, 0, 255, out=strip)
+        grey[top:bottom, 1:-1] = strip
+
+
+# Returns the Otsu threshold of a 256 value histogram, the value which best separates dark ink from the light page
+def getOtsuThreshold(histogram):
+    total = sum(histogram)
+    valueTotal = sum(value * count for value, count in enumerate(histogram))
+
+    threshold = 0
+    bestVariance = -1
+    darkCount = 0
+    darkTotal = 0
+    for value in range(256):
+        darkCount += histogram[value]
+        darkTotal += value * histogram[value]
+        lightCount = total - darkCount
+        if not darkCount or not lightCount:
+            continue
+
+        darkMean = darkTotal / darkCount
+        lightMean = (valueTotal - darkTotal) / lightCount
+        variance = darkCount * lightCount * (darkMean - lightMean) ** 2
+        if variance > bestVariance:
+            bestVariance = variance
+            threshold = value
+
+    return threshold
+
+
+# Returns the angle in degrees a page is rotated by to make its lines of text level.
+# Small copies of the page are rotated through each angle, the angle whose rows are most sharply split between rows of
+# ink and blank rows (the largest variance of ink per row) is where the lines are level.
+def getSkewAngle(image):
+    small = image.convert('L')
+    small.thumbnail((skewMeasureSize, skewMeasureSize))
+    threshold = getOtsuThreshold(small.histogram())
+    ink = small.point([255 if value <= threshold else 0 for value in range(256)])
+
+    bestAngle = 0.0
+    bestVariance = -1
+    steps = int(maximumSkewAngle / skewAngleStep)
+    for step in range(-steps, steps + 1):
+        angle = step * skewAngleStep
+        rotated = ink.rotate(angle, resample=Image.NEAREST)
+
+        # Squash the page to one pixel wide, leaving the average ink of each row
+        rowInk = rotated.resize((1, rotated.size[1]), Image.BOX).tobytes()
+        mean = sum(rowInk) / len(rowInk)
+        variance = sum((value - mean) ** 2 for value in rowInk)
+
+        if variance > bestVariance:
+            bestVariance = variance
+            bestAngle = angle
+
+    return bestAngle
+
+
+# Returns a page image rotated so its lines of text are level
+def deskewPageImage(image):
+    angle = getSkewAngle(image)
+    if not angle:
+        return image
+
+    fill = 255 if image.mode == 'L' else (255, 255, 255)
+    return image.rotate(angle, resample=Image.BICUBIC, fillcolor=fill)
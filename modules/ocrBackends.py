@@ -0,0 +1,146 @@
+import abc
+import hashlib
+import random
+import threading
+import time
+from modules import tesseractData
+
+# Install tessaract (https://github.com/tesseract-ocr/tesseract/wiki)
+# Mac 		- brew install tessaract
+#			- pip install pytesseract
+# Windows 	- get 4.0.0 from https://github.com/UB-Mannheim/tesseract/wiki
+# 			- set tesseract as an envitonment variable
+#			- pip install pytesseract
+#
+# Useful code reference (the nuts and bolts of how this works)
+# https://github.com/nikhilkumarsingh/tesseract-python/blob/master/pdf_example.py
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Install tesserocr (https://github.com/sirfz/tesserocr) (optional)
+# Mac		- brew install tesseract
+#			- pip install tesserocr
+# Windows	- follow: https://github.com/sirfz/tesserocr#windows
+# Keeps tesseract and its language model loaded between pages rather than starting tesseract for every page
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# The backend pages are scraped with when no other backend is chosen
+defaultOcrBackendName = 'pytesseract'
+
+
+# A way of recognising the text in a page image.
+# Backends return tesseract data (the tsv output of tesseract, starting with its header) for a PIL image. A backend
+# which does not implement imageToData can not be created.
+class OcrBackend(abc.ABC):
+    # The name of the engine, saved in the scrape settings so renders from different engines are cached apart
+    engine = None
+
+    @abc.abstractmethod
+    def imageToData(self, image):
+        pass
+
+
+# Scrapes pages with the tesseract command line through pytesseract. Tesseract is started for every page.
+class PytesseractBackend(OcrBackend):
+    engine = 'tesseract'
+
+    def imageToData(self, image):
+        if not pytesseract:
+            raise ImportError('The pytesseract backend needs pytesseract, install it with: pip install pytesseract')
+        return pytesseract.image_to_data(image)
+
+
+# Scrapes pages with tesseract loaded into this process through tesserocr. Each thread keeps its own engine, which is
+# created on the first page it scrapes and reused for every page after, so the language model is loaded once.
+class TesserocrBackend(OcrBackend):
+    engine = 'tesserocr'
+
+    def __init__(self, language='eng'):
+        self.language = language
+        self.threadEngines = threading.local()
+
+    # Returns the engine of the current thread, creating it on first use
+    def getEngine(self):
+        if not tesserocr:
+            raise ImportError('The tesserocr backend needs tesserocr, install it with: pip install tesserocr')
+
+        engine = getattr(self.threadEngines, 'engine', None)
+        if engine is None:
+            engine = tesserocr.PyTessBaseAPI(lang=self.language)
+            self.threadEngines.engine = engine
+        return engine
+
+    def imageToData(self, image):
+        engine = self.getEngine()
+        engine.SetImage(image)
+
+        # The tsv of an engine has no header and numbers the page it is given, the first page is 1 like pytesseract
+        return tesseractData.tesseractDataHeader + '\n' + engine.GetTSVText(0)
+
+
+# Returns made up tesseract data without running tesseract, so scraping can be tested and benchmarked where tesseract
+# is not installed. The words of a page depend only on its pixels, so the same image always gives the same data.
+# A delay in seconds can be given to stand in for the time tesseract would take.
+class FakeBackend(OcrBackend):
+    engine = 'fake'
+
+    def __init__(self, linesPerPage=20, wordsPerLine=8, delay=0):
+        self.linesPerPage = linesPerPage
+        self.wordsPerLine = wordsPerLine
+        self.delay = delay
+
+    def imageToData(self, image):
+        if self.delay:
+            time.sleep(self.delay)
+
+        width, height = image.size
+        words = random.Random(hashlib.sha256(image.tobytes()).hexdigest())
+        lineHeight = max(height // (self.linesPerPage + 1), 1)
+        wordWidth = max(width // (self.wordsPerLine + 1), 1)
+
+        rows = [tesseractData.tesseractDataHeader, '\t'.join(map(str, (1, 1, 0, 0, 0, 0, 0, 0, width, height, -1, '')))]
+        for lineNumber in range(1, self.linesPerPage + 1):
+            top = lineNumber * lineHeight - lineHeight // 2
+            for wordNumber in range(1, self.wordsPerLine + 1):
+                left = wordNumber * wordWidth - wordWidth // 2
+                rows.append('\t'.join(map(str, (5, 1, 1, 1, lineNumber, wordNumber, left, top, wordWidth * 3 // 4,
+                                                lineHeight * 3 // 4, words.randint(60, 96),
+                                                'word' + str(words.randint(0, 9999)).zfill(4)))))
+
+        return '\n'.join(rows) + '\n'
+
+
+# The backends which can be chosen by name
+ocrBackendClasses = {
+    'pytesseract': PytesseractBackend,
+    'tesserocr': TesserocrBackend,
+    'fake': FakeBackend
+}
+
+# The backends created by this process, each is created once and reused for every page the process scrapes
+ocrBackends = {}
+
+
+# Adds a backend which can be chosen by name
+def registerOcrBackend(name, backendClass):
+    ocrBackendClasses[name] = backendClass
+    ocrBackends.pop(name, None)
+
+
+# Returns the class of a backend by name
+def getOcrBackendClass(name):
+    if name not in ocrBackendClasses:
+        raise ValueError("Unknown OCR backend '" + str(name) + "', choose from: " + ', '.join(ocrBackendClasses))
+    return ocrBackendClasses[name]
+
+
+# Returns the backend of this process by name, creating it on first use
+def getOcrBackend(name=defaultOcrBackendName):
+    if name not in ocrBackends:
+        ocrBackends[name] = getOcrBackendClass(name)()
+    return ocrBackends[name]
@@ -0,0 +1,105 @@
+from modules import customLogger, tesseractData
+from collections import OrderedDict
+import hashlib
+import json
+from PIL import Image, ImageStat
+
+# The default settings of page deduplication:
+# 'hashSize'         pages are hashed from a grid of hashSize by hashSize + 1 grey cells, two bits per neighbouring pair
+#                    of cells (a difference hash). A larger grid tells apart pages with smaller differences.
+# 'maximumDistance'  pages whose hashes differ by at most this many bits are duplicates, 0 only matches equal hashes.
+#                    Near duplicates reuse the text of the page they match, so a page differing only in a few words
+#                    (eg. a policy number) can match at a high distance.
+# 'maximumEntries'   the most pages kept in each process's cache, the least recently matched pages are dropped first
+# 'blankDeviation'   pages whose grey levels have a lower standard deviation are blank and are not scraped
+defaultDedupSettings = {'hashSize': 32, 'maximumDistance': 2, 'maximumEntries': 256, 'blankDeviation': 4.0}
+
+# The width blank pages are checked at, reducing the page averages out scanner noise
+blankCheckWidth = 128
+
+
+# Returns the settings of page deduplication, the default settings updated with any given settings
+def getDedupSettings(settings=None):
+    settings = dict(defaultDedupSettings, **(settings or {}))
+    if settings['hashSize'] < 2 or settings['maximumEntries'] < 1:
+        raise ValueError("Page deduplication needs a hashSize of at least 2 and a maximumEntries of at least 1")
+    return settings
+
+
+# Returns a key of the scrape settings pages are cached under, so pages scraped with other settings are not reused
+def getSettingsKey(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# Returns the difference hash of a page image as an integer: the page is reduced to a grid of grey cells and each pair
+# of bits is whether a cell is brighter and whether it is darker than the cell to its right. A difference hash usually
+# only keeps whether a cell is brighter, but on a white page that only marks where words start, so where they end is
+# kept too. Pages which look alike have hashes which differ in few bits.
+def getPageHash(image, hashSize=defaultDedupSettings['hashSize']):
+    cells = image.convert('L').resize((hashSize + 1, hashSize), Image.BOX).tobytes()
+
+    pageHash = 0
+    for row in range(0, len(cells), hashSize + 1):
+        for column in range(row, row + hashSize):
+            left, right = cells[column], cells[column + 1]
+            pageHash = (pageHash << 2) | ((left > right) << 1) | (left < right)
+    return pageHash
+
+
+# Returns the number of bits two page hashes differ in
+def getHashDistance(firstHash, secondHash):
+    return bin(firstHash ^ secondHash).count('1')
+
+
+# Returns whether a page image is blank, its grey levels barely varying
+def isBlankPage(image, blankDeviation=defaultDedupSettings['blankDeviation']):
+    grey = image.convert('L')
+    if grey.width > blankCheckWidth:
+        grey = grey.resize((blankCheckWidth, max(1, grey.height * blankCheckWidth // grey.width)), Image.BOX)
+    return ImageStat.Stat(grey).stddev[0] < blankDeviation
+
+
+# Returns the tesseract data of a blank page of a size, the page line tesseract gives a page with no words
+def getBlankPageData(pageSize):
+    return tesseractData.tesseractDataHeader + '\n' + '\t'.join(['1', '1', '0', '0', '0', '0', '0', '0',
+                                                                 str(pageSize[0]), str(pageSize[1]), '-1', '']) + '\n'
+
+
+# A cache of the tesseract data of pages already scraped by a process, by the hash of the page image. Pages are only
+# matched with pages of the same page key (the scrape settings and the page image size), as their data would not line
+# up otherwise. The cache holds at most maximumEntries pages, dropping the least recently matched.
+class PageCache:
+
+    def __init__(self, maximumEntries=defaultDedupSettings['maximumEntries'],
+                 maximumDistance=defaultDedupSettings['maximumDistance']):
+        self.maximumEntries = maximumEntries
+        self.maximumDistance = maximumDistance
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Returns the data of the cached page closest to a page hash within maximumDistance bits, or None
+    def get(self, pageHash, pageKey):
+        key = (pageHash, pageKey)
+        if key not in self.entries and self.maximumDistance:
+            distances = [(getHashDistance(pageHash, entryHash), (entryHash, entryKey))
+                         for entryHash, entryKey in self.entries if entryKey == pageKey]
+            distance, closestKey = min(distances, default=(None, None), key=lambda entry: entry[0])
+            if distance is not None and distance <= self.maximumDistance:
+                key = closestKey
+
+        if key not in self.entries:
+            return None
+
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    # Adds the data of a page to the cache, dropping the least recently matched pages beyond maximumEntries
+    def add(self, pageHash, pageKey, data):
+        self.entries[(pageHash, pageKey)] = data
+        self.entries.move_to_end((pageHash, pageKey))
+
+        while len(self.entries) > self.maximumEntries:
+            self.entries.popitem(last=False)
+            customLogger.increment('dedup.evictions')
@@ -1,10 +1,9 @@
-from modules import customLogger
+from modules import adaptiveResolution, customLogger, dataExtractor, formTemplates, imagePreprocessing, ocrBackends, \
+    pageDedup, renderCache, renderStore, tesseractData
 import sys
 import os
-from os import listdir
-from os.path import isfile, join
+from os.path import join
 from datetime import datetime
-import shutil
 
 # Install PIL (https://pypi.org/project/Unidecode/)
 # Mac		- pip install Unidecode
@@ -14,7 +13,7 @@ from unidecode import unidecode
 # Install PIL (https://pillow.readthedocs.io/en/5.1.x/installation.html)
 # Mac		- pip install Pillow
 # Windows	- pip install Pillow
-from PIL import Image, ImageEnhance
+from PIL import Image
 
 # Install Wand (http://docs.wand-py.org/en/0.4.4/guide/install.html)
 # Mac		- brew install imagemagick@6 (only v6 works with Wand)
@@ -23,21 +22,71 @@ from PIL import Image, ImageEnhance
 #			- pip install Wand
 #			- for pdf scraping install ghostscript: https://www.ghostscript.com/download/gsdnld.html
 from wand.image import Image as wi
-
-# Install tessaract (https://github.com/tesseract-ocr/tesseract/wiki)
-# Mac 		- brew install tessaract
-#			- pip install pytesseract
-# Windows 	- get 4.0.0 from https://github.com/UB-Mannheim/tesseract/wiki
-# 			- set tesseract as an envitonment variable
-#			- pip install pytesseract
-#
-# Useful code reference (the nuts and bolts of how this works)
-# https://github.com/nikhilkumarsingh/tesseract-python/blob/master/pdf_example.py
-import pytesseract
-
-
-# Define the directory name we will use to save temporary images we will be scraping
-tempImageDirectoryName = 'pdfImageConversions'
+from wand.color import Color
+from wand.resource import limits as wandLimits
+
+# Install PyMuPDF (https://pymupdf.readthedocs.io/en/latest/installation.html) (optional)
+# Mac		- pip install PyMuPDF
+# Windows	- pip install PyMuPDF
+# When installed, pages of a pdf which already contain text are read from their text layer instead of being scraped
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+
+# Define the directory name we will save page images to when debugging pdf conversions
+debugImageDirectoryName = 'pdfImageConversions'
+
+# The memory in bytes each process scraping pages should stay within. Pages are rendered in windows of consecutive
+# pages small enough to fit in the budget, and ImageMagick spills to disk rather than going beyond it.
+# Set it with setMemoryBudget, None renders maximumPagesPerWindow pages at a time with no ImageMagick limit.
+memoryBudget = 512 * 1024 * 1024
+maximumPagesPerWindow = 4
+
+# The estimated bytes each pixel of a page takes while it is scraped: the ImageMagick render (16 bit RGBA) plus the
+# PIL page (8 bit RGB) and its preprocessed copies
+bytesPerPagePixel = 8 + 3 * 4
+
+# The name of the OCR backend pages are scraped with (see ocrBackends). Set it with setOcrBackend.
+ocrBackendName = ocrBackends.defaultOcrBackendName
+
+# The preprocessing of page images before they are scraped (see imagePreprocessing). Set it with setPreprocessing.
+preprocessingSettings = imagePreprocessing.getPreprocessingSettings()
+
+# The settings of adaptive resolution (see adaptiveResolution), or None to scrape every page at the full resolution.
+# With adaptive resolution each page is scraped at a low resolution first and only the blocks tesseract is not confident
+# in are rendered again at the full resolution and scraped again. Set it with setAdaptiveResolution.
+adaptiveSettings = None
+
+# The settings of form templates (see formTemplates), or None to scrape every page whole. With form templates each page
+# is scraped at a low resolution first to find the anchors of the templates, and a page which matches a template only
+# has its regions scraped at the full resolution. Pages which match no template are scraped whole. Set it with
+# setFormTemplates.
+templateSettings = None
+compiledTemplates = []
+
+# The settings of page deduplication (see pageDedup), or None to scrape every page. With page deduplication each page
+# image is hashed after it is preprocessed, blank pages are not scraped and a page which looks like a page this process
+# has already scraped reuses its data. Each process keeps its own pageCache. Set it with setPageDedup.
+dedupSettings = None
+pageCache = None
+
+# The format renders are saved in: 'store' saves a render store (see renderStore) whose pages can be read one at a
+# time, 'text' saves a text render file of all page text and data joined by a '<data>' marker. Renders in either
+# format are read. Set it with setRenderFormat.
+renderFormat = 'store'
+renderFormats = ('store', 'text')
+
+# Pages with at least this many words in their text layer are read from the text layer rather than scraped with
+# tesseract. Pages with fewer words are treated as images (eg. scans with a stray page number) and scraped.
+minimumTextLayerWords = 3
+
+# Pages whose images cover at least this fraction of the page are scans, they are only read from their text layer when
+# its words cover at least minimumTextLayerCoverage of the page (eg. a scan tesseract has already made searchable).
+# A scan with a short text overlay (a Bates number, fax header or stamp) is scraped, or the scan would be lost.
+scannedPageImageCoverage = 0.5
+minimumTextLayerCoverage = 0.05
 
 
 # Returns a pretty version of a paths base file name without its extension
@@ -49,151 +98,669 @@ def getAbsolutePathFileName(absolutePath=''):
     return fileName
 
 
-# Gets a list of pdf file paths in a given directory.
+# Gets a list of pdf file paths in a given directory, and in its sub directories when recursive.
 # If no directory is provided, it will default to the current working directory
-def getPdfFileNamesFromDirectory(directory):
+def getPdfFileNamesFromDirectory(directory, recursive=False):
     try:
-
-        # create a list of pdf files in the file directory if it:
-        # - is a valid file
-        # - ends with '.pdf'
-        return [os.path.join(directory, f) for f in listdir(directory) if isfile(join(directory, f)) if
-                f.endswith('.pdf')]
+        return [entry.path for entry in iterPdfFileEntries(directory or os.getcwd(), recursive)]
     except Exception as ex:
         customLogger.log(ex, 'fatal')
         sys.exit()
 
 
+# Yields the directory entries (os.DirEntry) of the pdf files in a directory, and in its sub directories when recursive.
+# Entries come from a single os.scandir of each directory, so the type of each entry and (on Windows) its size and
+# modified time are known without another system call per file. Hidden files and directories are skipped.
+def iterPdfFileEntries(directory, recursive=False):
+    with os.scandir(directory) as entries:
+        subDirectories = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+
+            # create a list of pdf files in the file directory if it:
+            # - is a valid file
+            # - ends with '.pdf'
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                yield entry
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                subDirectories.append(entry.path)
+
+    for subDirectory in subDirectories:
+        yield from iterPdfFileEntries(subDirectory, recursive)
+
+
+# Returns the settings which change what a scrape of a pdf produces. Renders are cached against these settings, so
+# changing any of them will cause pdf's to be scraped again.
+def getScrapeSettings(resolution):
+    return {
+        'resolution': resolution,
+        'preprocessing': preprocessingSettings,
+        'ocr': {'engine': ocrBackends.getOcrBackendClass(ocrBackendName).engine, 'output': 'data'},
+        'textLayer': {'enabled': pymupdf is not None, 'minimumWords': minimumTextLayerWords,
+                      'scannedImageCoverage': scannedPageImageCoverage, 'minimumCoverage': minimumTextLayerCoverage},
+        'adaptive': adaptiveSettings,
+        'templates': templateSettings,
+        'dedup': dedupSettings
+    }
+
+
+# Returns the path of the directory renders are saved to, creating it if it does not exist
+def getRenderDirectoryPath(workingDirectory, renderDirectoryName):
+    # Create a directory to store the rendered pdf's in
+    renderDirectoryPath = os.path.join(workingDirectory, renderDirectoryName)
+
+    # Create the directory to render files to if it does not exist
+    if not os.path.exists(renderDirectoryPath):
+        os.makedirs(renderDirectoryPath)
+
+    return renderDirectoryPath
+
+
+# Returns the metadata saved alongside a render in the render cache, including how each page was read once the pages
+# have been scraped
+def getRenderMetadata(readerFilePath, resolution, pageResults=None):
+    metadata = {'source': os.path.basename(readerFilePath), 'sourcePath': os.path.abspath(readerFilePath),
+                'settings': getScrapeSettings(resolution)}
+    if pageResults is not None:
+        metadata['pageMethods'] = [page['method'] for page in pageResults]
+        metadata['peakResidentMemory'] = getPeakResidentMemory(pageResults)
+        if adaptiveSettings:
+            metadata['escalation'] = getEscalation(pageResults)
+        if compiledTemplates:
+            metadata['pageTemplates'] = [page.get('template') for page in pageResults]
+    return metadata
+
+
+# Returns the fraction of the words of the pages scraped with adaptive resolution which were scraped again at the full
+# resolution. When those pages have no words at the first pass resolution, the fraction of the pages scraped again.
+def getEscalation(pageResults):
+    escalatedPages = [page for page in pageResults if 'escalation' in page]
+    totalWords = sum(page.get('words', 0) for page in escalatedPages)
+    if totalWords:
+        return sum(page.get('escalatedWords', 0) for page in escalatedPages) / totalWords
+    return sum(page['escalation'] for page in escalatedPages) / len(escalatedPages) if escalatedPages else 0
+
+
+# Returns the peak resident memory in bytes of the processes which read a list of page results, while they read them
+def getPeakResidentMemory(pageResults):
+    return max([page.get('peakResidentMemory', 0) for page in pageResults] or [0])
+
+
 # Returns text from a pdf of a given path.
-# The scraped pdf text files will be in a directory called rendered.
-# If the pdf has been rendered the text will be returned
+# The scraped pdf text files will be in a directory called rendered, named by a hash of the pdf's contents and the
+# scrape settings. If the pdf has been rendered with the same settings the text will be returned
 # From that file. If not, the pdf will be scraped, saved and the text returned.
-def getFileExtract(readerFilePath, workingDirectory, renderDirectoryName, resolution):
+def getFileExtract(readerFilePath, workingDirectory, renderDirectoryName, resolution, debugImages=False):
     try:
-        # Create a directory to store the rendered pdf's in
-        renderDirectoryPath = os.path.join(workingDirectory, renderDirectoryName)
-
-        # Create the directory to render files to if it does not exist
-        if not os.path.exists(renderDirectoryPath):
-            os.makedirs(renderDirectoryPath)
+        renderDirectoryPath = getRenderDirectoryPath(workingDirectory, renderDirectoryName)
+        cacheKey = renderCache.getCacheKey(readerFilePath, getScrapeSettings(resolution))
+        renderCache.adoptLegacyRender(renderDirectoryPath, readerFilePath, cacheKey)
 
-        # Define the name and path of the file we will be creating
-        renderFileName = str(os.path.basename(readerFilePath).split('.')[0]) + '.txt'
-        renderFilePath = os.path.join(renderDirectoryPath, renderFileName)
+        # If the render file exists and is populated, we will return its contents
+        scrapedContent = renderCache.readCacheEntry(renderDirectoryPath, cacheKey)
 
-        if not os.path.exists(renderFilePath):
-            # If the render file exists we will create and write to it
-            scrapedContent = scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory)
-        else:
-            # Define the contents of the render file
-            renderFile = open(renderFilePath, "r")
-            renderFileContents = renderFile.read()
-            renderFile.close()
-
-            if not renderFileContents:
-                # If the render file exists but is empty, we will write to it
-                scrapedContent = scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory)
-            else:
-                # If the render file exists and is populated, we will return its contents
-                scrapedContent = renderFileContents
+        if not scrapedContent:
+            # If the render file does not exist or is empty, we will scrape the pdf and write to it
+            renderFilePath = renderCache.getCacheFilePath(renderDirectoryPath, cacheKey)
+            scrapedContent = scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory, debugImages)
 
         # Split the data into the raw text extract and the information extract
         return scrapedContent.split('<data>')
     except Exception as ex:
         customLogger.log(ex, 'fatal')
-        sys.exit()
+        raise
 
 
-# Returns the text from a pdf.
-# When the pdf is scraped, the contents will be saved to a given file path.
-def scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory):
+# Returns the tesseract data of a pdf as a render store which reads one page at a time (see renderStore.RenderStore).
+# The pdf is scraped first if it has not been rendered with the same settings, and a text render is converted to a
+# render store. The render store should be closed once it is read.
+def getFileRender(readerFilePath, workingDirectory, renderDirectoryName, resolution, debugImages=False):
     try:
-        customLogger.log("Beginning scrape of " + readerFilePath)
+        renderDirectoryPath = getRenderDirectoryPath(workingDirectory, renderDirectoryName)
+        cacheKey = renderCache.getCacheKey(readerFilePath, getScrapeSettings(resolution))
+        renderCache.adoptLegacyRender(renderDirectoryPath, readerFilePath, cacheKey)
+        renderFilePath = renderCache.getCacheFilePath(renderDirectoryPath, cacheKey)
+        renderStorePath = renderStore.getRenderStorePath(renderFilePath)
+
+        if not os.path.exists(renderStorePath):
+            if os.path.exists(renderFilePath):
+                metadata = renderCache.readCacheMetadata(renderDirectoryPath, cacheKey)
+                renderStore.importRenderFile(renderFilePath, metadata.get('pageMethods'))
+            else:
+                scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory, debugImages, 'store')
+
+        return renderStore.RenderStore(renderStorePath)
+    except Exception as ex:
+        customLogger.log(ex, 'fatal')
+        raise
+
 
-        # Create and open the file we will add the scraped text to
-        with open(renderFilePath, "w+") as renderFile:
-            customLogger.log("Opened render file " + renderFilePath)
+# Sets the memory budget of this process (see memoryBudget). Worker processes call this when they start.
+def setMemoryBudget(budget):
+    global memoryBudget
+    memoryBudget = budget
 
-            # Open the pdf file to scrape
-            with open(readerFilePath, "rb") as file:
+    if budget:
+        wandLimits['memory'] = budget
+        wandLimits['map'] = budget * 2
 
-                # Define the time we have started processing the pdf
-                startTime = datetime.now()
-                customLogger.log("Opened the pdf")
 
-                # Read the pdf file using 'Wand'
-                with wi(file=file, resolution=resolution) as source:
-                    with source.convert('jpeg') as pdfImage:
+# Sets the OCR backend this process scrapes pages with by name (see ocrBackends.ocrBackendClasses). Worker processes
+# call this when they start.
+def setOcrBackend(name):
+    global ocrBackendName
+    ocrBackends.getOcrBackendClass(name)
+    ocrBackendName = name
 
-                        # Get a nice version of the document file name
-                        fileName = getAbsolutePathFileName(readerFilePath)
 
-                        # Create the directory to render files to if it does not exist
-                        if not os.path.exists(tempImageDirectoryName):
-                            os.makedirs(tempImageDirectoryName)
+# Sets the preprocessing of page images in this process, any settings not given are the defaults (see
+# imagePreprocessing.defaultPreprocessingSettings). Worker processes call this when they start.
+def setPreprocessing(settings=None):
+    global preprocessingSettings
+    preprocessingSettings = imagePreprocessing.getPreprocessingSettings(settings)
 
-                        customLogger.log("Created the temporary directory used for storing temp pdf image conversions")
 
-                        # Save the pdf pages as images. We save the images as it helps us debug potential issues with
-                        # pdf conversions
-                        source.save(filename=os.path.join(workingDirectory, tempImageDirectoryName, fileName + '.png'))
-                        customLogger.log("saved pdf pages as png's")
+# Turns adaptive resolution on for this process, any settings not given are the defaults (see
+# adaptiveResolution.defaultAdaptiveSettings), or off when settings is None. Worker processes call this when they start.
+def setAdaptiveResolution(settings=None):
+    global adaptiveSettings
+    adaptiveSettings = adaptiveResolution.getAdaptiveSettings(settings) if settings is not None else None
 
-                        # Define the total number of pages in the pdf for logging
-                        totalPages = len(pdfImage.sequence)
 
-                        completeString = ''
-                        completeData = ''
+# Turns form templates on for this process, any settings not given are the defaults (see
+# formTemplates.defaultTemplateSettings), or off when settings is None. Worker processes call this when they start.
+def setFormTemplates(settings=None):
+    global templateSettings, compiledTemplates
+    templateSettings = formTemplates.getTemplateSettings(settings) if settings is not None else None
+    compiledTemplates = formTemplates.compileTemplates(templateSettings['templates']) if templateSettings else []
 
-                        # Loop through each page opening the image and using tesseract to get the text
-                        for i in range(0, totalPages):
-                            # Construct the file name of the page we are iterating over
-                            pageFileName = fileName + '-' + str(i) + '.png'
-                            pagePath = join(workingDirectory, tempImageDirectoryName, pageFileName)
 
-                            # Open the image
-                            with Image.open(pagePath) as p:
-                                p = p.convert('RGB')
-                                # Attempt some basic image enhancements for scraping
-                                enhancement = ImageEnhance.Sharpness(p)
-                                p = enhancement.enhance(4.0)
-                                enhancement = ImageEnhance.Contrast(p)
-                                p = enhancement.enhance(2.0)
-                                enhancement = ImageEnhance.Color(p)
-                                p = enhancement.enhance(0.0)
+# Turns page deduplication on for this process with an empty page cache, any settings not given are the defaults (see
+# pageDedup.defaultDedupSettings), or off when settings is None. Worker processes call this when they start.
+def setPageDedup(settings=None):
+    global dedupSettings, pageCache
+    dedupSettings = pageDedup.getDedupSettings(settings) if settings is not None else None
+    pageCache = pageDedup.PageCache(dedupSettings['maximumEntries'], dedupSettings['maximumDistance']) \
+        if dedupSettings else None
 
-                                # Save the enhanced image for comparison
-                                p.save(os.path.join(workingDirectory, tempImageDirectoryName,
-                                                    fileName + '-enhanced-' + str(i) + '.png'))
 
-                                customLogger.log("Opened saved image")
+# Sets the format renders are saved in by this process (see renderFormat)
+def setRenderFormat(name):
+    global renderFormat
+    if name not in renderFormats:
+        raise ValueError("Unknown render format '" + str(name) + "', choose from: " + ', '.join(renderFormats))
+    renderFormat = name
 
-                                pageString = unidecode(pytesseract.image_to_string(p))
-                                pageData = unidecode(pytesseract.image_to_data(p))
 
-                                # Add the scraped text to our string for all text in the document
-                                completeString = completeString + "\n" + pageString if completeString else pageString
-                                completeData = completeData + "\n" + pageData if completeData else pageData
+# Returns the width and height of a pdf page in points without rendering it
+def getPdfPageSize(readerFilePath, pageNumber):
+    if pymupdf:
+        with pymupdf.open(readerFilePath) as document:
+            rect = document[pageNumber].rect
+            return rect.width, rect.height
 
-                                # Log the progress
-                                customLogger.log("Scraped page " + str(i + 1) + " / " + str(totalPages) + " of " + os.path.basename(
-                                    readerFilePath))
+    # Ghostscript renders at 72 dpi by default so a page is one pixel per point
+    with wi.ping(filename=readerFilePath + '[' + str(pageNumber) + ']') as source:
+        return source.width, source.height
 
-                        # Save the scraped text and close the file
-                        completeScrape = completeString + '\n' + '<data>' + '\n' + completeData
 
-                        renderFile.write(completeScrape)
-                        renderFile.close()
+# Returns the number of pages starting at a page that can be rendered together within the memory budget
+def getPagesPerWindow(readerFilePath, pageNumber, resolution):
+    if not memoryBudget:
+        return maximumPagesPerWindow
 
-                        # Delete the temporary image directory we used to save the images
-                        shutil.rmtree(join(workingDirectory, tempImageDirectoryName))
+    width, height = getPdfPageSize(readerFilePath, pageNumber)
+    pageBytes = (width * resolution / 72) * (height * resolution / 72) * bytesPerPagePixel
+    return max(1, min(maximumPagesPerWindow, int(memoryBudget // max(pageBytes, 1))))
 
-                        customLogger.log("Complete scrape of '"
-                                         + os.path.basename(readerFilePath)
-                                         + "' in "
-                                         + customLogger.duration(startTime))
 
-                        return completeScrape
+# Returns the number of pages in a pdf without rendering them
+def getPdfPageCount(readerFilePath):
+    if pymupdf:
+        with pymupdf.open(readerFilePath) as document:
+            return document.page_count
+
+    with wi.ping(filename=readerFilePath) as source:
+        return len(source.sequence)
+
+
+# Joins scraped page results into the contents of a render file: all page text, a '<data>' marker and all page data
+def getRenderContents(pageResults):
+    completeString = '\n'.join(page['text'] for page in pageResults)
+    completeData = '\n'.join(page['data'] for page in pageResults)
+    return completeString + '\n' + '<data>' + '\n' + completeData
+
+
+# Writes the contents of a render file. The file is written atomically so a crash never leaves a partial render.
+def writeRenderFile(renderFilePath, contents):
+    renderCache.writeFileAtomically(renderFilePath, contents)
+
+
+# Saves the page results of a scrape as a render in a format (see renderFormat) and returns the path it was saved to.
+# The render is written atomically so a crash never leaves a partial render.
+def saveRenderFile(renderFilePath, pageResults, fileFormat=None):
+    if (fileFormat or renderFormat) == 'store':
+        renderFilePath = renderStore.getRenderStorePath(renderFilePath)
+        renderStore.writeRenderStore(renderFilePath, pageResults)
+    else:
+        writeRenderFile(renderFilePath, getRenderContents(pageResults))
+    return renderFilePath
+
+
+# Returns the text from a pdf.
+# When the pdf is scraped, the contents will be saved to a given file path.
+# Each page is saved to a checkpoint beside the render file as soon as it is scraped. If a scrape is stopped part way
+# through, scraping the pdf again resumes from the pages in the checkpoint.
+# The render is saved in the render format of this process unless another fileFormat is given (see renderFormat).
+def scrapePdf(readerFilePath, renderFilePath, resolution, workingDirectory, debugImages=False, fileFormat=None):
+    try:
+        customLogger.log("Beginning scrape of " + readerFilePath)
+
+        # Define the time we have started processing the pdf
+        startTime = datetime.now()
+
+        # Read the pages scraped by a previous attempt
+        checkpointDirectoryPath = renderCache.getCheckpointDirectoryPath(renderFilePath)
+        checkpointPages = renderCache.readCheckpointPages(checkpointDirectoryPath)
+        if checkpointPages:
+            customLogger.log("Resuming scrape of " + os.path.basename(readerFilePath) + " with "
+                             + str(len(checkpointPages)) + " pages already scraped")
+        else:
+            renderCache.writeCheckpointManifest(checkpointDirectoryPath, getRenderMetadata(readerFilePath, resolution))
+
+        for pageResult in iterPdfPages(readerFilePath, resolution, workingDirectory, debugImages=debugImages,
+                                       skipPages=checkpointPages):
+            renderCache.writeCheckpointPage(checkpointDirectoryPath, pageResult)
+            checkpointPages[pageResult['page']] = pageResult
+
+        pageResults = [checkpointPages[pageNumber] for pageNumber in sorted(checkpointPages)]
+
+        # Save the scraped text and a record of how each page was read
+        completeScrape = getRenderContents(pageResults)
+        savedFilePath = saveRenderFile(renderFilePath, pageResults, fileFormat)
+        renderCache.writeRenderMetadata(renderFilePath, getRenderMetadata(readerFilePath, resolution, pageResults))
+        renderCache.removeCheckpoint(checkpointDirectoryPath)
+        customLogger.log("Saved render file " + savedFilePath)
+        customLogger.log("Peak resident memory scraping '" + os.path.basename(readerFilePath) + "' was "
+                         + customLogger.megabytes(getPeakResidentMemory(pageResults)))
+        logEscalation(readerFilePath, resolution, pageResults)
+
+        customLogger.log("Complete scrape of '"
+                         + os.path.basename(readerFilePath)
+                         + "' in "
+                         + customLogger.duration(startTime))
+
+        return completeScrape
     except Exception as ex:
         customLogger.log(ex, 'fatal')
-        sys.exit()
+        raise
+
+
+# Logs how much of a pdf scraped with adaptive resolution was scraped again at the full resolution
+def logEscalation(readerFilePath, resolution, pageResults):
+    if adaptiveSettings:
+        customLogger.log("Scraped " + format(getEscalation(pageResults) * 100, '.1f') + "% of '"
+                         + os.path.basename(readerFilePath) + "' again at " + str(resolution) + " dpi")
+
+
+# Returns a PIL image of a Wand page without encoding it to a file format.
+# The page is flattened onto white and its raw 8 bit RGB pixels are handed to PIL, which wraps the buffer in place.
+def getPageAsPilImage(pageImage):
+    pageImage.background_color = Color('white')
+    pageImage.alpha_channel = 'remove'
+    pageImage.depth = 8
+    return Image.frombuffer('RGB', pageImage.size, pageImage.make_blob('RGB'), 'raw', 'RGB', 0, 1)
+
+
+# Returns the fraction of the area of a pdf page covered by a list of (x0, y0, x1, y1) boxes, boxes are clipped to the
+# page and overlapping boxes counted once each
+def getPageCoverage(page, boxes):
+    pageArea = page.rect.width * page.rect.height
+    if not pageArea:
+        return 0
+    coveredArea = 0
+    for x0, y0, x1, y1 in boxes:
+        width = min(x1, page.rect.x1) - max(x0, page.rect.x0)
+        height = min(y1, page.rect.y1) - max(y0, page.rect.y0)
+        coveredArea += max(0, width) * max(0, height)
+    return min(1, coveredArea / pageArea)
+
+
+# Returns whether a pdf page is born digital, its text layer holding its text, rather than a scan whose text layer is
+# only an overlay on the image
+def isBornDigitalPage(page, words):
+    if len(words) < minimumTextLayerWords:
+        return False
+    if getPageCoverage(page, [image['bbox'] for image in page.get_image_info()]) < scannedPageImageCoverage:
+        return True
+    return getPageCoverage(page, [word[:4] for word in words]) >= minimumTextLayerCoverage
+
+
+# Returns the tesseract data of a pdf page built from its text layer, or None if the page is not born digital (see
+# isBornDigitalPage) and has to be scraped with tesseract. Coordinates are scaled from pdf points to pixels at the given
+# resolution so the data lines up with data tesseract would produce for the same page.
+def getTextLayerPageData(page, resolution):
+    words = page.get_text('words')
+    if not isBornDigitalPage(page, words):
+        return None
+
+    scale = resolution / 72
+    pageWidth = round(page.rect.width * scale)
+    pageHeight = round(page.rect.height * scale)
+    rows = [tesseractData.tesseractDataHeader,
+            '\t'.join(['1', '1', '0', '0', '0', '0', '0', '0', str(pageWidth), str(pageHeight), '-1', ''])]
+
+    # Words are (x0, y0, x1, y1, text, block, line, word), the text layer numbers blocks, lines and words from 0
+    for x0, y0, x1, y1, text, block, line, word in sorted(words, key=lambda w: (w[5], w[6], w[7])):
+        left = round(x0 * scale)
+        top = round(y0 * scale)
+        columns = [5, 1, block + 1, 1, line + 1, word + 1, left, top, round(x1 * scale) - left,
+                   round(y1 * scale) - top, 100, text]
+        rows.append('\t'.join(str(column) for column in columns))
+
+    return unidecode('\n'.join(rows))
+
+
+# Returns the last page of a range and a dictionary of page number to tesseract data for the pages in the range which
+# can be read from their text layer. Without PyMuPDF installed no pages are read from their text layer.
+def getTextLayerPages(readerFilePath, resolution, firstPage=0, lastPage=None):
+    if not pymupdf:
+        return lastPage, {}
+
+    with pymupdf.open(readerFilePath) as document:
+        lastPage = document.page_count - 1 if lastPage is None else min(lastPage, document.page_count - 1)
+
+        textLayerPages = {}
+        for pageNumber in range(firstPage, lastPage + 1):
+            pageData = getTextLayerPageData(document[pageNumber], resolution)
+            if pageData is not None:
+                textLayerPages[pageNumber] = pageData
+
+        return lastPage, textLayerPages
+
+
+# Splits a sorted list of page numbers into inclusive (firstPage, lastPage) runs of consecutive pages
+def getPageRuns(pageNumbers):
+    pageRuns = []
+    for pageNumber in pageNumbers:
+        if pageRuns and pageRuns[-1][1] == pageNumber - 1:
+            pageRuns[-1][1] = pageNumber
+        else:
+            pageRuns.append([pageNumber, pageNumber])
+    return [tuple(pageRun) for pageRun in pageRuns]
+
+
+# Returns a list of page results for a range of pages in a pdf. Each page result is a dictionary containing:
+# 'page' the zero based page number, 'text' the scraped text, 'data' the tesseract data and 'method' how the page was
+# read: 'text' from the pdf's text layer or 'ocr' by scraping an image of the page with tesseract, and
+# 'peakResidentMemory' the peak resident memory in bytes of the process from when it started reading the range of pages
+# until the page was read (see customLogger.getPeakResidentMemory).
+# Pages are zero based and the last page is inclusive. If no last page is given, all remaining pages are scraped.
+# To debug potential issues with pdf conversions, debugImages will save each scraped page and its enhanced version to a
+# 'pdfImageConversions' directory in the working directory.
+def scrapePdfPages(readerFilePath, resolution, workingDirectory, firstPage=0, lastPage=None, debugImages=False):
+    return list(iterPdfPages(readerFilePath, resolution, workingDirectory, firstPage, lastPage, debugImages))
+
+
+# Yields the page results of a range of pages in a pdf in page order as each page is read (see scrapePdfPages), so
+# the results of a page can be used before the rest of the document is scraped. Pages in skipPages are not read.
+def iterPdfPages(readerFilePath, resolution, workingDirectory, firstPage=0, lastPage=None, debugImages=False,
+                 skipPages=()):
+    debugImageDirectoryPath = join(workingDirectory, debugImageDirectoryName) if debugImages else None
+    if debugImageDirectoryPath and not os.path.exists(debugImageDirectoryPath):
+        os.makedirs(debugImageDirectoryPath)
+
+    # The peak memory of each page is taken from the start of this range of pages, not of the process
+    customLogger.resetPeakResidentMemory()
+
+    # Find the pages which already contain text in the text layer
+    lastPage, textLayerPages = getTextLayerPages(readerFilePath, resolution, firstPage, lastPage)
+    textPageNumbers = sorted(n for n in textLayerPages if n not in skipPages)
+
+    if textPageNumbers:
+        customLogger.log("Reading " + str(len(textPageNumbers)) + " pages from the text layer of "
+                         + os.path.basename(readerFilePath))
+
+    # The remaining pages are scraped with tesseract, rendering consecutive pages together
+    if lastPage is None and skipPages:
+        lastPage = getPdfPageCount(readerFilePath) - 1
+
+    if lastPage is None:
+        imagePageRuns = [(firstPage, None)]
+    else:
+        imagePageRuns = getPageRuns([n for n in range(firstPage, lastPage + 1)
+                                     if n not in textLayerPages and n not in skipPages])
+
+    # Yield the text layer pages which come before each run of scraped pages, then the scraped pages
+    imagePageRuns.append((float('inf'), None))
+    textIndex = 0
+    for runFirstPage, runLastPage in imagePageRuns:
+        while textIndex < len(textPageNumbers) and textPageNumbers[textIndex] < runFirstPage:
+            pageNumber = textPageNumbers[textIndex]
+            textIndex += 1
+            customLogger.increment('pages.text')
+            yield {
+                'page': pageNumber,
+                'text': dataExtractor.getTesseractDataAsText(textLayerPages[pageNumber]),
+                'data': textLayerPages[pageNumber],
+                'method': 'text',
+                'peakResidentMemory': customLogger.getPeakResidentMemory()
+            }
+
+        if runFirstPage != float('inf'):
+            yield from iterOcrPdfPages(readerFilePath, resolution, runFirstPage, runLastPage, debugImageDirectoryPath)
+
+
+# Yields the page results of a range of pages in a pdf scraped with tesseract, as each page is scraped.
+# Pages are rendered a window of a few pages at a time to stay within the memory budget, and passed from Wand to PIL to
+# tesseract in memory. When a debug image directory is given, each page and its enhanced version are saved to it.
+def iterOcrPdfPages(readerFilePath, resolution, firstPage=0, lastPage=None, debugImageDirectoryPath=None):
+    if lastPage is None:
+        lastPage = getPdfPageCount(readerFilePath) - 1
+
+    windowFirstPage = firstPage
+    while windowFirstPage <= lastPage:
+        windowLastPage = min(lastPage, windowFirstPage
+                             + getPagesPerWindow(readerFilePath, windowFirstPage, resolution) - 1)
+        yield from iterOcrPdfWindow(readerFilePath, resolution, windowFirstPage, windowLastPage,
+                                    debugImageDirectoryPath)
+        windowFirstPage = windowLastPage + 1
+
+
+# Yields the page results of a window of pages in a pdf scraped with tesseract (see iterOcrPdfPages). With adaptive
+# resolution the window is rendered at the first pass resolution. With page deduplication, pages which are blank or
+# duplicates are not scraped, and the other pages are added to the page cache once they are scraped.
+def iterOcrPdfWindow(readerFilePath, resolution, firstPage, lastPage, debugImageDirectoryPath=None):
+    # Select the window of pages for ghostscript to render
+    pageSelection = '[' + str(firstPage) + '-' + str(lastPage) + ']'
+    renderResolution = adaptiveSettings['firstPassResolution'] if adaptiveSettings else resolution
+
+    # Get a nice version of the document file name
+    fileName = getAbsolutePathFileName(readerFilePath)
+
+    # Pages are only deduplicated against pages scraped with the same settings
+    settingsKey = pageDedup.getSettingsKey(getScrapeSettings(resolution)) if pageCache is not None else None
+
+    # Read the pdf file using 'Wand', timing ghostscript rendering the window
+    with customLogger.Timer('rasterize.window'):
+        source = wi(filename=readerFilePath + pageSelection, resolution=renderResolution)
+
+    with source:
+
+        # Define the total number of pages in the window
+        totalPages = len(source.sequence)
+
+        # Loop through each page using tesseract to get the text
+        for i in range(0, totalPages):
+            pageNumber = firstPage + i
+
+            with customLogger.Timer('rasterize.page'), wi(image=source.sequence[i]) as pageImage:
+                p = getPageAsPilImage(pageImage)
+
+            pageResult = {'page': pageNumber, 'method': 'ocr'}
+            pageData, pageHash, enhanced = None, None, None
+            if pageCache is not None:
+                pageData, pageHash, enhanced = getDuplicatePageData(p, pageResult, (settingsKey, p.size),
+                                                                    resolution / renderResolution, fileName,
+                                                                    pageNumber, debugImageDirectoryPath)
+
+            if pageData is None:
+                template = None
+                if compiledTemplates:
+                    pageData, template = getTemplatePageData(readerFilePath, pageNumber, resolution, renderResolution,
+                                                             p)
+
+                if template:
+                    pageResult['method'] = 'template'
+                    pageResult['template'] = template.name
+                else:
+                    pageData = getPageImageData(p, fileName, pageNumber, debugImageDirectoryPath, enhanced)
+                    customLogger.increment('pages.ocr')
+
+                    if adaptiveSettings:
+                        pageData, escalatedWords, totalWords = getEscalatedPageData(readerFilePath, pageNumber,
+                                                                                    resolution, pageData, p.size)
+                        pageResult['escalation'] = escalatedWords / totalWords if totalWords else 1
+                        pageResult['escalatedWords'], pageResult['words'] = escalatedWords, totalWords
+
+                if pageHash is not None:
+                    pageCache.add(pageHash, (settingsKey, p.size), pageData)
+
+            # Log the progress
+            customLogger.log("Scraped page " + str(pageNumber + 1) + " of " + os.path.basename(readerFilePath),
+                             'debug')
+
+            pageResult['text'] = dataExtractor.getTesseractDataAsText(pageData)
+            pageResult['data'] = pageData
+            pageResult['peakResidentMemory'] = customLogger.getPeakResidentMemory()
+            yield pageResult
+
+
+# Returns the tesseract data of a page image, preprocessed and recognised once. When the page has already been
+# preprocessed (see getEnhancedPageImage) the enhanced page is recognised.
+def getPageImageData(p, fileName, pageNumber, debugImageDirectoryPath=None, enhanced=None):
+    if enhanced is None:
+        enhanced = getEnhancedPageImage(p, fileName, pageNumber, debugImageDirectoryPath)
+
+    # Recognise the page once, its text is rebuilt from the data
+    with customLogger.Timer('ocr'):
+        return unidecode(ocrBackends.getOcrBackend(ocrBackendName).imageToData(enhanced))
+
+
+# Returns a page image preprocessed for scraping. When a debug image directory is given, the page and its enhanced
+# version are saved to it.
+def getEnhancedPageImage(p, fileName, pageNumber, debugImageDirectoryPath=None):
+    if debugImageDirectoryPath:
+        p.save(join(debugImageDirectoryPath, fileName + '-' + str(pageNumber) + '.png'))
+
+    # Sharpen, contrast and grey the page for scraping
+    with customLogger.Timer('preprocess'):
+        p = imagePreprocessing.preprocessPageImage(p, preprocessingSettings)
+
+    # Save the enhanced image for comparison
+    if debugImageDirectoryPath:
+        p.save(join(debugImageDirectoryPath, fileName + '-enhanced-' + str(pageNumber) + '.png'))
+
+    return p
+
+
+# Returns a tuple of:
+# - the tesseract data of a page image which is blank or looks like a page in the page cache, or None
+# - the hash of the page to add its data to the page cache with once it is scraped, or None
+# - the preprocessed page image
+# The method of pageResult is set to 'blank' or 'dedup' when the page is not scraped. pageKey is the key of the page in
+# the page cache and scale the full resolution over the resolution the page image was rendered at.
+def getDuplicatePageData(p, pageResult, pageKey, scale, fileName, pageNumber, debugImageDirectoryPath=None):
+    enhanced = getEnhancedPageImage(p, fileName, pageNumber, debugImageDirectoryPath)
+
+    with customLogger.Timer('dedup'):
+        if pageDedup.isBlankPage(enhanced, dedupSettings['blankDeviation']):
+            pageResult['method'] = 'blank'
+            customLogger.increment('pages.blank')
+            pageSize = (int(p.size[0] * scale + 0.5), int(p.size[1] * scale + 0.5))
+            return pageDedup.getBlankPageData(pageSize), None, enhanced
+
+        pageHash = pageDedup.getPageHash(enhanced, dedupSettings['hashSize'])
+        pageData = pageCache.get(pageHash, pageKey)
+
+    if pageData is None:
+        return None, pageHash, enhanced
+
+    pageResult['method'] = 'dedup'
+    customLogger.increment('pages.dedup')
+    return pageData, None, enhanced
+
+
+# Returns the tesseract data of a page scraped with the form template it matches and the template, or (None, None) if
+# it matches no template. The page image p, rendered at renderResolution, is scraped at the detection resolution to find
+# the anchors of the templates, then only the regions of the matching template are scraped at the full resolution, in
+# parallel (see formTemplates.getRegionData).
+def getTemplatePageData(readerFilePath, pageNumber, resolution, renderResolution, p):
+    detectionResolution = templateSettings['detectionResolution']
+    detectionScale = min(1, detectionResolution / renderResolution)
+    pageSize = (int(p.size[0] * resolution / renderResolution + 0.5), int(p.size[1] * resolution / renderResolution
+                                                                          + 0.5))
+    ocrBackend = ocrBackends.getOcrBackend(ocrBackendName)
+
+    with customLogger.Timer('preprocess'):
+        detectionPage = p.resize((max(1, int(p.size[0] * detectionScale)), max(1, int(p.size[1] * detectionScale))),
+                                 Image.BOX) if detectionScale < 1 else p
+        detectionPage = imagePreprocessing.preprocessPageImage(detectionPage, preprocessingSettings)
+    with customLogger.Timer('ocr.detect'):
+        detectionData = unidecode(ocrBackend.imageToData(detectionPage))
+
+    template, boxes = formTemplates.matchTemplate(compiledTemplates, detectionData, renderResolution * detectionScale,
+                                                  resolution, pageSize)
+    if not template:
+        return None, None
+
+    if renderResolution != resolution:
+        with customLogger.Timer('rasterize.template'):
+            p = renderPdfPage(readerFilePath, pageNumber, resolution)
+
+    with customLogger.Timer('ocr.regions'):
+        pageData = formTemplates.getRegionData(
+            p, boxes, ocrBackend, templateSettings['regionWorkers'],
+            lambda region: imagePreprocessing.preprocessPageImage(region, preprocessingSettings))
+
+    customLogger.increment('pages.template')
+    return pageData, template
+
+
+# Returns a PIL image of a single pdf page rendered at a resolution
+def renderPdfPage(readerFilePath, pageNumber, resolution):
+    with wi(filename=readerFilePath + '[' + str(pageNumber) + ']', resolution=resolution) as pageImage:
+        return getPageAsPilImage(pageImage)
+
+
+# Returns the tesseract data of a page scraped at the first pass resolution, scaled to the full resolution with the
+# blocks tesseract was not confident in scraped again at the full resolution, the number of the page's words which
+# were scraped again and the number of its words at the first pass resolution. A page with no words, or too many words
+# to scrape again block by block, is scraped again whole.
+def getEscalatedPageData(readerFilePath, pageNumber, resolution, pageData, firstPassSize):
+    scale = resolution / adaptiveSettings['firstPassResolution']
+    blocks, escalatedWords, totalWords = adaptiveResolution.getLowConfidenceBlocks(
+        pageData, adaptiveSettings['minimumConfidence'])
+
+    if totalWords and not blocks:
+        pageSize = (int(firstPassSize[0] * scale + 0.5), int(firstPassSize[1] * scale + 0.5))
+        return adaptiveResolution.scaleData(pageData, scale, pageSize), 0, totalWords
+
+    with customLogger.Timer('rasterize.escalated'):
+        p = renderPdfPage(readerFilePath, pageNumber, resolution)
+    with customLogger.Timer('preprocess'):
+        p = imagePreprocessing.preprocessPageImage(p, preprocessingSettings)
+    ocrBackend = ocrBackends.getOcrBackend(ocrBackendName)
+
+    if not totalWords or escalatedWords / totalWords > adaptiveSettings['maximumEscalatedFraction']:
+        with customLogger.Timer('ocr.escalated'):
+            return unidecode(ocrBackend.imageToData(p)), totalWords, totalWords
+
+    blockData = {}
+    for blockNumber, box in blocks.items():
+        cropBox = adaptiveResolution.getCropBox(box, scale, p.size)
+        with customLogger.Timer('ocr.escalated'):
+            blockData[blockNumber] = (unidecode(ocrBackend.imageToData(p.crop(cropBox))), cropBox[0], cropBox[1])
+
+    return adaptiveResolution.mergeBlockData(pageData, scale, blockData, p.size), escalatedWords, totalWords
@@ -0,0 +1,312 @@
+from modules import customLogger, renderStore
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+
+# Render files are named by their cache key with this extension, a metadata file with the same name sits beside each.
+# A render is either a text render file or a render store (see renderStore) with the same name and its own extension.
+renderFileExtension = '.txt'
+renderFileExtensions = (renderStore.renderStoreExtension, renderFileExtension)
+metadataFileExtension = '.json'
+
+# Pages of a render still being scraped are saved to a checkpoint directory with the render's name and this extension
+checkpointDirectoryExtension = '.partial'
+checkpointManifestFileName = 'manifest.json'
+
+# Size of the chunks a pdf is read in when it is hashed
+hashChunkSize = 1024 * 1024
+
+# Hashes of files we have already read this run by path, with the size and modified time of the file when it was read.
+# Only the latest hash of each path is kept, and at most maximumFileHashes paths, the least recently used dropped first,
+# so a long running watch does not keep a hash of every version of every pdf it has seen.
+fileHashes = OrderedDict()
+maximumFileHashes = 10000
+
+
+# Returns the sha256 hash of a files contents
+def getFileHash(filePath):
+    fileStat = os.stat(filePath)
+    path = os.path.abspath(filePath)
+    statKey = (fileStat.st_size, fileStat.st_mtime_ns)
+
+    if path in fileHashes and fileHashes[path][0] == statKey:
+        fileHashes.move_to_end(path)
+        return fileHashes[path][1]
+
+    fileHash = hashlib.sha256()
+    with open(filePath, 'rb') as file:
+        for chunk in iter(lambda: file.read(hashChunkSize), b''):
+            fileHash.update(chunk)
+
+    fileHashes[path] = (statKey, fileHash.hexdigest())
+    fileHashes.move_to_end(path)
+    while len(fileHashes) > maximumFileHashes:
+        fileHashes.popitem(last=False)
+
+    return fileHashes[path][1]
+
+
+# Returns the cache key of a pdf: a hash of its contents and the settings which change what a scrape produces.
+# Renamed files share an entry while different files with the same name, or a change of settings, do not.
+def getCacheKey(readerFilePath, settings):
+    keySource = getFileHash(readerFilePath) + json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(keySource.encode('utf-8')).hexdigest()
+
+
+# Returns the path of the render file for a cache key
+def getCacheFilePath(renderDirectoryPath, cacheKey):
+    return os.path.join(renderDirectoryPath, cacheKey + renderFileExtension)
+
+
+# Returns the path of the render for a cache key in whichever format it was saved, preferring a render store, or None
+# if it has not been rendered
+def getCachedRenderPath(renderDirectoryPath, cacheKey):
+    for extension in renderFileExtensions:
+        renderPath = os.path.join(renderDirectoryPath, cacheKey + extension)
+        if os.path.exists(renderPath):
+            return renderPath
+    return None
+
+
+# Returns the name renders of a pdf were saved under before they were named by cache key: the pdf's file name up to
+# its first '.'
+def getLegacyRenderName(readerFilePath):
+    return os.path.basename(readerFilePath).split('.')[0]
+
+
+# Moves a render saved under the legacy name of a pdf (see getLegacyRenderName), in either format and with its metadata,
+# to the pdf's cache key, so renders scraped before the cache are reused rather than orphaned. This is only looked up
+# when the cache key has no render, and once moved the legacy render is gone, so each is adopted at most once.
+# A legacy render is taken as it is: it may have been scraped with other settings, and pdfs which shared a legacy name
+# share the render of whichever is looked up first. Returns whether a render was adopted.
+def adoptLegacyRender(renderDirectoryPath, readerFilePath, cacheKey):
+    legacyName = getLegacyRenderName(readerFilePath)
+    if legacyName == cacheKey or getCachedRenderPath(renderDirectoryPath, cacheKey) \
+            or not getCachedRenderPath(renderDirectoryPath, legacyName):
+        return False
+
+    for extension in renderFileExtensions + (metadataFileExtension,):
+        legacyPath = os.path.join(renderDirectoryPath, legacyName + extension)
+        if os.path.exists(legacyPath):
+            os.replace(legacyPath, os.path.join(renderDirectoryPath, cacheKey + extension))
+
+    customLogger.log("Adopted the legacy render " + legacyName + " of " + readerFilePath + " as " + cacheKey)
+    customLogger.increment('cache.adopted')
+    return True
+
+
+# Writes a file by writing a temporary file in the same directory and moving it into place.
+# A crash part way through a write will never leave a partial file that looks like a valid render.
+def writeFileAtomically(filePath, contents):
+    fileDescriptor, temporaryPath = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=os.path.dirname(filePath) or '.')
+    try:
+        with os.fdopen(fileDescriptor, 'w') as temporaryFile:
+            temporaryFile.write(contents)
+            temporaryFile.flush()
+            os.fsync(temporaryFile.fileno())
+        os.replace(temporaryPath, filePath)
+    except Exception:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+# Returns the contents of a cached render as a text render file holds them, or an empty string on a cache miss.
+# A hit refreshes the entries modified time which is used as its last access time for eviction.
+def readCacheEntry(renderDirectoryPath, cacheKey):
+    cacheFilePath = getCachedRenderPath(renderDirectoryPath, cacheKey)
+
+    contents = ''
+    if cacheFilePath and cacheFilePath.endswith(renderStore.renderStoreExtension):
+        contents = renderStore.readRenderContents(cacheFilePath)
+    elif cacheFilePath:
+        with open(cacheFilePath, 'r') as cacheFile:
+            contents = cacheFile.read()
+
+    if contents:
+        customLogger.increment('cache.hits')
+        os.utime(cacheFilePath)
+    else:
+        customLogger.increment('cache.misses')
+
+    return contents
+
+
+# Returns whether a render has been cached for a cache key, without reading it. Like readCacheEntry, a hit refreshes
+# the entries modified time which is used as its last access time for eviction.
+def hasCacheEntry(renderDirectoryPath, cacheKey):
+    cacheFilePath = getCachedRenderPath(renderDirectoryPath, cacheKey)
+
+    if cacheFilePath:
+        customLogger.increment('cache.hits')
+        os.utime(cacheFilePath)
+    else:
+        customLogger.increment('cache.misses')
+
+    return cacheFilePath is not None
+
+
+# Returns the path of the metadata file of a render file
+def getMetadataFilePath(renderFilePath):
+    return os.path.splitext(renderFilePath)[0] + metadataFileExtension
+
+
+# Writes the metadata of a render file, eg. the pdf it was scraped from and the settings used.
+# Every way of saving a render to the cache finishes by writing its metadata, so this counts the cache write.
+def writeRenderMetadata(renderFilePath, metadata):
+    metadata = dict(metadata, created=datetime.now().isoformat())
+    writeFileAtomically(getMetadataFilePath(renderFilePath), json.dumps(metadata))
+    customLogger.increment('cache.writes')
+
+
+# Writes a render and its metadata to the cache, as a text render file of the given contents
+def writeCacheEntry(renderDirectoryPath, cacheKey, contents, metadata):
+    cacheFilePath = getCacheFilePath(renderDirectoryPath, cacheKey)
+    writeFileAtomically(cacheFilePath, contents)
+    writeRenderMetadata(cacheFilePath, metadata)
+
+
+# Writes a render and its metadata to the cache, as a render store of the page results of a scrape
+def writeCacheStore(renderDirectoryPath, cacheKey, pageResults, metadata):
+    cacheFilePath = getCacheFilePath(renderDirectoryPath, cacheKey)
+    renderStore.writeRenderStore(renderStore.getRenderStorePath(cacheFilePath), pageResults)
+    writeRenderMetadata(cacheFilePath, metadata)
+
+
+# Converts every text render file in a render directory to a render store, using the page methods saved to each
+# render's metadata. Returns the number of renders converted.
+def importRenderDirectory(renderDirectoryPath, keepTextRenders=False):
+    imported = 0
+    with os.scandir(renderDirectoryPath) as directoryEntries:
+        renderFilePaths = [entry.path for entry in directoryEntries if entry.is_file()
+                           and entry.name.endswith(renderFileExtension) and not entry.name.startswith('.')]
+
+    for renderFilePath in sorted(renderFilePaths):
+        if os.path.exists(renderStore.getRenderStorePath(renderFilePath)):
+            continue
+
+        metadata = {}
+        if os.path.exists(getMetadataFilePath(renderFilePath)):
+            with open(getMetadataFilePath(renderFilePath), 'r') as metadataFile:
+                metadata = json.load(metadataFile)
+
+        renderStore.importRenderFile(renderFilePath, metadata.get('pageMethods'), keepTextRenders)
+        imported += 1
+
+    customLogger.log("Imported " + str(imported) + " text renders in " + renderDirectoryPath + " to render stores")
+    return imported
+
+
+# Returns the metadata of a cache entry, or an empty dictionary if it has none
+def readCacheMetadata(renderDirectoryPath, cacheKey):
+    metadataFilePath = getMetadataFilePath(getCacheFilePath(renderDirectoryPath, cacheKey))
+    if not os.path.exists(metadataFilePath):
+        return {}
+
+    with open(metadataFilePath, 'r') as metadataFile:
+        return json.load(metadataFile)
+
+
+# Returns the path of the checkpoint directory of a render file
+def getCheckpointDirectoryPath(renderFilePath):
+    return os.path.splitext(renderFilePath)[0] + checkpointDirectoryExtension
+
+
+# Writes the manifest of a checkpoint, describing the pdf being scraped and the settings used
+def writeCheckpointManifest(checkpointDirectoryPath, manifest):
+    os.makedirs(checkpointDirectoryPath, exist_ok=True)
+    manifest = dict(manifest, started=datetime.now().isoformat())
+    writeFileAtomically(os.path.join(checkpointDirectoryPath, checkpointManifestFileName), json.dumps(manifest))
+
+
+# Saves a scraped page result to a checkpoint. Each page is its own file, written atomically, so pages can be saved
+# by several workers at once and a crash never leaves a partial page.
+def writeCheckpointPage(checkpointDirectoryPath, pageResult):
+    os.makedirs(checkpointDirectoryPath, exist_ok=True)
+    pageFileName = 'page-' + str(pageResult['page']).zfill(5) + '.json'
+    writeFileAtomically(os.path.join(checkpointDirectoryPath, pageFileName), json.dumps(pageResult))
+
+
+# Returns a dictionary of page number to page result for the pages saved to a checkpoint
+def readCheckpointPages(checkpointDirectoryPath):
+    pageResults = {}
+    if not os.path.exists(checkpointDirectoryPath):
+        return pageResults
+
+    with os.scandir(checkpointDirectoryPath) as entries:
+        for entry in entries:
+            if entry.name.startswith('page-') and entry.name.endswith('.json'):
+                with open(entry.path, 'r') as pageFile:
+                    pageResult = json.load(pageFile)
+                pageResults[pageResult['page']] = pageResult
+
+    return pageResults
+
+
+# Removes the checkpoint of a render once the render is complete
+def removeCheckpoint(checkpointDirectoryPath):
+    shutil.rmtree(checkpointDirectoryPath, ignore_errors=True)
+
+
+# Removes cache entries older than maxAgeDays, then removes the least recently used entries until the cache is no
+# larger than maxBytes. Either limit can be None to not apply it. Returns the number of entries removed.
+# Checkpoints which have not been written to within maxAgeDays are also removed.
+def evictCacheEntries(renderDirectoryPath, maxBytes=None, maxAgeDays=None):
+    if not os.path.exists(renderDirectoryPath):
+        return 0
+
+    # A render saved in both formats is one entry, last accessed when either was
+    renders = {}
+    with os.scandir(renderDirectoryPath) as directoryEntries:
+        for entry in directoryEntries:
+            cacheKey, extension = os.path.splitext(entry.name)
+            if entry.is_file() and extension in renderFileExtensions and not entry.name.startswith('.'):
+                entryStat = entry.stat()
+                lastAccess, size = renders.get(cacheKey, (0, 0))
+                renders[cacheKey] = (max(lastAccess, entryStat.st_mtime), size + entryStat.st_size)
+    entries = [(lastAccess, size, cacheKey) for cacheKey, (lastAccess, size) in renders.items()]
+
+    # Least recently used first
+    entries.sort()
+    totalBytes = sum(size for _, size, _ in entries)
+    oldestAccess = datetime.now().timestamp() - maxAgeDays * 24 * 60 * 60 if maxAgeDays is not None else None
+
+    evicted = 0
+    for lastAccess, size, cacheKey in entries:
+        isExpired = oldestAccess is not None and lastAccess < oldestAccess
+        isOverBudget = maxBytes is not None and totalBytes > maxBytes
+        if not isExpired and not isOverBudget:
+            break
+
+        cacheFilePath = getCacheFilePath(renderDirectoryPath, cacheKey)
+        for path in (cacheFilePath, renderStore.getRenderStorePath(cacheFilePath), getMetadataFilePath(cacheFilePath)):
+            if os.path.exists(path):
+                os.remove(path)
+
+        totalBytes -= size
+        evicted += 1
+
+    # Remove the checkpoints of scrapes which were abandoned
+    if oldestAccess is not None:
+        with os.scandir(renderDirectoryPath) as directoryEntries:
+            for entry in directoryEntries:
+                if entry.is_dir() and entry.name.endswith(checkpointDirectoryExtension) \
+                        and entry.stat().st_mtime < oldestAccess:
+                    removeCheckpoint(entry.path)
+
+    customLogger.increment('cache.evictions', evicted)
+    return evicted
+
+
+# Logs the cache statistics for this run, counted in the metrics of customLogger
+def logCacheStats():
+    hits = customLogger.getCounter('cache.hits')
+    misses = customLogger.getCounter('cache.misses')
+    hitRate = hits / (hits + misses) * 100 if hits + misses else 0
+    customLogger.log("Render cache: " + str(hits) + " hits, " + str(misses) + " misses ("
+                     + format(hitRate, '.1f') + "% hit rate), " + str(customLogger.getCounter('cache.writes'))
+                     + " writes, " + str(customLogger.getCounter('cache.evictions')) + " evictions")
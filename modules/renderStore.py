@@ -0,0 +1,200 @@
+from modules import dataExtractor, tesseractData
+import os
+import sys
+import sqlite3
+import tempfile
+from array import array
+from urllib.request import pathname2url
+
+# A render store is an SQLite file holding a scrape page by page. Each page keeps its text and its tesseract data as
+# typed columns: one blob of packed integers per coordinate column, a blob of doubles for the confidence and the words
+# joined by new lines. A page is read on its own without reading the rest of the render or parsing any text, and its
+# coordinates are read straight from the blobs.
+renderStoreExtension = '.db'
+
+# Bump when the layout of a render store changes. Version 1 stores, which kept confidences as floats, are still read.
+renderStoreVersion = 2
+readableVersions = (1, 2)
+
+# The names of the tesseract data columns stored as integer blobs, in tesseractData.integerColumns order
+integerColumnNames = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num', 'left', 'top', 'width',
+                      'height')
+
+
+# Returns the path of the render store of a render file
+def getRenderStorePath(renderFilePath):
+    return os.path.splitext(renderFilePath)[0] + renderStoreExtension
+
+
+# Returns a quoted SQLite column name, as some tesseract column names (eg. 'left') are SQL keywords
+def getColumnName(name):
+    return '"' + name + '"'
+
+
+# Writes the page results of a scrape (see pdfToTxt.scrapePdfPages) to a render store.
+# The store is built in a temporary file and moved into place, so a crash never leaves a partial store.
+def writeRenderStore(renderStorePath, pageResults):
+    fileDescriptor, temporaryPath = tempfile.mkstemp(prefix='.', suffix='.tmp',
+                                                     dir=os.path.dirname(renderStorePath) or '.')
+    os.close(fileDescriptor)
+    try:
+        connection = sqlite3.connect(temporaryPath)
+        try:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('CREATE TABLE store (key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE pages (page INTEGER PRIMARY KEY, method TEXT, text TEXT, lines INTEGER, '
+                               + ', '.join(getColumnName(name) + ' BLOB' for name in integerColumnNames)
+                               + ', conf BLOB, words TEXT)')
+            connection.executemany('INSERT INTO store VALUES (?, ?)',
+                                   (('version', str(renderStoreVersion)), ('byteOrder', sys.byteorder)))
+
+            insert = 'INSERT INTO pages VALUES (' + ', '.join('?' * (len(integerColumnNames) + 6)) + ')'
+            for pageResult in pageResults:
+                data = tesseractData.parseTesseractData(pageResult['data'])
+                connection.execute(insert, [pageResult['page'], pageResult.get('method'), pageResult['text'], len(data)]
+                                   + [data.columns[column].tobytes() for column in tesseractData.integerColumns]
+                                   + [data.columns[tesseractData.confColumn].tobytes(),
+                                      '\n'.join(data.columns[tesseractData.textColumn])])
+
+            connection.commit()
+        finally:
+            connection.close()
+
+        with open(temporaryPath, 'rb') as temporaryFile:
+            os.fsync(temporaryFile.fileno())
+        os.replace(temporaryPath, renderStorePath)
+    except Exception:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+# A render store opened for reading. Pages are only read from the file when they are asked for.
+#   with renderStore.RenderStore(path) as render:
+#       data = render.getPageData(0)
+class RenderStore:
+
+    def __init__(self, renderStorePath):
+        self.path = renderStorePath
+        self.connection = sqlite3.connect('file:' + pathname2url(os.path.abspath(renderStorePath)) + '?mode=ro',
+                                          uri=True)
+        store = dict(self.connection.execute('SELECT key, value FROM store'))
+        if int(store['version']) not in readableVersions:
+            self.connection.close()
+            raise ValueError("Render store '" + renderStorePath + "' is version " + store['version'] + ", expected "
+                             + str(renderStoreVersion))
+        self.confTypeCode = 'f' if int(store['version']) == 1 else 'd'
+
+        # Stores written on a machine of the other byte order have their columns copied and swapped when read
+        self.isNativeByteOrder = store['byteOrder'] == sys.byteorder
+        self.pages = [row[0] for row in self.connection.execute('SELECT page FROM pages ORDER BY page')]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    # Returns a column blob as a typed sequence, a memoryview over the blob where the byte order allows
+    def getColumn(self, blob, typeCode):
+        if self.isNativeByteOrder:
+            return memoryview(blob).cast(typeCode)
+        column = array(typeCode, blob)
+        column.byteswap()
+        return column
+
+    # Returns a dictionary of zero based page number to how each page was read ('text' or 'ocr')
+    def getPageMethods(self):
+        return dict(self.connection.execute('SELECT page, method FROM pages ORDER BY page'))
+
+    # Returns the text of a page
+    def getPageText(self, page):
+        row = self.connection.execute('SELECT text FROM pages WHERE page = ?', (page,)).fetchone()
+        if row is None:
+            raise IndexError('page ' + str(page) + ' is not in ' + self.path)
+        return row[0]
+
+    # Returns the tesseract data of a page as typed columns (see tesseractData.TesseractData). The coordinate and
+    # confidence columns are views over the stored blobs rather than parsed copies. Lines are on page + 1, as they
+    # would be parsing the data of the whole render.
+    def getPageData(self, page):
+        row = self.connection.execute('SELECT lines, ' + ', '.join(map(getColumnName, integerColumnNames))
+                                      + ', conf, words FROM pages WHERE page = ?', (page,)).fetchone()
+        if row is None:
+            raise IndexError('page ' + str(page) + ' is not in ' + self.path)
+
+        lines = row[0]
+        words = row[-1].split('\n') if lines else []
+        return tesseractData.getTesseractDataFromColumns(
+            [self.getColumn(blob, 'i') for blob in row[1:-2]], self.getColumn(row[-2], self.confTypeCode),
+            list(map(sys.intern, words)), array('i', [page + 1]) * lines)
+
+    # Returns the tesseract data of a page as text, in the format tesseract outputs it. Only the lines the data was
+    # parsed to are kept (see tesseractData.parseTesseractData): the page, block, paragraph and line rows and words with
+    # no text are not stored.
+    def getPageDataText(self, page):
+        data = self.getPageData(page)
+        rows = [tesseractData.tesseractDataHeader]
+        for index in range(len(data)):
+            rows.append('\t'.join([str(data.columns[column][index]) for column in tesseractData.integerColumns]
+                                  + [tesseractData.formatConfidence(data.columns[tesseractData.confColumn][index]),
+                                     data.columns[tesseractData.textColumn][index]]))
+        return '\n'.join(rows)
+
+    # Returns the text of every page, as the text of a text render file before its '<data>' marker
+    def getText(self):
+        return '\n'.join(self.getPageText(page) for page in self.pages) + '\n'
+
+    # Returns the contents of the render as a text render file would hold them (see pdfToTxt.getRenderContents): all
+    # page text, a '<data>' marker and all page data
+    def getContents(self):
+        completeData = '\n'.join(self.getPageDataText(page) for page in self.pages)
+        return self.getText() + '<data>' + '\n' + completeData
+
+
+# Returns the contents of a render store as a text render file would hold them
+def readRenderContents(renderStorePath):
+    with RenderStore(renderStorePath) as render:
+        return render.getContents()
+
+
+# Returns the page results of a text render file. Its data is split into pages at each tesseract data header, and the
+# text of each page is rebuilt from its data as a text render only holds the text of the whole document. pageMethods
+# is the method each page was read with, as saved to the render's metadata.
+def getTextRenderPages(renderFilePath, pageMethods=None):
+    with open(renderFilePath, 'r') as renderFile:
+        contents = renderFile.read()
+
+    pageResults = []
+    pageLines = None
+    for line in contents.split('<data>', 1)[-1].split('\n'):
+        if line.startswith('level'):
+            pageLines = [line]
+            pageResults.append(pageLines)
+        elif pageLines is not None and line:
+            pageLines.append(line)
+
+    methods = pageMethods or []
+    for page, pageLines in enumerate(pageResults):
+        pageData = '\n'.join(pageLines)
+        pageResults[page] = {'page': page, 'text': dataExtractor.getTesseractDataAsText(pageData), 'data': pageData,
+                             'method': methods[page] if page < len(methods) else None}
+
+    return pageResults
+
+
+# Converts a text render file to a render store beside it, then removes the text render file unless keepTextRender.
+# Returns the path of the render store.
+def importRenderFile(renderFilePath, pageMethods=None, keepTextRender=False):
+    renderStorePath = getRenderStorePath(renderFilePath)
+    writeRenderStore(renderStorePath, getTextRenderPages(renderFilePath, pageMethods))
+    if not keepTextRender:
+        os.remove(renderFilePath)
+    return renderStorePath
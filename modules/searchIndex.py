@@ -0,0 +1,209 @@
+from modules import customLogger, renderCache, renderStore, tesseractData
+import os
+import re
+import sqlite3
+
+# The search index of a render directory is an SQLite file in the directory with this name. Its extension is not a
+# render extension so the render cache does not mistake it for a render.
+searchIndexFileName = 'searchIndex.sqlite'
+
+# Words are split into tokens of letters and digits and matched ignoring case, so 'Number:' is found by 'number'
+tokenExpression = re.compile(r'\w+')
+
+# The most terms a query is looked up with at once, within the SQLite limit of query variables
+termLookupSize = 500
+
+
+# Returns the lower case tokens of some text
+def getTokens(text):
+    return [token.lower() for token in tokenExpression.findall(text)]
+
+
+# Returns the path of the search index of a render directory
+def getSearchIndexPath(renderDirectoryPath):
+    return os.path.join(renderDirectoryPath, searchIndexFileName)
+
+
+# An inverted index of the words of every render in a render directory. Each token is kept with the document it is in,
+# its page, the data line it came from (the line index getTesseractDataAsArrays gives the document's data), its
+# position in the document and its box, so a query finds where a phrase is on a page without opening any render.
+#   with searchIndex.SearchIndex(searchIndex.getSearchIndexPath('renders')) as index:
+#       index.updateRenderDirectory('renders')
+#       hits = index.searchPhrase('policy number')
+class SearchIndex:
+
+    def __init__(self, searchIndexPath):
+        self.path = searchIndexPath
+        self.connection = sqlite3.connect(searchIndexPath)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY, cacheKey TEXT UNIQUE, source TEXT,
+                                                  pages INTEGER);
+            CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE);
+            CREATE TABLE IF NOT EXISTS postings (term INTEGER, document INTEGER, position INTEGER, page INTEGER,
+                                                 line INTEGER, "left" INTEGER, top INTEGER, width INTEGER,
+                                                 height INTEGER, PRIMARY KEY (term, document, position))
+                                                 WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postingsDocument ON postings (document);
+        ''')
+
+        # Term ids by term, filled as terms are looked up
+        self.termIds = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    # Returns the cache keys of the documents in the index
+    def getCacheKeys(self):
+        return {row[0] for row in self.connection.execute('SELECT cacheKey FROM documents')}
+
+    # Returns a dictionary of term to term id for the terms already in the index
+    def getTermIds(self, terms):
+        missingTerms = [term for term in set(terms) if term not in self.termIds]
+        for start in range(0, len(missingTerms), termLookupSize):
+            lookup = missingTerms[start:start + termLookupSize]
+            self.termIds.update(self.connection.execute('SELECT term, id FROM terms WHERE term IN ('
+                                                        + ', '.join('?' * len(lookup)) + ')', lookup))
+        return {term: self.termIds[term] for term in terms if term in self.termIds}
+
+    # Adds a document to the index from the tesseract data of each of its pages (see tesseractData.TesseractData),
+    # replacing it if it was already indexed
+    def indexDocument(self, cacheKey, source, pageData):
+        postings = []
+        position = 0
+        lineOffset = 0
+
+        for page, data in enumerate(pageData):
+            words = data.columns[tesseractData.textColumn]
+            lefts, tops, widths, heights = (data.columns[column] for column in (6, 7, 8, 9))
+            for index in range(len(data)):
+                for token in getTokens(words[index]):
+                    postings.append((token, position, page, lineOffset + index, lefts[index], tops[index],
+                                     widths[index], heights[index]))
+                    position += 1
+            lineOffset += len(data)
+
+        try:
+            with self.connection:
+                self.removeDocument(cacheKey, commit=False)
+                document = self.connection.execute('INSERT INTO documents (cacheKey, source, pages) VALUES (?, ?, ?)',
+                                                   (cacheKey, source, len(pageData))).lastrowid
+
+                tokens = {posting[0] for posting in postings}
+                self.connection.executemany('INSERT OR IGNORE INTO terms (term) VALUES (?)', ((t,) for t in tokens))
+                termIds = self.getTermIds(tokens)
+                self.connection.executemany('INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                            ((termIds[posting[0]], document) + posting[1:] for posting in postings))
+        except Exception:
+            # Terms looked up in the failed transaction were never added
+            self.termIds.clear()
+            raise
+
+        customLogger.increment('search.indexed')
+
+    # Adds a render of a render directory to the index, reading the render in whichever format it was saved
+    def indexRender(self, renderDirectoryPath, cacheKey):
+        renderPath = renderCache.getCachedRenderPath(renderDirectoryPath, cacheKey)
+        source = renderCache.readCacheMetadata(renderDirectoryPath, cacheKey).get('source', cacheKey)
+
+        if renderPath.endswith(renderStore.renderStoreExtension):
+            with renderStore.RenderStore(renderPath) as render:
+                pageData = [render.getPageData(page) for page in render.pages]
+                self.indexDocument(cacheKey, source, pageData)
+        else:
+            pageData = [tesseractData.parseTesseractData(page['data'])
+                        for page in renderStore.getTextRenderPages(renderPath)]
+            self.indexDocument(cacheKey, source, pageData)
+
+    # Removes a document from the index
+    def removeDocument(self, cacheKey, commit=True):
+        row = self.connection.execute('SELECT id FROM documents WHERE cacheKey = ?', (cacheKey,)).fetchone()
+        if row:
+            self.connection.execute('DELETE FROM postings WHERE document = ?', row)
+            self.connection.execute('DELETE FROM documents WHERE id = ?', row)
+            if commit:
+                self.connection.commit()
+
+    # Brings the index up to date with a render directory: renders which are not in the index are added and documents
+    # whose render has been removed (eg. evicted from the cache) are removed. Renders never change once they are saved
+    # as their cache key changes with the pdf and settings, so indexed renders are not read again.
+    # Returns the number of renders added and removed.
+    def updateRenderDirectory(self, renderDirectoryPath):
+        cacheKeys = set()
+        with os.scandir(renderDirectoryPath) as directoryEntries:
+            for entry in directoryEntries:
+                cacheKey, extension = os.path.splitext(entry.name)
+                if entry.is_file() and extension in renderCache.renderFileExtensions and not entry.name.startswith('.'):
+                    cacheKeys.add(cacheKey)
+
+        indexedCacheKeys = self.getCacheKeys()
+        for cacheKey in sorted(cacheKeys - indexedCacheKeys):
+            try:
+                self.indexRender(renderDirectoryPath, cacheKey)
+            except Exception as ex:
+                customLogger.log(ex, 'error')
+
+        for cacheKey in indexedCacheKeys - cacheKeys:
+            self.removeDocument(cacheKey)
+
+        return len(cacheKeys - indexedCacheKeys), len(indexedCacheKeys - cacheKeys)
+
+    # Returns the hits of a query whose tokens are joined to the first token by a condition on their positions.
+    # Each hit is a dictionary of the document's 'cacheKey' and 'source', the zero based 'page' of the first token,
+    # the data line indexes of its tokens as 'lines' and the 'box' (left, top, right, bottom) around the tokens on that
+    # page.
+    def getHits(self, tokens, getPositionCondition, limit=None):
+        termIds = self.getTermIds(tokens)
+        if not tokens or len(termIds) < len(set(tokens)):
+            return []
+
+        columns = ', '.join('p' + str(i) + '.' + column for i in range(len(tokens))
+                            for column in ('page', 'line', '"left"', 'top', 'width', 'height'))
+        joins = ''.join(' JOIN postings p' + str(i) + ' ON p' + str(i) + '.term = ? AND p' + str(i)
+                        + '.document = p0.document AND ' + getPositionCondition('p' + str(i) + '.position', i)
+                        for i in range(1, len(tokens)))
+        query = ('SELECT d.cacheKey, d.source, ' + columns + ' FROM postings p0' + joins
+                 + ' JOIN documents d ON d.id = p0.document WHERE p0.term = ? ORDER BY p0.document, p0.position'
+                 + (' LIMIT ' + str(int(limit)) if limit is not None else ''))
+
+        hits = []
+        for row in self.connection.execute(query, [termIds[token] for token in tokens[1:]] + [termIds[tokens[0]]]):
+            words = [row[start:start + 6] for start in range(2, len(row), 6)]
+            page = words[0][0]
+            boxes = [(left, top, left + width, top + height) for wordPage, _, left, top, width, height in words
+                     if wordPage == page]
+            hits.append({
+                'cacheKey': row[0],
+                'source': row[1],
+                'page': page,
+                'lines': sorted({word[1] for word in words}),
+                'box': (min(box[0] for box in boxes), min(box[1] for box in boxes), max(box[2] for box in boxes),
+                        max(box[3] for box in boxes))
+            })
+
+        customLogger.increment('search.queries')
+        return hits
+
+    # Returns the hits of every occurrence of a phrase, its tokens in order next to each other (see getHits)
+    def searchPhrase(self, phrase, limit=None):
+        return self.getHits(getTokens(phrase), lambda position, i: position + ' = p0.position + ' + str(i), limit)
+
+    # Returns the hits of every occurrence of the first of some words with each of the other words within distance
+    # tokens of it, before or after (see getHits)
+    def searchNear(self, words, distance=5, limit=None):
+        tokens = [token for word in words for token in getTokens(word)]
+        return self.getHits(tokens, lambda position, i: position + ' BETWEEN p0.position - ' + str(int(distance))
+                            + ' AND p0.position + ' + str(int(distance)) + ' AND ' + position + ' != p0.position',
+                            limit)
+
+    # Returns the cache keys of the documents containing a phrase, eg. so a form field anchor (see
+    # dataExtractor.getDataLinesMatchingString) is only searched for in the renders it is in. Tokens are whole words,
+    # so an anchor written without the spaces between its words (which anchors ignore) is not found.
+    def getCacheKeysMatchingString(self, matchingString):
+        return {hit['cacheKey'] for hit in self.searchPhrase(matchingString)}
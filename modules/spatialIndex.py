@@ -0,0 +1,57 @@
+from modules import tesseractData
+
+# The width and height in pixels of a grid cell. At 200 dpi a cell is roughly an inch square.
+defaultCellSize = 200
+
+
+# A grid over the pages of typed tesseract data. Each line is kept in every cell its box overlaps, so a region query
+# only looks at the lines in the cells the region covers rather than every line in the document.
+class SpatialIndex:
+    __slots__ = ('data', 'cellSize', 'cells')
+
+    def __init__(self, data, cellSize=defaultCellSize):
+        self.data = data
+        self.cellSize = cellSize
+        self.cells = {}
+
+        lefts, tops, widths, heights = (data.columns[column] for column in (6, 7, 8, 9))
+        for index, page in enumerate(data.pages):
+            left = lefts[index]
+            top = tops[index]
+            for cell in self.getCells(page, left, top, left + widths[index], top + heights[index]):
+                self.cells.setdefault(cell, []).append(index)
+
+    # Returns the (page, column, row) keys of the cells a box overlaps
+    def getCells(self, page, left, top, right, bottom):
+        for column in range(left // self.cellSize, right // self.cellSize + 1):
+            for row in range(top // self.cellSize, bottom // self.cellSize + 1):
+                yield page, column, row
+
+    # Returns the sorted indexes of the lines on a page which overlap a region, or are entirely inside it if contained
+    def query(self, page, left, top, right, bottom, contained=False):
+        candidates = set()
+        for cell in self.getCells(page, left, top, right, bottom):
+            candidates.update(self.cells.get(cell, ()))
+
+        matches = []
+        for index in candidates:
+            lineLeft, lineTop, lineRight, lineBottom = self.data.getBox(index)
+            if contained:
+                isMatch = lineLeft >= left and lineTop >= top and lineRight <= right and lineBottom <= bottom
+            else:
+                isMatch = lineLeft <= right and lineTop <= bottom and lineRight >= left and lineBottom >= top
+            if isMatch:
+                matches.append(index)
+
+        return sorted(matches)
+
+
+# Returns the spatial index of typed tesseract data, building it on first use and keeping it with the data
+def getSpatialIndex(data, cellSize=defaultCellSize):
+    if not isinstance(data, tesseractData.TesseractData):
+        raise TypeError('A spatial index needs typed data, see dataExtractor.getTesseractDataAsColumns')
+
+    key = ('spatial', cellSize)
+    if key not in data.indexes:
+        data.indexes[key] = SpatialIndex(data, cellSize)
+    return data.indexes[key]
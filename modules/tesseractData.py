@@ -0,0 +1,220 @@
+import sys
+from array import array
+from itertools import accumulate, compress, repeat
+from operator import and_
+from modules import dataExtractor
+
+# Install NumPy (https://numpy.org/install/) (optional)
+# Mac		- pip install numpy
+# Windows	- pip install numpy
+# When installed, the integer columns of tesseract data are converted by NumPy rather than a string at a time
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Tesseract data columns, in the order getTesseractDataAsArrays returns them
+# [0]level [1]page_num [2]block_num [3]par_num [4]line_num [5]word_num [6]left [7]top [8]width [9]height [10]conf
+# [11]text [12] line_index
+integerColumns = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+confColumn = 10
+textColumn = 11
+indexColumn = 12
+columnCount = 13
+
+# The header line tesseract starts the data of each page with
+tesseractDataHeader = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+
+# A parsed copy of tesseract data held as typed columns rather than a list of string lists.
+# Coordinates are stored once as integers, confidence as a double and text as interned strings. Indexing the data
+# returns a DataLine, which reads like the column lists of getTesseractDataAsArrays so existing helpers keep working.
+class TesseractData:
+    __slots__ = ('columns', 'pages', 'indexes')
+
+    def __init__(self):
+        # Indexes over the data (eg. the spatial index), built on first use
+        self.indexes = {}
+
+        # One array per integer column, the conf and text columns and a range for the line index
+        self.columns = [array('i') for _ in integerColumns] + [array('d'), [], range(0)]
+
+        # The page of the document each line is on (1 based), counted from the data headers
+        self.pages = array('i')
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [DataLine(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('data line index out of range')
+        return DataLine(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield DataLine(self, index)
+
+    # Adds lines from their split string columns and the page each line is on. Each column is converted in one pass.
+    # Lines must have at least the 12 tesseract data columns, any further columns are ignored.
+    def extend(self, rows, pages):
+        if rows:
+            self.extendColumns(list(zip(*rows)), pages)
+
+    # Adds lines from lists of the strings of each of their 12 tesseract data columns and the page each line is on
+    def extendColumns(self, columns, pages):
+        if not pages:
+            return
+
+        for column in integerColumns:
+            self.columns[column].extend(getIntegerArray(columns[column]))
+        self.columns[confColumn].extend(array('d', map(float, columns[confColumn])))
+        self.columns[textColumn].extend(map(sys.intern, columns[textColumn]))
+        self.pages.extend(pages)
+        self.columns[indexColumn] = range(len(self.pages))
+        self.indexes.clear()
+
+    # Returns the left, top, right and bottom coordinates of a line
+    def getBox(self, index):
+        left = self.columns[6][index]
+        top = self.columns[7][index]
+        return left, top, left + self.columns[8][index], top + self.columns[9][index]
+
+
+# The data lines of getTesseractDataAsArrays, a list of the column lists of each line which keeps indexes over its lines
+# (eg. the anchor index) like TesseractData, so they are dropped with the lines rather than kept in a cache.
+class DataLines(list):
+    __slots__ = ('indexes',)
+
+    def __init__(self, lines=()):
+        super().__init__(lines)
+        self.indexes = {}
+
+
+# A view of a single line of TesseractData. Indexing it returns the typed value of a column.
+class DataLine:
+    __slots__ = ('data', 'index')
+
+    def __init__(self, data, index):
+        self.data = data
+        self.index = index
+
+    def __getitem__(self, column):
+        if isinstance(column, slice):
+            return [self[c] for c in range(*column.indices(columnCount))]
+        return self.data.columns[column][self.index]
+
+    def __len__(self):
+        return columnCount
+
+    def __iter__(self):
+        for column in range(columnCount):
+            yield self[column]
+
+    def __eq__(self, other):
+        return isinstance(other, DataLine) and other.data is self.data and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.data), self.index))
+
+    def __repr__(self):
+        return 'DataLine(' + repr(list(self)) + ')'
+
+
+# Returns TesseractData over existing typed columns without copying them, eg. memoryviews of the blobs of a render
+# store (see renderStore). integerValues are the integerColumns, conf the confidences, text the words and pages the page
+# each line is on. The data can be read but not extended.
+def getTesseractDataFromColumns(integerValues, conf, text, pages):
+    tesseractData = TesseractData()
+    tesseractData.columns = list(integerValues) + [conf, text, range(len(pages))]
+    tesseractData.pages = pages
+    return tesseractData
+
+
+# Returns a confidence as tesseract writes it in its data, whole numbers without a decimal point. Confidences are kept
+# as doubles, so the shortest repr of one is the number tesseract wrote.
+def formatConfidence(conf):
+    return str(int(conf)) if conf.is_integer() else repr(conf)
+
+
+# Returns an array of the integers of a list of strings. NumPy reads the whole column in one call, without it each
+# distinct string is converted once as columns of tesseract data repeat a few values (levels, page and block numbers,
+# coordinates on a page). A column NumPy cannot read whole, or whose values do not fit the array, is converted by int
+# so the bad value raises as it always has.
+def getIntegerArray(values):
+    if numpy is not None and values:
+        try:
+            integers = numpy.fromstring('\t'.join(values), dtype=numpy.int64, sep='\t')
+        except (ValueError, DeprecationWarning):
+            integers = ()
+
+        if len(integers) == len(values) and -2 ** 31 <= integers.min() and integers.max() < 2 ** 31:
+            return array('i', integers.astype(numpy.int32).tobytes())
+
+    integers = {value: int(value) for value in set(values)}
+    return array('i', map(integers.__getitem__, values))
+
+
+# Parses tesseract data into TesseractData, keeping the same lines getTesseractDataAsArrays keeps.
+# Tesseract writes 12 columns on every line, data which does is split into its fields once and each column is taken
+# and converted whole, so no work is done per line in python. Any other data is parsed a line at a time.
+def parseTesseractData(data):
+    lines = list(filter(None, data.split('\n')))
+    if set(map(str.count, lines, repeat('\t'))) <= {columnCount - 2}:
+        return parseTesseractDataColumns(lines)
+
+    rows = []
+    pages = array('i')
+    page = 0
+
+    for line in lines:
+        # Split the line into an array of columns
+        columns = line.split('\t')
+
+        # A data header starts the data of the next page
+        if columns[0] == 'level':
+            page += 1
+            continue
+
+        # No line if it has no value
+        if len(columns) < 12 or not columns[11]:
+            continue
+
+        # Continue if the first column is text
+        if not dataExtractor.stringIsInt(columns[0]):
+            continue
+
+        rows.append(columns)
+        pages.append(page or 1)
+
+    tesseractData = TesseractData()
+    tesseractData.extend(rows, pages)
+    return tesseractData
+
+
+# Parses the lines of tesseract data which all have the 12 tesseract columns (see parseTesseractData), a column at a
+# time: the lines kept are chosen by their level and text columns and every column is filtered by the same choice
+def parseTesseractDataColumns(lines):
+    lineColumnCount = columnCount - 1
+    fields = '\t'.join(lines).split('\t')
+    levels = fields[0::lineColumnCount]
+
+    # Data headers start the data of the next page and are not kept, nor are lines which are not words or have no text
+    levelValues = set(levels)
+    isHeader = {level: level == 'level' for level in levelValues}
+    isDataLine = {level: dataExtractor.stringIsInt(level) for level in levelValues}
+    selectors = list(map(and_, map(isDataLine.__getitem__, levels), map(bool, fields[textColumn::lineColumnCount])))
+
+    # The page of each line is the number of headers before it, lines before the first header are on page 1
+    pageNumbers = accumulate(map(isHeader.__getitem__, levels))
+    if not isHeader[levels[0]]:
+        pageNumbers = map(max, pageNumbers, repeat(1))
+    pages = array('i', compress(pageNumbers, selectors))
+
+    tesseractData = TesseractData()
+    tesseractData.extendColumns([list(compress(fields[column::lineColumnCount], selectors))
+                                 for column in range(lineColumnCount)], pages)
+    return tesseractData
@@ -0,0 +1,118 @@
+# The implementations of dataExtractor functions before they were optimised, kept to check the optimised versions
+# return the same results (see test_dataExtractor). Only 'is' comparisons of integers are changed to '==' and long
+# lines are wrapped.
+
+
+# Returns a list of lines which sequentially match a given string.
+# By giving a startIndex, you can return the first match after the given index.
+def getDataLinesMatchingString(matchingString, data, startIndex=0):
+    # Strip the whitespace to ensure white spaces do not prevent matches
+    matchingString = matchingString.replace(' ', '')
+    lineMatches = []
+    matchCopy = matchingString
+
+    for line in data[startIndex:]:
+        # Do nothing if we find a match
+        if not matchCopy:
+            break
+        else:
+            # try find a match, if one is found we will add the matching line to our return list and remove that
+            # text from  our matching text
+            line[11] = line[11].replace(' ', '')
+
+            # As we are looking for a sequence of matching lines, we should ensure that the line we check matches the
+            # start of the remaining string.
+            if matchCopy.find(line[11]) == 0:
+                if line[11]:
+                    lineMatches.append(line)
+                    matchCopy = matchCopy.replace(line[11], '')
+            else:
+                lineMatches = []
+                matchCopy = matchingString
+
+    return lineMatches
+
+
+# Get the text contents of a table split by the column. All rows will be concat to the same string
+def getTableColumns(preLines, postLines, ODFirstColumnHeader, ODLastColumnHeader, numberOfColumns, data,
+                    combineColumns=False, skipIndex=[]):
+    # Null check, parameters should have values.
+    if not preLines \
+            or not postLines \
+            or not ODFirstColumnHeader \
+            or not ODLastColumnHeader \
+            or not numberOfColumns \
+            or not data:
+        return None
+
+    # Step 1: Determine the width of the table columns assuming they will be the same width
+
+    # Get the spacial difference between the left of the left column and the left of the first column header text
+    # essentially: left coordinate of text minus left coordinate of table (assuming the pre text left == table left)
+    columnOneHeaderGap = int(ODFirstColumnHeader[0][6]) - int(preLines[0][6])
+
+    # Get the left position of the start of the pre lines (left position of table)
+    leftOfColumnOne = int(preLines[0][6])
+    # Get the right position of the first column
+    # essentially: right of first column header + the gap between the text and the column side (assuming text justified)
+    rightOfColumnOne = getRightOfDataLine(ODFirstColumnHeader[len(ODFirstColumnHeader) - 1]) + columnOneHeaderGap
+
+    # Define the column widths assuming the columns are of equal width
+    columnWidth = rightOfColumnOne - leftOfColumnOne
+
+    # Step 2: Determine the rows we will be looping through for the table text
+
+    startIndex = ODLastColumnHeader[len(ODLastColumnHeader) - 1][12] + 1
+    endIndex = postLines[0][12] - 1
+    tableRange = endIndex - startIndex
+
+    # This is the array which will contain table column text
+    tableText = '' if combineColumns else []
+
+    # Loop through the data rows which contain text in the table
+    for i in range(numberOfColumns):
+
+        # Step 3: Determine the left and right coordinates for the column iterate
+
+        columnNumber = i + 1
+        columnLeft = leftOfColumnOne + ((columnNumber - 1) * columnWidth)
+        columnRight = leftOfColumnOne + (columnNumber * columnWidth)
+
+        # This is the string that will contain
+        columnText = ''
+
+        # Loop for the number of data rows that contain the table text
+        for loopIndex in range(tableRange):
+
+            # Step 4: Determine if the text of the data line is within the column. If true, add it to the column string
+            rowIndex = startIndex + loopIndex
+
+            # If the row we are looping through has an index that matches our skip index, we will ignore it
+            if skipIndex and skipIndex[0] and skipIndex[1]:
+                if skipIndex[0] <= rowIndex <= skipIndex[1]:
+                    continue
+
+            # Define the left and right coordinates of the line
+            lineLeft = int(data[rowIndex][6])
+            lineRight = lineLeft + int(data[rowIndex][8])
+
+            # If the coordinates fit inside our column, add the text to our column string.
+            # The first column should always pass the left check and the last column should always pass the right check.
+            if (columnNumber == 1 or lineLeft >= columnLeft) \
+                    and (columnNumber == numberOfColumns or lineRight <= columnRight):
+                columnText = columnText + ' ' + data[rowIndex][11]
+
+        # Once we have looped through the table text data lines, add the column text to our table text array
+        if combineColumns:
+            tableText = tableText + ' ' + columnText.lstrip()
+            tableText = tableText.lstrip()
+        else:
+            tableText.append(columnText.lstrip())
+
+    # Return all table data in their respective columns
+    return tableText
+
+
+# Gets the right coordinate of a data line
+def getRightOfDataLine(line):
+    return int(line[6]) + int(line[8])
@@ -0,0 +1,70 @@
+import io
+import os
+import sys
+import pymupdf
+import tesserocr
+from PIL import Image
+
+# Captures the tesseract data and text fixtures from pages drawn with PyMuPDF, recognised once by tesseract through
+# tesserocr: <page>.tsv is the data image_to_data gives and <page>.txt the text image_to_string gives, ending in the page
+# separator tesseract writes after each page.
+# Run from the directory of the repository with: python3 tests/fixtures/captureFixtures.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from modules import tesseractData
+
+fixtureDirectoryPath = os.path.dirname(os.path.abspath(__file__))
+
+# The resolution pages are rendered at before they are recognised
+captureResolution = 200
+
+
+# Draws a form with a title, two blocks of fields side by side and a footer
+def drawMultiBlock(page):
+    page.insert_text((72, 72), 'Claim Form', fontsize=20)
+    for index, line in enumerate(['Policy Number: AB-123456', 'Name of Insured: Jane Smith',
+                                  'Date of Claim: 04/05/2021']):
+        page.insert_text((72, 130 + index * 18), line, fontsize=12)
+    for index, line in enumerate(['Office use only', 'Received: 12/05/2021', 'Assessor: R. Jones']):
+        page.insert_text((380, 130 + index * 18), line, fontsize=12)
+    page.insert_text((72, 700), 'Please return this form to the claims office.', fontsize=10)
+
+
+# Draws a heading, paragraphs of several lines separated by a blank line and a page number
+def drawMultiParagraph(page):
+    page.insert_text((72, 72), 'Terms and Conditions', fontsize=16)
+    top = 120
+    for paragraph in [['1. The policy holder must report any', 'claim within 30 days of the loss.'],
+                      ['2. Cover does not extend to wear', 'and tear or gradual deterioration.', 'See schedule.']]:
+        for line in paragraph:
+            page.insert_text((72, top), line, fontsize=12)
+            top += 16
+        top += 24
+    page.insert_text((250, 740), 'Page 2 of 4', fontsize=10)
+
+
+# Draws nothing, leaving a blank page
+def drawEmptyPage(page):
+    pass
+
+
+fixturePageDrawers = {'multiBlock': drawMultiBlock, 'multiParagraph': drawMultiParagraph, 'emptyPage': drawEmptyPage}
+
+
+# Returns a letter sized page drawn by a function as a PIL image
+def getPageImage(drawPage):
+    with pymupdf.open() as document:
+        page = document.new_page(width=612, height=792)
+        drawPage(page)
+        pixmap = page.get_pixmap(dpi=captureResolution)
+        return Image.open(io.BytesIO(pixmap.tobytes('png'))).convert('RGB')
+
+
+if __name__ == '__main__':
+    with tesserocr.PyTessBaseAPI(lang='eng') as engine:
+        for pageName, drawPage in fixturePageDrawers.items():
+            engine.SetImage(getPageImage(drawPage))
+            with open(os.path.join(fixtureDirectoryPath, pageName + '.tsv'), 'w') as dataFile:
+                dataFile.write(tesseractData.tesseractDataHeader + '\n' + engine.GetTSVText(0))
+            with open(os.path.join(fixtureDirectoryPath, pageName + '.txt'), 'w') as textFile:
+                textFile.write(engine.GetUTF8Text() + '\x0c')
+    print("Captured with tesseract " + tesserocr.tesseract_version().splitlines()[0])
@@ -0,0 +1,38 @@
+from modules import adaptiveResolution, tesseractData
+
+
+# Returns tesseract data of words, each word a tuple of its block, text, left, top and confidence, 40 wide and 10 high
+def getData(words):
+    rows = [tesseractData.tesseractDataHeader, '1\t1\t0\t0\t0\t0\t0\t0\t500\t500\t-1\t']
+    for number, (block, text, left, top, confidence) in enumerate(words):
+        rows.append('\t'.join(str(column) for column in (5, 1, block, 1, 1, number + 1, left, top, 40, 10, confidence,
+                                                         text)))
+    return '\n'.join(rows) + '\n'
+
+
+# Returns the block, text, box and confidence of each word of tesseract data
+def getWords(data):
+    data = tesseractData.parseTesseractData(data)
+    return [(data[i][2], data[i][11], data.getBox(i), data[i][10]) for i in range(len(data))]
+
+
+# The blocks scraped again replace every word of their first pass block, where that block was, moved to where their
+# crop is on the page, while the other blocks are scaled up to the full resolution. Blocks are numbered in page order.
+def testScrapedBlocksReplaceTheirWords():
+    firstPass = getData([(1, 'Policy', 10, 10, 95), (1, 'number', 60, 10, 93),
+                         (2, 'CIa1m', 10, 40, 40), (2, 'f0rm', 60, 40, 35),
+                         (3, 'Date', 10, 70, 96)])
+    assert adaptiveResolution.getLowConfidenceBlocks(firstPass, 70) == ({2: (10, 40, 100, 50)}, 2, 5)
+
+    # The crop of block 2 at the full resolution, read as two blocks
+    cropData = getData([(1, 'Claim', 12, 12, 91), (1, 'form', 112, 12, 90), (2, 'AB-123', 12, 40, 88)])
+    merged = adaptiveResolution.mergeBlockData(firstPass, 2, {2: (cropData, 8, 68)}, (1000, 1000))
+
+    assert getWords(merged) == [(1, 'Policy', (20, 20, 100, 40), 95), (1, 'number', (120, 20, 200, 40), 93),
+                                (2, 'Claim', (20, 80, 60, 90), 91), (2, 'form', (120, 80, 160, 90), 90),
+                                (3, 'AB-123', (20, 108, 60, 118), 88),
+                                (4, 'Date', (20, 140, 100, 160), 96)]
+
+    # Without blocks scraped again the first pass is only scaled
+    assert getWords(adaptiveResolution.scaleData(firstPass, 2, (1000, 1000)))[2:4] == \
+        [(2, 'CIa1m', (20, 80, 100, 100), 40), (2, 'f0rm', (120, 80, 200, 100), 35)]
@@ -0,0 +1,86 @@
+import os
+import pytest
+
+# Scraping needs Wand and reading the text layer of the test pdfs needs PyMuPDF
+pytest.importorskip('wand.image', exc_type=ImportError)
+pymupdf = pytest.importorskip('pymupdf')
+
+from modules import batchScraper, customLogger, pdfToTxt
+
+
+# Writes a pdf with a text layer on each of its pages and returns its path
+def writeTextPdf(directoryPath, name, pageCount):
+    pdfPath = os.path.join(directoryPath, name + '.pdf')
+    with pymupdf.open() as document:
+        for pageNumber in range(pageCount):
+            page = document.new_page()
+            page.insert_text((72, 72), name + ' policy number ' + str(pageNumber) + ' of the claim form')
+        document.save(pdfPath)
+    return pdfPath
+
+
+# The metrics merged from the workers count each pdf and page once, however many batches this process has run
+def testBatchMetricsMatchScrapedPdfsAndPages(tmp_path):
+    assert pdfToTxt.pymupdf is not None
+    customLogger.resetMetrics()
+
+    # Metrics this process has already collected are not handed back again by the workers it starts
+    customLogger.increment('pdfs.scraped', 5)
+    firstBatch = [writeTextPdf(str(tmp_path), 'first' + str(i), 3) for i in range(2)]
+    extracts, failures = batchScraper.scrapePdfs(firstBatch, str(tmp_path), 'renders', 72, workers=2,
+                                                 indexRenders=False)
+
+    assert not failures and len(extracts) == 2
+    assert customLogger.getCounter('pdfs.scraped') == 5 + 2
+    assert customLogger.getCounter('cache.misses') == 2
+    assert customLogger.getCounter('cache.writes') == 2
+    assert customLogger.getCounter('pages.text') == 6
+
+    secondBatch = [writeTextPdf(str(tmp_path), 'second' + str(i), 2) for i in range(2)]
+    extracts, failures = batchScraper.scrapePdfs(secondBatch + firstBatch, str(tmp_path), 'renders', 72, workers=2,
+                                                 indexRenders=False)
+
+    assert not failures and len(extracts) == 4
+    assert customLogger.getCounter('pdfs.scraped') == 5 + 4
+    assert customLogger.getCounter('cache.misses') == 4
+    assert customLogger.getCounter('cache.hits') == 2
+    assert customLogger.getCounter('cache.writes') == 4
+    assert customLogger.getCounter('pages.text') == 10
+    customLogger.resetMetrics()
+
+
+# Without collectExtracts the renders are saved but no extract is read or kept, cached renders are only checked to exist
+def testBatchWithoutExtracts(tmp_path, monkeypatch):
+    pdfPaths = [writeTextPdf(str(tmp_path), 'claim' + str(i), 2) for i in range(3)]
+    extracts, failures = batchScraper.scrapePdfs(pdfPaths[:2], str(tmp_path), 'renders', 72, workers=2,
+                                                 indexRenders=False, collectExtracts=False)
+    assert not failures and extracts == {pdfPaths[0]: None, pdfPaths[1]: None}
+
+    # Cached renders are not read, in this process or the workers it forks
+    monkeypatch.setattr(pdfToTxt.renderCache, 'readCacheEntry', None)
+    extracts, failures = batchScraper.scrapePdfs(pdfPaths, str(tmp_path), 'renders', 72, workers=2,
+                                                 indexRenders=False, collectExtracts=False)
+    assert not failures and extracts == {pdfPath: None for pdfPath in pdfPaths}
+    monkeypatch.undo()
+
+    extracts, failures = batchScraper.scrapePdfs(pdfPaths, str(tmp_path), 'renders', 72, workers=2,
+                                                 indexRenders=False)
+    assert not failures and sorted(extracts) == sorted(pdfPaths)
+    assert all('claim' in extracts[pdfPath][0] for pdfPath in pdfPaths)
+
+
+# Batches given a pool are scraped by its workers, which are kept from one batch to the next
+def testBatchesShareAWorkerPool(tmp_path):
+    with batchScraper.WorkerPool(2) as pool:
+        extracts, failures = batchScraper.scrapePdfs([writeTextPdf(str(tmp_path), 'first', 2)], str(tmp_path),
+                                                     'renders', 72, indexRenders=False, pool=pool)
+        assert not failures and len(extracts) == 1
+        executor = pool.getExecutor()
+        workerIds = set(executor._processes)
+
+        extracts, failures = batchScraper.scrapePdfs([writeTextPdf(str(tmp_path), 'second', 2)], str(tmp_path),
+                                                     'renders', 72, indexRenders=False, pool=pool)
+        assert not failures and len(extracts) == 1
+        assert pool.getExecutor() is executor and set(executor._processes) == workerIds
+
+    assert pool.executor is None
@@ -0,0 +1,39 @@
+import pytest
+from modules import customLogger
+
+
+# The peak resident memory of a process is taken from when it was last reset, so a long running worker reports the
+# peak of each task rather than of every task it has run
+def testPeakResidentMemoryIsTakenFromReset():
+    if not customLogger.resetPeakResidentMemory():
+        pytest.skip("The peak resident memory can only be reset on linux")
+
+    allocation = bytearray(256 * 1024 * 1024)
+    allocation[::4096] = b'\x01' * len(allocation[::4096])
+    peakWithAllocation = customLogger.getPeakResidentMemory()
+    del allocation
+
+    assert customLogger.resetPeakResidentMemory()
+    peakAfterReset = customLogger.getPeakResidentMemory()
+    assert peakWithAllocation - peakAfterReset > 128 * 1024 * 1024
+    assert peakAfterReset <= customLogger.getResidentMemory() + 16 * 1024 * 1024
+
+
+# Flushing writes every queued message to the log file without stopping the listener, so workers can flush after each
+# task without starting logging again
+def testFlushKeepsTheListener(tmp_path, monkeypatch):
+    customLogger.stopLogging()
+    logFilePath = tmp_path / 'logs.log'
+    monkeypatch.setattr(customLogger, 'logFileName', str(logFilePath))
+
+    customLogger.log('first message', 'debug')
+    listener = customLogger.logListener
+    customLogger.flush()
+    assert 'first message' in logFilePath.read_text()
+
+    customLogger.log('second message', 'debug')
+    customLogger.flush()
+    assert 'second message' in logFilePath.read_text()
+    assert customLogger.logListener is listener
+
+    customLogger.stopLogging()
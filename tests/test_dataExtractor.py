@@ -0,0 +1,187 @@
+import copy
+import os
+import random
+import pytest
+from modules import anchorIndex, dataExtractor, tesseractData
+import baselineDataExtractor
+
+# Pairs of tesseract data (image_to_data) and text (image_to_string) output for the same page, named <page>.tsv and
+# <page>.txt, captured from tesseract with tests/fixtures/captureFixtures.py
+fixtureDirectoryPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+fixturePages = ['multiBlock', 'multiParagraph', 'emptyPage']
+
+# The number of randomised cases the optimised functions are checked against their baseline versions with
+randomisedCases = 3000
+
+
+# Returns the contents of a fixture file
+def readFixture(fileName):
+    with open(os.path.join(fixtureDirectoryPath, fileName), 'r') as fixtureFile:
+        return fixtureFile.read()
+
+
+# Returns tesseract data of words laid out in rows, one data line per word, as getTesseractDataAsArrays returns it
+def getRowsData(generator, vocabulary, rowCount):
+    lines = []
+    for row in range(rowCount):
+        left = generator.randint(0, 40)
+        for word in range(generator.randint(1, 8)):
+            text = generator.choice(vocabulary)
+            width = generator.randint(10, 200)
+            lines.append(['5', '1', '1', '1', str(row + 1), str(word + 1), str(left), str(row * 40), str(width),
+                          '30', '90', text])
+            left += width + generator.randint(5, 120)
+
+    data = '\n'.join('\t'.join(line) for line in lines)
+    return dataExtractor.getTesseractDataAsArrays(data), dataExtractor.getTesseractDataAsColumns(data)
+
+
+# The text rebuilt from the data of a page is the text tesseract outputs for it, without its trailing page break
+@pytest.mark.parametrize('page', fixturePages)
+def testTesseractDataAsTextMatchesTesseractText(page):
+    expectedText = readFixture(page + '.txt').rstrip('\n\x0c')
+    assert dataExtractor.getTesseractDataAsText(readFixture(page + '.tsv')) == expectedText
+
+
+# getTableColumns returns what it returned before it was optimised, for both list and typed data
+def testTableColumnsMatchBaseline():
+    generator = random.Random(1)
+    vocabulary = ['Item', 'Qty', 'Price', 'Total', '12', '3.50', 'Widget', 'Bolt', '-']
+
+    for case in range(randomisedCases):
+        arrays, columns = getRowsData(generator, vocabulary, generator.randint(2, 30))
+        first = generator.randint(0, len(arrays) - 1)
+        last = min(len(arrays) - 1, first + generator.randint(0, 3))
+        post = generator.randint(last, len(arrays) - 1)
+
+        # The table's left varies so column widths include zero and negative widths
+        preLine = list(arrays[generator.randint(0, len(arrays) - 1)])
+        preLine[6] = str(generator.randint(0, 1600))
+        numberOfColumns = generator.randint(1, 8)
+        combineColumns = generator.random() < 0.3
+        skipIndex = sorted(generator.randint(0, len(arrays)) for _ in range(2)) if generator.random() < 0.3 else []
+
+        expected = baselineDataExtractor.getTableColumns([preLine], [arrays[post]], [arrays[first]], [arrays[last]],
+                                                         numberOfColumns, arrays, combineColumns, skipIndex)
+        assert dataExtractor.getTableColumns([preLine], [arrays[post]], [arrays[first]], [arrays[last]],
+                                             numberOfColumns, arrays, combineColumns, skipIndex) == expected, case
+        assert dataExtractor.getTableColumns([preLine], [columns[post]], [columns[first]], [columns[last]],
+                                             numberOfColumns, columns, combineColumns, skipIndex) == expected, case
+
+
+# getDataLinesMatchingString finds what it found before it was given an anchor index. The baseline did not retry a
+# line which broke a partial match, so where it found a match the index may find an earlier one, and the baseline
+# returned partial matches when the data ran out, which the index does not.
+def testDataLinesMatchingStringMatchesBaseline():
+    generator = random.Random(5)
+    vocabulary = ['Policy', 'Number', 'Date', 'of', 'Birth', 'A B', '', 'Po', 'licy', 'x']
+
+    for case in range(randomisedCases):
+        words = [generator.choice(vocabulary) for _ in range(generator.randint(0, 40))]
+        data = [['5', '1', '1', '1', '1', '1', '0', '0', '1', '1', '90', word, index]
+                for index, word in enumerate(words)]
+        wordCount = generator.randint(1, 3)
+        anchor = ' '.join(generator.choice(vocabulary) for _ in range(wordCount))
+        if words and generator.random() < 0.5:
+            first = generator.randint(0, len(words) - 1)
+            anchor = ' '.join(words[first:first + wordCount])
+        startIndex = generator.randint(0, 5)
+
+        expected = [line[12] for line in
+                    baselineDataExtractor.getDataLinesMatchingString(anchor, copy.deepcopy(data), startIndex)]
+        found = [line[12] for line in dataExtractor.getDataLinesMatchingString(anchor, data, startIndex)]
+
+        expectedComplete = ''.join(words[i].replace(' ', '') for i in expected) == anchor.replace(' ', '')
+        if expectedComplete and found != expected:
+            assert found and found[0] <= expected[0], case
+        if found:
+            assert ''.join(words[i].replace(' ', '') for i in found) == anchor.replace(' ', ''), case
+
+        # Finding several anchors at once finds each as it is found alone
+        anchors = [anchor, 'Policy', 'Po', 'DateofBirth']
+        for matchingString, lines in dataExtractor.getDataLinesMatchingStrings(anchors, data, startIndex).items():
+            assert [line[12] for line in lines] == \
+                [line[12] for line in dataExtractor.getDataLinesMatchingString(matchingString, data, startIndex)], case
+
+
+# Returns random tesseract data lines: data headers, lines without text, negative confidences and, with
+# otherLines, lines with too few or too many columns and a level which is not an integer
+def getRandomTesseractData(generator, otherLines):
+    lines = [] if generator.random() < 0.3 else [tesseractData.tesseractDataHeader]
+    for _ in range(generator.randint(0, 60)):
+        roll = generator.random()
+        if roll < 0.05:
+            lines.append(tesseractData.tesseractDataHeader)
+        elif roll < 0.1:
+            lines.append('')
+        elif otherLines and roll < 0.2:
+            lines.append('\t'.join(generator.choice(['5', 'x', '']) for _ in range(generator.randint(1, 11))))
+        else:
+            level = generator.choice(['1', '2', '3', '4', '5', 'text'] if otherLines else ['1', '2', '3', '4', '5'])
+            columns = [level] + [str(generator.randint(-5, 3000)) for _ in range(9)]
+            columns += [generator.choice(['-1', '95', '87.25', '0']), generator.choice(['', 'Policy', 'No.', '£5'])]
+            if otherLines and generator.random() < 0.1:
+                columns.append('extra')
+            lines.append('\t'.join(columns))
+    return '\n'.join(lines)
+
+
+# getTesseractDataAsColumns keeps the lines getTesseractDataAsArrays keeps, typed, and counts their pages from the data
+# headers, with and without NumPy and whether or not every line has the tesseract columns
+@pytest.mark.parametrize('withNumpy', [True, False])
+def testTesseractDataAsColumnsMatchesArrays(withNumpy, monkeypatch):
+    if not withNumpy:
+        monkeypatch.setattr(tesseractData, 'numpy', None)
+    generator = random.Random(6)
+
+    for case in range(randomisedCases // 10):
+        data = getRandomTesseractData(generator, case % 2 == 1)
+        arrays = dataExtractor.getTesseractDataAsArrays(data)
+        columns = dataExtractor.getTesseractDataAsColumns(data)
+
+        assert len(columns) == len(arrays), case
+        for line, typedLine in zip(arrays, columns):
+            assert [int(value) for value in line[0:10]] == typedLine[0:10], case
+            assert (float(line[10]), line[11], line[-1]) == (typedLine[10], typedLine[11], typedLine[12]), case
+
+        pages = []
+        page = 0
+        for line in filter(None, data.split('\n')):
+            if line.startswith('level'):
+                page += 1
+            elif dataExtractor.stringIsInt(line.split('\t')[0]) and len(line.split('\t')) >= 12 and \
+                    line.split('\t')[11]:
+                pages.append(page or 1)
+        assert list(columns.pages) == pages, case
+
+
+# getTablesColumns returns the tables getTableColumns returns for each table alone
+def testTablesColumnsMatchTableColumns():
+    generator = random.Random(2)
+    arrays, columns = getRowsData(generator, ['Item', 'Qty', 'Price', 'Widget', '3.50'], 12)
+    tables = [{'preLines': [columns[0]], 'postLines': [columns[11]], 'ODFirstColumnHeader': [columns[1]],
+               'ODLastColumnHeader': [columns[2]], 'numberOfColumns': numberOfColumns}
+              for numberOfColumns in (1, 3)]
+    tables.append(dict(tables[1], combineColumns=True, skipIndex=[4, 6]))
+
+    assert dataExtractor.getTablesColumns(tables, columns) == \
+        [dataExtractor.getTableColumns(data=columns, **table) for table in tables]
+    assert dataExtractor.getTablesColumns([], columns) == []
+
+
+# The anchor index of the data lines of getTesseractDataAsArrays is kept with the lines, so it is dropped with them, and
+# is built again when lines are added
+def testAnchorIndexIsKeptWithTheDataLines():
+    data = dataExtractor.getTesseractDataAsArrays('5\t1\t1\t1\t1\t1\t0\t0\t1\t1\t90\tPolicy\n'
+                                                  '5\t1\t1\t1\t1\t2\t0\t0\t1\t1\t90\tNumber')
+    index = anchorIndex.getAnchorIndex(data)
+    assert anchorIndex.getAnchorIndex(data) is index
+    assert data.indexes['anchor'][1] is index
+    assert not hasattr(anchorIndex, 'listIndexCache')
+
+    data.append(['5', '1', '1', '1', '1', '3', '0', '0', '1', '1', '90', 'AB-123', 2])
+    assert [line[12] for line in dataExtractor.getDataLinesMatchingString('Number AB-123', data)] == [1, 2]
+
+    # Lists which are not data lines are indexed every time rather than kept
+    lines = list(data)
+    assert anchorIndex.getAnchorIndex(lines) is not anchorIndex.getAnchorIndex(lines)
@@ -0,0 +1,53 @@
+import random
+from modules import dataExtractor, extractionSchema, renderCache, tesseractData
+
+
+# Returns the page results of a render of a single page of text
+def getPageResults(text):
+    data = tesseractData.tesseractDataHeader + '\n' + '\n'.join(
+        '\t'.join(['5', '1', '1', '1', '1', str(i + 1), str(i * 50), '0', '40', '20', '90', word])
+        for i, word in enumerate(text.split()))
+    return [{'page': 0, 'method': 'ocr', 'text': text, 'data': data}]
+
+
+# Renders of pdfs with the same name, and of the same pdf with different settings, each keep their own record
+def testRenderDirectoryRecordsAreKeyedByCacheKey(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    renderCache.writeCacheStore(renderDirectoryPath, 'a' * 64, getPageResults('Name: Jane'),
+                                {'source': 'form.pdf', 'sourcePath': '/first/form.pdf'})
+    renderCache.writeCacheStore(renderDirectoryPath, 'b' * 64, getPageResults('Name: John'),
+                                {'source': 'form.pdf', 'sourcePath': '/second/form.pdf'})
+    renderCache.writeCacheEntry(renderDirectoryPath, 'c' * 64, 'Name: Jill\n<data>\n', {'source': 'form.pdf'})
+
+    schema = extractionSchema.compileSchema([{'name': 'name', 'type': 'remaining', 'match': 'Name:'}])
+    assert extractionSchema.extractRenderDirectory(schema, renderDirectoryPath) == {
+        'a' * 64: {'name': 'Jane'}, 'b' * 64: {'name': 'John'}, 'c' * 64: {'name': 'Jill'}}
+
+
+# A compiled schema extracts the same values as the dataExtractor function of each field
+def testSchemaMatchesDataExtractor():
+    generator = random.Random(3)
+    vocabulary = ['Name:', 'name', 'Policy', 'No', 'Date', 'Yes', 'X', '[x]', '[ ]', 'Do you smoke?', 'ab', 'b',
+                  'Address', '\n', '\n', 'foo', 'bar']
+    anchors = vocabulary[:13]
+
+    for case in range(3000):
+        document = ' '.join(generator.choice(vocabulary) for _ in range(generator.randint(0, 60)))
+        fields = [
+            {'name': 'between', 'type': 'between', 'start': generator.choice(anchors),
+             'end': generator.choice(anchors)},
+            {'name': 'remaining', 'type': 'remaining', 'match': generator.choice(anchors)},
+            {'name': 'remainingAny', 'type': 'remaining', 'match': generator.sample(anchors, 2)},
+            {'name': 'question', 'type': 'question', 'question': generator.choice(anchors), 'answers': ['Yes', 'No'],
+             'checkStrings': ['[x]', 'X']},
+            {'name': 'prefix', 'type': 'remaining', 'match': 'ab'},
+            {'name': 'suffix', 'type': 'remaining', 'match': 'b'}]
+
+        expected = {
+            'between': dataExtractor.getTextBetweenStrings(fields[0]['start'], fields[0]['end'], document),
+            'remaining': dataExtractor.getRemainingTextInString(fields[1]['match'], document),
+            'remainingAny': dataExtractor.getRemainingTextInString(fields[2]['match'], document),
+            'question': dataExtractor.getQuestionAnswer(fields[3]['question'], document, ['Yes', 'No'], ['[x]', 'X']),
+            'prefix': dataExtractor.getRemainingTextInString('ab', document),
+            'suffix': dataExtractor.getRemainingTextInString('b', document)}
+        assert extractionSchema.compileSchema(fields).extract(document) == expected, case
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+import pytest
+
+# folderWatcher finds pdfs with pdfToTxt, which renders pages with Wand
+pytest.importorskip('wand.image', exc_type=ImportError)
+
+from modules import folderWatcher
+
+
+# Writes a pdf's contents and sets its modified time a number of seconds ago, returning its absolute path
+def writePdf(directoryPath, name, contents, secondsAgo=60):
+    pdfPath = os.path.abspath(os.path.join(directoryPath, name + '.pdf'))
+    with open(pdfPath, 'wb') as pdfFile:
+        pdfFile.write(contents)
+    modifiedTime = time.time() - secondsAgo
+    os.utime(pdfPath, (modifiedTime, modifiedTime))
+    return pdfPath
+
+
+# Returns the paths queued by a scan of a watcher
+def getQueuedPaths(watcher):
+    watcher.scan()
+    return sorted(path for path, _ in watcher.takeBatch(100, timeout=0))
+
+
+# Pdfs still being written (modified within settleSeconds) are left until they settle, and pdfs changed again while
+# they settle are only queued once
+def testPartlyWrittenPdfsWaitToSettle(tmp_path):
+    watcher = folderWatcher.FolderWatcher([str(tmp_path)], str(tmp_path / 'state.json'), interval=0)
+    settled = writePdf(str(tmp_path), 'settled', b'%PDF settled')
+    writing = writePdf(str(tmp_path), 'writing', b'%PDF part', secondsAgo=0)
+
+    assert getQueuedPaths(watcher) == [settled]
+
+    # The pdf is still being written, its size changes on each scan
+    writePdf(str(tmp_path), 'writing', b'%PDF part written', secondsAgo=0)
+    assert getQueuedPaths(watcher) == []
+
+    writePdf(str(tmp_path), 'writing', b'%PDF part written whole', secondsAgo=folderWatcher.settleSeconds + 1)
+    assert getQueuedPaths(watcher) == [writing]
+
+    # Queued pdfs are not queued again until their batch is recorded
+    os.utime(writing, (time.time() - 30, time.time() - 30))
+    assert getQueuedPaths(watcher) == []
+
+
+# Only pdfs whose contents changed since they were scraped are queued: touching a pdf or copying the same contents over
+# it is not a change, and pdfs which failed are not retried until they change
+def testOnlyChangedContentsAreQueued(tmp_path):
+    watcher = folderWatcher.FolderWatcher([str(tmp_path)], str(tmp_path / 'state.json'), interval=0)
+    first = writePdf(str(tmp_path), 'first', b'%PDF first')
+    second = writePdf(str(tmp_path), 'second', b'%PDF second')
+
+    watcher.scan()
+    watcher.recordBatch(watcher.takeBatch(100, timeout=0), {second: 'broken pdf'})
+    assert getQueuedPaths(watcher) == []
+
+    writePdf(str(tmp_path), 'first', b'%PDF first', secondsAgo=30)
+    assert getQueuedPaths(watcher) == []
+    assert watcher.state[first]['mtime'] == os.stat(first).st_mtime_ns
+
+    writePdf(str(tmp_path), 'second', b'%PDF second fixed', secondsAgo=30)
+    assert getQueuedPaths(watcher) == [second]
+
+
+# The state file records each scraped pdf with its error when it failed, a watch restarted from it does not queue them
+# again, and pdfs which were removed are dropped from it
+def testWatchStateFile(tmp_path):
+    pdfDirectory = tmp_path / 'pdfs'
+    pdfDirectory.mkdir()
+    statePath = str(tmp_path / 'state.json')
+    kept = writePdf(str(pdfDirectory), 'kept', b'%PDF kept')
+    failed = writePdf(str(pdfDirectory), 'failed', b'%PDF failed')
+    removed = writePdf(str(pdfDirectory), 'removed', b'%PDF removed')
+
+    watcher = folderWatcher.FolderWatcher([str(pdfDirectory)], statePath, interval=0)
+    watcher.scan()
+    watcher.recordBatch(watcher.takeBatch(100, timeout=0), {failed: 'broken pdf'})
+
+    with open(statePath, 'r') as stateFile:
+        state = json.load(stateFile)
+    assert sorted(state) == [failed, kept, removed]
+    assert state[failed]['error'] == 'broken pdf' and 'error' not in state[kept]
+    assert state[kept]['size'] == os.stat(kept).st_size and len(state[kept]['hash']) == 64
+
+    os.remove(removed)
+    restarted = folderWatcher.FolderWatcher([str(pdfDirectory)], statePath, interval=0)
+    assert getQueuedPaths(restarted) == []
+    assert sorted(restarted.state) == [failed, kept]
+
+
+# A watch scrapes the queued pdfs in batches, and once stopped finishes the queued pdfs and saves the state
+def testWatchScrapesBatchesUntilStopped(tmp_path):
+    statePath = str(tmp_path / 'state.json')
+    pdfPaths = [writePdf(str(tmp_path), 'claim' + str(i), b'%PDF claim ' + str(i).encode()) for i in range(5)]
+    watcher = folderWatcher.FolderWatcher([str(tmp_path)], statePath, interval=0.05)
+    batches = []
+
+    # Scrapes a batch, stopping the watch once every pdf has been scraped
+    def scrape(batchPaths):
+        batches.append(batchPaths)
+        if sum(len(batch) for batch in batches) == len(pdfPaths):
+            watcher.stop()
+        return {path: None for path in batchPaths}, {}
+
+    watcher.run(scrape, batchSize=2)
+
+    assert sorted(path for batch in batches for path in batch) == pdfPaths
+    assert max(len(batch) for batch in batches) <= 2
+    assert sorted(folderWatcher.readWatchState(statePath)) == pdfPaths
@@ -0,0 +1,69 @@
+import threading
+from PIL import Image
+from modules import formTemplates, ocrBackends, tesseractData
+
+
+# An OCR backend which, like tesserocr, keeps an engine per thread, counting the engines it loads
+class PerThreadBackend(ocrBackends.OcrBackend):
+    engine = 'perThread'
+
+    def __init__(self):
+        self.local = threading.local()
+        self.enginesLoaded = 0
+        self.lock = threading.Lock()
+
+    def imageToData(self, image):
+        if not hasattr(self.local, 'engine'):
+            with self.lock:
+                self.enginesLoaded += 1
+            self.local.engine = object()
+        return tesseractData.tesseractDataHeader + '\n' + '\t'.join(
+            ['5', '1', '1', '1', '1', '1', '2', '3', str(image.size[0]), str(image.size[1]), '90', 'word']) + '\n'
+
+
+# Regions are scraped on threads kept between pages, so a per thread engine is loaded once per thread
+def testRegionThreadsAreReusedBetweenPages():
+    backend = PerThreadBackend()
+    image = Image.new('L', (400, 400), 255)
+    boxes = [(0, 0, 100, 50), (100, 0, 200, 50), (0, 100, 100, 150), (200, 200, 300, 250), (500, 500, 600, 600)]
+
+    for page in range(20):
+        data = tesseractData.parseTesseractData(formTemplates.getRegionData(image, boxes, backend, 2))
+
+        # The region off the page is skipped and the others are moved to where they are on the page
+        assert [data.getBox(i) for i in range(len(data))] == [(2, 3, 102, 53), (102, 3, 202, 53), (2, 103, 102, 153),
+                                                              (202, 203, 302, 253)]
+
+    assert backend.enginesLoaded <= 2
+
+
+# A page matches the template whose anchors are all on it, and its regions are placed from the anchor
+def testMatchTemplate():
+    templates = formTemplates.compileTemplates([
+        {'name': 'other', 'anchors': ['Invoice'], 'regions': []},
+        {'name': 'claim', 'anchors': ['Policy Number:'],
+         'regions': [{'name': 'policy', 'anchor': 'Policy Number:', 'left': -4, 'top': -4, 'right': 300,
+                      'bottom': 16}]}])
+    detectionData = tesseractData.tesseractDataHeader + '\n' + '\n'.join('\t'.join(columns) for columns in [
+        ['5', '1', '1', '1', '1', '1', '100', '200', '60', '12', '95', 'Policy'],
+        ['5', '1', '1', '1', '1', '2', '165', '200', '60', '12', '95', 'Number:']])
+
+    template, boxes = formTemplates.matchTemplate(templates, detectionData, 100, 200, (1700, 2200))
+    assert template.name == 'claim'
+    assert boxes == [(188, 388, 1033, 444)]
+    assert formTemplates.matchTemplate(templates[:1], detectionData, 100, 200, (1700, 2200)) == (None, None)
+
+
+# The words of each region are moved to where the region is on the page and keep their place in the region's data,
+# and the blocks of different regions are numbered apart in region order
+def testMergeRegionData():
+    def getRegionData(words):
+        return tesseractData.tesseractDataHeader + '\n' + '\n'.join('\t'.join(
+            ['5', '1', block, '1', '1', '1', left, '4', '30', '10', '90', text]) for block, left, text in words)
+
+    regionData = [getRegionData([('1', '2', 'AB-123'), ('2', '50', 'Paid')]), getRegionData([('1', '6', 'Smith')])]
+    data = tesseractData.parseTesseractData(formTemplates.mergeRegionData(regionData, [(100, 200, 300, 220),
+                                                                                       (0, 500, 80, 520)], (600, 800)))
+
+    assert [(data[i][2], data[i][11], data.getBox(i)) for i in range(len(data))] == \
+        [(1, 'AB-123', (102, 204, 132, 214)), (2, 'Paid', (150, 204, 180, 214)), (3, 'Smith', (6, 504, 36, 514))]
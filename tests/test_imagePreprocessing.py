@@ -0,0 +1,37 @@
+import pytest
+from PIL import Image, ImageDraw
+from modules import imagePreprocessing
+
+numpy = pytest.importorskip('numpy')
+
+
+# Returns a grey page of lines of dark text on a light, noisy background, the same every run
+def getPageImage():
+    page = Image.new('L', (400, 300), 235)
+    draw = ImageDraw.Draw(page)
+    for line in range(12):
+        draw.text((20, 10 + line * 24), 'Policy number AB-' + str(line) + ' of the claim form', fill=40)
+    noise = numpy.random.RandomState(0).randint(-20, 20, (300, 400))
+    return Image.fromarray(numpy.clip(numpy.array(page, int) + noise, 0, 255).astype(numpy.uint8)).convert('RGB')
+
+
+# Returns the pixels of a page preprocessed with a method as a grey array
+def getPreprocessedPixels(page, method, settings):
+    return numpy.array(imagePreprocessing.preprocessPageImage(page, dict(settings, method=method)).convert('L'), int)
+
+
+# The numpy method gives the page the ImageEnhance passes give it, within rounding: a level rounded differently when
+# sharpening is stretched by the contrast, and once binarized only pixels right at the threshold may fall on the other
+# side of it
+@pytest.mark.parametrize('sharpness, contrast', [(4.0, 2.0), (1.0, 1.0), (0.5, 3.0)])
+def testNumpyMatchesEnhance(sharpness, contrast):
+    page = getPageImage()
+    settings = {'sharpness': sharpness, 'contrast': contrast}
+
+    difference = abs(getPreprocessedPixels(page, 'numpy', settings) - getPreprocessedPixels(page, 'enhance', settings))
+    assert difference.max() <= contrast + 1
+    assert difference.mean() < 1
+
+    settings['binarize'] = True
+    difference = abs(getPreprocessedPixels(page, 'numpy', settings) - getPreprocessedPixels(page, 'enhance', settings))
+    assert (difference > 0).mean() < 0.01
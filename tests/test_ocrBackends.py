@@ -0,0 +1,36 @@
+import pytest
+from PIL import Image
+from modules import ocrBackends, tesseractData
+
+
+# A backend which does not implement imageToData fails when it is created rather than on the first page it scrapes
+def testIncompleteBackendCanNotBeCreated():
+    class IncompleteBackend(ocrBackends.OcrBackend):
+        engine = 'incomplete'
+
+    ocrBackends.registerOcrBackend('incomplete', IncompleteBackend)
+    try:
+        with pytest.raises(TypeError):
+            ocrBackends.getOcrBackend('incomplete')
+    finally:
+        ocrBackends.ocrBackendClasses.pop('incomplete')
+
+
+# A registered backend is created once and its data is read like tesseract's
+def testRegisteredBackend():
+    class EmptyBackend(ocrBackends.OcrBackend):
+        engine = 'empty'
+
+        def imageToData(self, image):
+            return tesseractData.tesseractDataHeader + '\n'
+
+    ocrBackends.registerOcrBackend('empty', EmptyBackend)
+    try:
+        backend = ocrBackends.getOcrBackend('empty')
+        assert ocrBackends.getOcrBackend('empty') is backend
+        assert len(tesseractData.parseTesseractData(backend.imageToData(Image.new('L', (10, 10))))) == 0
+        assert len(tesseractData.parseTesseractData(ocrBackends.getOcrBackend('fake').imageToData(
+            Image.new('L', (100, 100))))) == 20 * 8
+    finally:
+        ocrBackends.ocrBackendClasses.pop('empty')
+        ocrBackends.ocrBackends.pop('empty')
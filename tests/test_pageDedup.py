@@ -0,0 +1,55 @@
+import random
+import pytest
+from PIL import Image, ImageDraw
+
+# Scraping a window of pages needs Wand, the pages it renders are replaced with drawn pages
+pytest.importorskip('wand.image', exc_type=ImportError)
+
+from modules import customLogger, pdfToTxt
+
+
+# Returns a white page image with lines of made up words drawn on it, the same for the same seed
+def drawPage(seed):
+    page = Image.new('RGB', (850, 1100), 'white')
+    draw = ImageDraw.Draw(page)
+    generator = random.Random(seed)
+    for line in range(30):
+        draw.rectangle((60, 60 + line * 30, 60 + generator.randint(100, 700), 72 + line * 30), fill='black')
+    return page
+
+
+# Stands in for the window of pages ghostscript renders, one sequence image per drawn page
+class DrawnWindow:
+
+    def __init__(self, pages):
+        self.sequence = list(range(len(pages)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+
+# Blank and duplicate pages are counted as such and only the pages recognised are counted as pages.ocr
+def testDedupCountsOnlyRecognisedPagesAsOcr(monkeypatch):
+    pages = [drawPage(1), drawPage(1), drawPage(2), Image.new('RGB', (850, 1100), 'white'), drawPage(1)]
+    renderedPages = iter(pages)
+    monkeypatch.setattr(pdfToTxt, 'wi', lambda filename=None, resolution=None, image=None: DrawnWindow(pages))
+    monkeypatch.setattr(pdfToTxt, 'getPageAsPilImage', lambda pageImage: next(renderedPages))
+    pdfToTxt.setOcrBackend('fake')
+    pdfToTxt.setPageDedup({})
+    customLogger.resetMetrics()
+
+    try:
+        pageResults = list(pdfToTxt.iterOcrPdfWindow('drawn.pdf', 200, 0, len(pages) - 1))
+    finally:
+        pdfToTxt.setPageDedup(None)
+        pdfToTxt.setOcrBackend(pdfToTxt.ocrBackends.defaultOcrBackendName)
+
+    assert [pageResult['method'] for pageResult in pageResults] == ['ocr', 'dedup', 'ocr', 'blank', 'dedup']
+    assert pageResults[1]['text'] == pageResults[0]['text']
+    assert customLogger.getCounter('pages.ocr') == 2
+    assert customLogger.getCounter('pages.dedup') == 2
+    assert customLogger.getCounter('pages.blank') == 1
+    customLogger.resetMetrics()
@@ -0,0 +1,93 @@
+import io
+import os
+import pytest
+from PIL import Image, ImageDraw
+
+# pdfToTxt renders pages with Wand
+pytest.importorskip('wand.image', exc_type=ImportError)
+
+from modules import pdfToTxt
+
+
+# The escalation of a pdf is the fraction of its words scraped again, so a page with few words scraped again whole
+# counts for less than a page with many words of which a few were scraped again
+def testEscalationIsWeightedByWords():
+    pageResults = [{'page': 0, 'method': 'ocr', 'escalation': 1, 'escalatedWords': 10, 'words': 10},
+                   {'page': 1, 'method': 'ocr', 'escalation': 0.1, 'escalatedWords': 30, 'words': 300},
+                   {'page': 2, 'method': 'text'}]
+    assert pdfToTxt.getEscalation(pageResults) == pytest.approx(40 / 310)
+
+
+# Pages with no words at the first pass resolution are scraped again whole, the escalation of a pdf of only those pages
+# is the fraction of its pages scraped again
+def testEscalationOfPagesWithoutWords():
+    pageResults = [{'page': 0, 'method': 'ocr', 'escalation': 1, 'escalatedWords': 0, 'words': 0},
+                   {'page': 1, 'method': 'ocr', 'escalation': 0, 'escalatedWords': 0, 'words': 0}]
+    assert pdfToTxt.getEscalation(pageResults) == 0.5
+    assert pdfToTxt.getEscalation([{'page': 0, 'method': 'text'}]) == 0
+
+
+# Writes a pdf of a scanned page (an image of lines of text) with a short text overlay, a scan searchable by tesseract
+# (the same image with a text layer of its lines), and a born digital page. Returns its path.
+def writeScannedPdf(directoryPath):
+    pymupdf = pytest.importorskip('pymupdf')
+    scan = Image.new('RGB', (850, 1100), 'white')
+    draw = ImageDraw.Draw(scan)
+    for line in range(30):
+        draw.text((60, 60 + line * 30), 'Scanned claim form line ' + str(line), fill='black')
+    scanBytes = io.BytesIO()
+    scan.save(scanBytes, 'PNG')
+
+    pdfPath = os.path.join(directoryPath, 'scanned.pdf')
+    with pymupdf.open() as document:
+        overlaid = document.new_page()
+        overlaid.insert_image(overlaid.rect, stream=scanBytes.getvalue())
+        overlaid.insert_text((400, 820), 'BATES 000123 CONFIDENTIAL')
+
+        searchable = document.new_page()
+        searchable.insert_image(searchable.rect, stream=scanBytes.getvalue())
+        for line in range(30):
+            searchable.insert_text((40, 60 + line * 24), 'Scanned claim form line ' + str(line), fontsize=18,
+                                   render_mode=3)
+
+        digital = document.new_page()
+        digital.insert_text((72, 72), 'Policy number AB-123 of the claim form')
+        document.save(pdfPath)
+    return pdfPath
+
+
+# A scanned page is scraped even when a few words are overlaid on it, while scans with a text layer of their own and
+# born digital pages are read from their text layer
+def testScannedPageWithOverlayIsScraped(tmp_path):
+    pdfPath = writeScannedPdf(str(tmp_path))
+    lastPage, textLayerPages = pdfToTxt.getTextLayerPages(pdfPath, 72)
+
+    assert lastPage == 2
+    assert sorted(textLayerPages) == [1, 2]
+    assert 'Policy number AB-123' in pdfToTxt.dataExtractor.getTesseractDataAsText(textLayerPages[2])
+
+
+# A pdf scraped by getFileExtract is counted as a cache write and read from the cache after, and a render saved under
+# the pdf's name before renders were named by cache key is read rather than scraping the pdf again
+def testFileExtractCache(tmp_path):
+    pymupdf = pytest.importorskip('pymupdf')
+    pdfPath = os.path.join(str(tmp_path), 'policy.2020.pdf')
+    with pymupdf.open() as document:
+        document.new_page().insert_text((72, 72), 'Policy number AB-123 of the claim form')
+        document.save(pdfPath)
+    renderDirectoryPath = pdfToTxt.getRenderDirectoryPath(str(tmp_path), 'renders')
+    pdfToTxt.customLogger.resetMetrics()
+
+    extract = pdfToTxt.getFileExtract(pdfPath, str(tmp_path), 'renders', 72)
+    assert pdfToTxt.getFileExtract(pdfPath, str(tmp_path), 'renders', 72)[0] == extract[0]
+    assert pdfToTxt.customLogger.getCounter('cache.writes') == 1
+    assert pdfToTxt.customLogger.getCounter('cache.hits') == 1
+
+    for fileName in os.listdir(renderDirectoryPath):
+        os.remove(os.path.join(renderDirectoryPath, fileName))
+    with open(os.path.join(renderDirectoryPath, 'policy.txt'), 'w') as legacyFile:
+        legacyFile.write('legacy text\n<data>\nlegacy data')
+
+    assert pdfToTxt.getFileExtract(pdfPath, str(tmp_path), 'renders', 72) == ['legacy text\n', '\nlegacy data']
+    assert pdfToTxt.customLogger.getCounter('cache.writes') == 1
+    pdfToTxt.customLogger.resetMetrics()
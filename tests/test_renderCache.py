@@ -0,0 +1,55 @@
+import os
+from modules import customLogger, renderCache
+
+
+# Writes a file of the given contents and returns its path
+def writeFile(filePath, contents):
+    with open(filePath, 'w') as file:
+        file.write(contents)
+    return filePath
+
+
+# A render saved under a pdf's name before renders were named by cache key is moved to the cache key, with its render
+# store and metadata, the first time the pdf is looked up
+def testLegacyRenderIsAdoptedOnce(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    pdfPath = writeFile(os.path.join(renderDirectoryPath, 'claim.2020.pdf'), '%PDF-1.4')
+    cacheKey = renderCache.getCacheKey(pdfPath, {'resolution': 300})
+    writeFile(os.path.join(renderDirectoryPath, 'claim.txt'), 'legacy text\n<data>\n')
+    writeFile(os.path.join(renderDirectoryPath, 'claim.db'), '')
+    writeFile(os.path.join(renderDirectoryPath, 'claim.json'), '{"source": "claim.2020.pdf"}')
+
+    assert renderCache.adoptLegacyRender(renderDirectoryPath, pdfPath, cacheKey)
+    assert sorted(os.listdir(renderDirectoryPath)) == sorted(['claim.2020.pdf', cacheKey + '.txt', cacheKey + '.db',
+                                                             cacheKey + '.json'])
+    assert renderCache.readCacheMetadata(renderDirectoryPath, cacheKey) == {'source': 'claim.2020.pdf'}
+
+    # Once adopted there is nothing left to adopt, and a pdf already cached never takes a legacy render
+    assert not renderCache.adoptLegacyRender(renderDirectoryPath, pdfPath, cacheKey)
+    writeFile(os.path.join(renderDirectoryPath, 'claim.txt'), 'other text\n<data>\n')
+    assert not renderCache.adoptLegacyRender(renderDirectoryPath, pdfPath, cacheKey)
+    assert os.path.exists(os.path.join(renderDirectoryPath, 'claim.txt'))
+
+
+# A pdf without a legacy render has nothing adopted
+def testNoLegacyRender(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    pdfPath = writeFile(os.path.join(renderDirectoryPath, 'claim.pdf'), '%PDF-1.4')
+    cacheKey = renderCache.getCacheKey(pdfPath, {'resolution': 300})
+
+    assert not renderCache.adoptLegacyRender(renderDirectoryPath, pdfPath, cacheKey)
+    assert os.listdir(renderDirectoryPath) == ['claim.pdf']
+
+
+# Each render saved to the cache is counted as one write, whichever function saved it
+def testCacheWritesAreCounted(tmp_path):
+    customLogger.resetMetrics()
+    renderDirectoryPath = str(tmp_path)
+
+    renderCache.writeCacheEntry(renderDirectoryPath, 'a', 'text\n<data>\n', {'source': 'a.pdf'})
+    renderFilePath = renderCache.getCacheFilePath(renderDirectoryPath, 'b')
+    writeFile(renderFilePath, 'text\n<data>\n')
+    renderCache.writeRenderMetadata(renderFilePath, {'source': 'b.pdf'})
+
+    assert customLogger.getCounter('cache.writes') == 2
+    customLogger.resetMetrics()
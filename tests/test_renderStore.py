@@ -0,0 +1,27 @@
+from modules import dataExtractor, renderStore, tesseractData
+
+pageData = tesseractData.tesseractDataHeader + '\n' + '\n'.join('\t'.join(columns) for columns in [
+    ['1', '1', '0', '0', '0', '0', '0', '0', '1700', '2200', '-1', ''],
+    ['2', '1', '1', '0', '0', '0', '100', '100', '900', '60', '-1', ''],
+    ['5', '1', '1', '1', '1', '1', '100', '100', '200', '30', '96.581329', 'Policy'],
+    ['5', '1', '1', '1', '1', '2', '320', '100', '220', '30', '91', 'Number:'],
+    ['5', '1', '1', '1', '1', '3', '560', '100', '20', '30', '95.000000', ''],
+    ['5', '1', '1', '1', '1', '4', '600', '100', '300', '30', '33.333333', 'AB-123']]) + '\n'
+
+
+# The data read back from a render store has the word lines of the data it was written from with the same values,
+# confidences included
+def testRenderStoreKeepsWordLines(tmp_path):
+    renderStorePath = str(tmp_path / 'render.db')
+    text = dataExtractor.getTesseractDataAsText(pageData)
+    renderStore.writeRenderStore(renderStorePath, [{'page': 0, 'method': 'ocr', 'text': text, 'data': pageData}])
+
+    with renderStore.RenderStore(renderStorePath) as render:
+        assert render.getPageText(0) == text
+        storedLines = dataExtractor.getTesseractDataAsArrays(render.getPageDataText(0))
+
+        assert [line[:10] for line in storedLines] == [line[:10] for line in
+                                                       dataExtractor.getTesseractDataAsArrays(pageData) if line[11]]
+        assert [line[11] for line in storedLines] == ['Policy', 'Number:', 'AB-123']
+        assert [line[10] for line in storedLines] == ['96.581329', '91', '33.333333']
+        assert list(render.getPageData(0).columns[tesseractData.confColumn]) == [96.581329, 91, 33.333333]
@@ -0,0 +1,89 @@
+import os
+import time
+from modules import renderCache, searchIndex, tesseractData
+
+
+# Returns the page result of a scraped page of words, each word a tuple of its text, left, top, width and height
+def getPageResult(page, words):
+    lines = [tesseractData.tesseractDataHeader]
+    for number, (text, left, top, width, height) in enumerate(words):
+        lines.append('\t'.join(str(column) for column in (5, page + 1, 1, 1, 1, number + 1, left, top, width, height,
+                                                           90, text)))
+    return {'page': page, 'method': 'ocr', 'text': ' '.join(word[0] for word in words), 'data': '\n'.join(lines)}
+
+
+# Returns the words of a line of text, each word 50 wide and 10 apart starting at left
+def getLineWords(text, top, left=0):
+    return [(word, left + number * 60, top, 50, 20) for number, word in enumerate(text.split())]
+
+
+# Saves a render of pages of words to a render directory as a render store and returns its cache key
+def writeRender(renderDirectoryPath, cacheKey, pages):
+    pageResults = [getPageResult(page, words) for page, words in enumerate(pages)]
+    renderCache.writeCacheStore(renderDirectoryPath, cacheKey, pageResults, {'source': cacheKey + '.pdf'})
+    return cacheKey
+
+
+# A phrase is found on the page it is on, with the data lines of its words and the box around them, and is only
+# found with its words in order next to each other
+def testSearchPhrase(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    writeRender(renderDirectoryPath, 'claim', [getLineWords('claim form', 100),
+                                               getLineWords('the policy', 100) + getLineWords('Number: AB-123', 130)])
+
+    with searchIndex.SearchIndex(searchIndex.getSearchIndexPath(renderDirectoryPath)) as index:
+        assert index.updateRenderDirectory(renderDirectoryPath) == (1, 0)
+
+        assert index.searchPhrase('Policy number') == [{'cacheKey': 'claim', 'source': 'claim.pdf', 'page': 1,
+                                                        'lines': [3, 4], 'box': (0, 100, 110, 150)}]
+        assert [hit['lines'] for hit in index.searchPhrase('number ab 123')] == [[4, 5]]
+        assert index.searchPhrase('number policy') == []
+        assert index.searchPhrase('form the') != []
+        assert index.searchPhrase('missing') == []
+
+
+# Words are found near each other within the distance in tokens either side of the first word, not beyond it
+def testSearchNear(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    writeRender(renderDirectoryPath, 'claim', [getLineWords('claim one two three four policy date', 100)])
+
+    with searchIndex.SearchIndex(searchIndex.getSearchIndexPath(renderDirectoryPath)) as index:
+        index.updateRenderDirectory(renderDirectoryPath)
+
+        assert [hit['lines'] for hit in index.searchNear(['policy', 'claim'], 5)] == [[0, 5]]
+        assert [hit['lines'] for hit in index.searchNear(['claim', 'policy', 'date'], 6)] == [[0, 5, 6]]
+        assert index.searchNear(['policy', 'claim'], 4) == []
+        assert index.searchNear(['policy', 'policy'], 5) == []
+
+
+# A changed pdf is indexed under its new cache key and indexing a render again replaces it, while a render evicted
+# from the cache is removed from the index so its words are no longer found
+def testChangedPdfIsReindexedAndEvictedRendersRemoved(tmp_path):
+    renderDirectoryPath = str(tmp_path)
+    writeRender(renderDirectoryPath, 'before', [getLineWords('policy number AB-123', 100)])
+
+    with searchIndex.SearchIndex(searchIndex.getSearchIndexPath(renderDirectoryPath)) as index:
+        assert index.updateRenderDirectory(renderDirectoryPath) == (1, 0)
+        assert index.updateRenderDirectory(renderDirectoryPath) == (0, 0)
+
+        # The pdf changed, so its render is saved under a new key beside the old render
+        writeRender(renderDirectoryPath, 'after', [getLineWords('policy number CD-456', 100)])
+        assert index.updateRenderDirectory(renderDirectoryPath) == (1, 0)
+        assert {hit['cacheKey'] for hit in index.searchPhrase('policy number')} == {'before', 'after'}
+
+        # Indexing a render again replaces what was indexed for it
+        index.indexRender(renderDirectoryPath, 'after')
+        assert [hit['cacheKey'] for hit in index.searchPhrase('cd 456')] == ['after']
+        assert len(index.searchPhrase('policy number')) == 2
+
+        # The old render is evicted once it has not been read for a day
+        lastRead = time.time() - 2 * 24 * 60 * 60
+        for fileName in os.listdir(renderDirectoryPath):
+            if fileName.startswith('before.'):
+                os.utime(os.path.join(renderDirectoryPath, fileName), (lastRead, lastRead))
+        assert renderCache.evictCacheEntries(renderDirectoryPath, maxAgeDays=1) == 1
+
+        assert index.updateRenderDirectory(renderDirectoryPath) == (0, 1)
+        assert index.getCacheKeys() == {'after'}
+        assert index.searchPhrase('ab 123') == []
+        assert [hit['cacheKey'] for hit in index.searchPhrase('policy number')] == ['after']
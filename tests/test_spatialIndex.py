@@ -0,0 +1,86 @@
+import random
+from modules import dataExtractor, spatialIndex, tesseractData
+
+
+# Returns typed tesseract data of pages of words, each page its own tesseract data with its header. Words are given as
+# (page, left, top, width, height, text) and pages are 1 based.
+def getPagesData(words, pageCount):
+    pages = []
+    for page in range(1, pageCount + 1):
+        lines = [tesseractData.tesseractDataHeader]
+        for wordPage, left, top, width, height, text in words:
+            if wordPage == page:
+                lines.append('\t'.join(['5', '1', '1', '1', '1', '1', str(left), str(top), str(width), str(height),
+                                        '90', text]))
+        pages.append('\n'.join(lines))
+    return dataExtractor.getTesseractDataAsColumns('\n'.join(pages))
+
+
+# Returns the texts of the lines of typed data found by a region query
+def getRegionTexts(data, page, left, top, right, bottom, contained=False):
+    return [line[11] for line in dataExtractor.getDataLinesInRegion(data, page, left, top, right, bottom, contained)]
+
+
+# Words whose boxes touch the edges of a region overlap it, and are contained in it when they are inside its edges
+def testRegionEdges():
+    data = getPagesData([(1, 100, 100, 50, 20, 'inside'), (1, 150, 120, 50, 20, 'corner'),
+                         (1, 200, 100, 50, 20, 'right'), (1, 99, 100, 1, 20, 'left')], 1)
+
+    assert getRegionTexts(data, 1, 100, 100, 150, 120) == ['inside', 'corner', 'left']
+    assert getRegionTexts(data, 1, 100, 100, 150, 120, contained=True) == ['inside']
+    assert getRegionTexts(data, 1, 100, 100, 200, 140, contained=True) == ['inside', 'corner']
+
+
+# Regions without words, of no size and on pages the data does not have find nothing
+def testEmptyRegions():
+    data = getPagesData([(1, 100, 100, 50, 20, 'word')], 1)
+
+    assert getRegionTexts(data, 1, 400, 400, 800, 800) == []
+    assert getRegionTexts(data, 1, 300, 300, 300, 300) == []
+    assert getRegionTexts(data, 1, 125, 110, 125, 110) == ['word']
+    assert getRegionTexts(data, 1, 125, 110, 125, 110, contained=True) == []
+    assert getRegionTexts(data, 2, 0, 0, 2000, 2000) == []
+    assert getRegionTexts(getPagesData([], 1), 1, 0, 0, 2000, 2000) == []
+
+
+# Words are only found on their own page, including words running off the bottom of a page at the coordinates of the
+# top of the next page
+def testRegionsOfMultiPageData():
+    data = getPagesData([(1, 100, 2150, 300, 100, 'overflow'), (1, 100, 100, 50, 20, 'first'),
+                         (2, 100, 100, 50, 20, 'second'), (3, 100, 2190, 50, 20, 'last')], 3)
+
+    assert getRegionTexts(data, 1, 0, 2100, 1700, 2300) == ['overflow']
+    assert getRegionTexts(data, 2, 0, 0, 1700, 200) == ['second']
+    assert getRegionTexts(data, 1, 0, 0, 1700, 200) == ['first']
+    assert getRegionTexts(data, 3, 0, 2200, 1700, 2200) == ['last']
+    assert [line[12] for line in dataExtractor.getDataLinesInRegion(data, 2, 0, 0, 1700, 2200)] == [2]
+
+
+# Region queries find what checking every word finds, for boxes crossing cells and any cell size
+def testRegionsMatchEveryWord():
+    generator = random.Random(3)
+    for cellSize in (50, 200, 1000):
+        words = [(generator.randint(1, 3), generator.randint(0, 1600), generator.randint(0, 2100),
+                  generator.randint(0, 400), generator.randint(0, 120), 'w' + str(i)) for i in range(300)]
+        data = getPagesData(words, 3)
+        index = spatialIndex.SpatialIndex(data, cellSize)
+
+        for case in range(200):
+            page = generator.randint(1, 4)
+            left, right = sorted(generator.randint(0, 1800) for _ in range(2))
+            top, bottom = sorted(generator.randint(0, 2300) for _ in range(2))
+            contained = generator.random() < 0.5
+
+            expected = []
+            for i in range(len(data)):
+                lineLeft, lineTop, lineRight, lineBottom = data.getBox(i)
+                if data.pages[i] != page:
+                    continue
+                if contained:
+                    isMatch = lineLeft >= left and lineTop >= top and lineRight <= right and lineBottom <= bottom
+                else:
+                    isMatch = lineLeft <= right and lineTop <= bottom and lineRight >= left and lineBottom >= top
+                if isMatch:
+                    expected.append(i)
+
+            assert index.query(page, left, top, right, bottom, contained) == expected, (cellSize, case)
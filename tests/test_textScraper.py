@@ -0,0 +1,37 @@
+import json
+import pytest
+
+# textScraper imports the scraper, which needs Wand
+pytest.importorskip('wand.image', exc_type=ImportError)
+
+import textScraper
+
+
+# Writes a json config file and returns its path
+def writeConfig(directoryPath, config):
+    configPath = directoryPath / 'settings.json'
+    configPath.write_text(json.dumps(config))
+    return str(configPath)
+
+
+# Settings given on the command line replace those of the config file, including the pdf directories
+def testCommandLineReplacesConfig(tmp_path):
+    configPath = writeConfig(tmp_path, {'pdf_directory': ['fromConfig'], 'resolution': 300, 'cache_max_bytes': 1000})
+
+    arguments = textScraper.getArguments(['--config', configPath, '--pdf-directory', 'fromCli', '--resolution', '150'])
+    assert arguments.pdf_directory == ['fromCli']
+    assert arguments.resolution == 150
+    assert arguments.cache_max_bytes == 1000
+
+    arguments = textScraper.getArguments(['--config', configPath])
+    assert arguments.pdf_directory == ['fromConfig']
+    assert arguments.resolution == 300
+    assert arguments.cache_max_age_days is None
+
+    assert textScraper.getArguments([]).pdf_directory == ['']
+
+
+# A config file with a setting which is not an argument is rejected
+def testUnknownConfigSetting(tmp_path):
+    with pytest.raises(SystemExit):
+        textScraper.getArguments(['--config', writeConfig(tmp_path, {'resolutions': 300})])
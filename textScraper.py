@@ -1,65 +1,233 @@
 import os
+import json
+import argparse
 from datetime import datetime
-from modules import customLogger, dataExtractor, pdfToTxt
+from modules import customLogger, pdfToTxt, batchScraper, folderWatcher, pageDedup
 import sys
 
-# ------------------------------- #
-# ---------- Variables ---------- #
-# ------------------------------- #
 
-# Define the current working directory (directory this is run from)
-workingDirectory = os.getcwd()
-
-# Define the directory name containing the pdf's
-# This will default to the current working directory
-pdfDirectory = input("What folder name contains the pdf's to scrape? (defaults to the current working directory): ")
-
-# Define the directory the scraped pdf txt files should be saved
-# This will default to '/renders'
-renderDirectoryName = input("What folder name would you like to store the scraped text? (defaults to 'renders'): ")
-renderDirectoryName = renderDirectoryName if renderDirectoryName else 'renders'
-
-# Resolution of the image created from a pdf file
-# The files do not interpret hand written or small text at 700 but its fairly quick
-# To improve the scraped quality at the loss of scraping speed, increase the resolution by a few hundred
-# Files will throw an exception when the render quality is too high ~900
-# Tesseract actually works better with lower quality numbers around 200
-resolution = input("what quality would you like the pdf's to scrape at? (defaults to 200, limit to ~600): ")
-resolution = int(resolution) if resolution.isdigit() else 200
-
-# ----------------------------- #
-# --------- Methods ----------- #
-# ----------------------------- #
-
-# ----------------------------- #
-# ---------- Script ----------- #
-# ----------------------------- #
-
-# Define the absolute path of all pdf's in the given directory
-pdfDirectoryPath = os.path.join(workingDirectory, pdfDirectory) if pdfDirectory else workingDirectory
-pdfPaths = pdfToTxt.getPdfFileNamesFromDirectory(pdfDirectoryPath)
-
-# Define the total pdf's to scrape for logging
-totalPdfs = len(pdfPaths)
-
-# Store the start time of the process for logging
-scrapeStart = datetime.now()
-
-customLogger.log("Beginning scrape of " + str(totalPdfs) + " pdf files in '" + pdfDirectory + "'")
-customLogger.log("Outputting rendered files to /" + renderDirectoryName)
-customLogger.log("Render resolution set to " + str(resolution))
-
-pdfData = {}
-
-# For each absolute pdf path in the pdf directory:
-for pdfIndex, path in enumerate(pdfPaths):
-    # Get the text from the pdf (this will also save the text to a same named file in /renders)
-    extract = pdfToTxt.getFileExtract(path, workingDirectory, renderDirectoryName, resolution)
-
-    customLogger.log("Complete " + str(pdfIndex + 1) + " / " + str(totalPdfs) + " total Pdf's")
-    customLogger.log("Current running time is " + customLogger.duration(scrapeStart))
-
-customLogger.log("Completed scrape of pdf files in '" + pdfDirectory + "' in " + customLogger.duration(scrapeStart))
-
-# Terminate the script
-sys.exit()
+# Returns the parser of the command line arguments. Every argument can also be given in a json config file (--config)
+# by its name with underscores, eg. {"pdf_directory": ["pdfs"], "resolution": 300, "watch": true}. Arguments given on
+# the command line override the config file.
+def getArgumentParser():
+    parser = argparse.ArgumentParser(description="Scrape the text of pdf's with tesseract, once or watching folders.")
+    parser.add_argument('--config', help="json file of settings, see above")
+    parser.add_argument('--pdf-directory', action='append', default=None,
+                        help="directory containing the pdf's to scrape, can be given more than once (defaults to the "
+                             "current working directory)")
+    parser.add_argument('--recursive', action='store_true', help="also scrape pdf's in sub directories")
+    parser.add_argument('--render-directory', default='renders',
+                        help="directory to store the scraped text (defaults to 'renders')")
+    parser.add_argument('--resolution', type=int, default=200,
+                        help="resolution to scrape pdf's at (defaults to 200, limit to ~600)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="number of worker processes (defaults to the number of cpu's)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="scrape pages at a low resolution first, then only unclear text at the resolution")
+    parser.add_argument('--form-templates',
+                        help="json file of form templates, pages matching one only have its regions scraped (see "
+                             "modules/formTemplates.py)")
+    parser.add_argument('--dedup', action='store_true',
+                        help="skip blank pages and reuse the text of pages which look like a page already scraped")
+    parser.add_argument('--dedup-distance', type=int, default=pageDedup.defaultDedupSettings['maximumDistance'],
+                        help="most bits the hashes of duplicate pages differ by, 0 only reuses pages which look the "
+                             "same (defaults to " + str(pageDedup.defaultDedupSettings['maximumDistance']) + ")")
+    parser.add_argument('--ocr-backend', default='pytesseract',
+                        help="OCR backend to scrape with: pytesseract, tesserocr or fake (defaults to pytesseract)")
+    parser.add_argument('--verbosity', default='info', choices=sorted(customLogger.levels) + ['none'],
+                        help="lowest level of messages printed, or none to print nothing (defaults to info)")
+    parser.add_argument('--cache-max-bytes', type=int, default=None,
+                        help="largest size in bytes of the render directory, the least recently used renders are "
+                             "removed beyond it (defaults to no limit)")
+    parser.add_argument('--cache-max-age-days', type=float, default=None,
+                        help="renders not used within this many days are removed (defaults to no limit)")
+    parser.add_argument('--metrics-file', default='metrics.jsonl',
+                        help="json lines file metrics are appended to (defaults to metrics.jsonl)")
+    parser.add_argument('--metrics-interval', type=int, default=60,
+                        help="seconds between metrics summaries (defaults to 60)")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running, scraping new and changed pdf's as they arrive until stopped with ctrl+c or "
+                             "SIGTERM")
+    parser.add_argument('--interval', type=int, default=folderWatcher.defaultScanInterval,
+                        help="seconds between scans of the pdf directories when watching")
+    parser.add_argument('--queue-size', type=int, default=folderWatcher.defaultQueueSize,
+                        help="most pdf's waiting to be scraped when watching")
+    parser.add_argument('--batch-size', type=int, default=folderWatcher.defaultBatchSize,
+                        help="most pdf's scraped together when watching")
+    parser.add_argument('--state-file', default='watchState.json',
+                        help="file recording the pdf's already scraped when watching (defaults to watchState.json)")
+    return parser
+
+
+# Returns the settings of a run from command line arguments and the config file they name
+def getArguments(argv):
+    parser = getArgumentParser()
+    arguments = parser.parse_args(argv)
+
+    if arguments.config:
+        with open(arguments.config, 'r') as configFile:
+            config = json.load(configFile)
+
+        unknownSettings = [name for name in config if not hasattr(arguments, name)]
+        if unknownSettings:
+            parser.error("unknown settings in " + arguments.config + ": " + ', '.join(unknownSettings))
+
+        # Pdf directories are appended to their default, so the config file's directories are only used when none are
+        # given on the command line rather than being made the default
+        pdfDirectories = config.pop('pdf_directory', None)
+        parser.set_defaults(**config)
+        arguments = parser.parse_args(argv)
+        if arguments.pdf_directory is None and pdfDirectories is not None:
+            arguments.pdf_directory = pdfDirectories if isinstance(pdfDirectories, list) else [pdfDirectories]
+
+    arguments.pdf_directory = arguments.pdf_directory or ['']
+    return arguments
+
+
+# Returns the settings of a run by prompting for each of them
+def getPromptedArguments():
+    arguments = getArgumentParser().parse_args([])
+
+    # Define the directory name containing the pdf's
+    # This will default to the current working directory
+    pdfDirectory = input("What folder name contains the pdf's to scrape? (defaults to the current working directory): ")
+    arguments.pdf_directory = [pdfDirectory]
+
+    # Define the directory the scraped pdf txt files should be saved
+    # This will default to '/renders'
+    renderDirectoryName = input("What folder name would you like to store the scraped text? (defaults to 'renders'): ")
+    arguments.render_directory = renderDirectoryName if renderDirectoryName else 'renders'
+
+    # Resolution of the image created from a pdf file
+    # The files do not interpret hand written or small text at 700 but its fairly quick
+    # To improve the scraped quality at the loss of scraping speed, increase the resolution by a few hundred
+    # Files will throw an exception when the render quality is too high ~900
+    # Tesseract actually works better with lower quality numbers around 200
+    resolution = input("what quality would you like the pdf's to scrape at? (defaults to 200, limit to ~600): ")
+    arguments.resolution = int(resolution) if resolution.isdigit() else 200
+
+    # Number of worker processes used to scrape the pdf's
+    # This will default to the number of cpu's on the machine
+    workers = input("How many worker processes would you like to scrape with? (defaults to the number of cpu's): ")
+    arguments.workers = int(workers) if workers.isdigit() and int(workers) > 0 else os.cpu_count()
+
+    # Adaptive resolution scrapes each page at 100 first, then scrapes only the blocks of text tesseract is not
+    # confident in again at the resolution above. Small or hand written text is kept without paying for the higher
+    # resolution on every page.
+    adaptive = input("Would you like to scrape pages at a low resolution first? (y/n, defaults to n): ")
+    arguments.adaptive = adaptive.lower().startswith('y')
+
+    # OCR backend used to scrape the pdf's
+    # 'pytesseract' starts tesseract for every page, 'tesserocr' keeps tesseract loaded in each worker (pip install
+    # tesserocr) and 'fake' returns made up text without tesseract for testing
+    ocrBackendName = input("Which OCR backend would you like to scrape with? (defaults to 'pytesseract'): ")
+    arguments.ocr_backend = ocrBackendName if ocrBackendName else 'pytesseract'
+
+    # Only messages at this level or above are printed, every message is saved to 'logs.log'.
+    # 'debug' also prints each page as it is scraped, 'error' only prints failures and 'none' prints nothing
+    verbosity = input("What level of messages would you like printed? (defaults to 'info'): ")
+    arguments.verbosity = verbosity if verbosity in customLogger.levels or verbosity == 'none' else 'info'
+
+    return arguments
+
+
+# The script is guarded so worker processes can import this file without running it
+if __name__ == '__main__':
+    # ------------------------------- #
+    # ---------- Variables ---------- #
+    # ------------------------------- #
+
+    # Define the current working directory (directory this is run from)
+    workingDirectory = os.getcwd()
+
+    # Settings are read from the command line (see getArgumentParser, python3 textScraper.py --help), or prompted for
+    # when there are no arguments
+    arguments = getArguments(sys.argv[1:]) if len(sys.argv) > 1 else getPromptedArguments()
+
+    pdfDirectories = arguments.pdf_directory
+    renderDirectoryName = arguments.render_directory
+    resolution = arguments.resolution
+    workers = arguments.workers if arguments.workers and arguments.workers > 0 else os.cpu_count()
+
+    pdfToTxt.setAdaptiveResolution({} if arguments.adaptive else None)
+    pdfToTxt.setOcrBackend(arguments.ocr_backend)
+    pdfToTxt.setPageDedup({'maximumDistance': arguments.dedup_distance} if arguments.dedup else None)
+    customLogger.setVerbosity(None if arguments.verbosity == 'none' else arguments.verbosity)
+
+    # Form templates are read from a json list of templates (see formTemplates.FormTemplate)
+    if arguments.form_templates:
+        with open(arguments.form_templates, 'r') as templatesFile:
+            pdfToTxt.setFormTemplates({'templates': json.load(templatesFile)})
+
+    # Metrics of the scrape (pages per second, the time taken by each stage, cache hits and failures) are summarised
+    # and appended to this json lines file every metricsInterval seconds and at the end of the scrape
+    metricsFileName = arguments.metrics_file
+    metricsInterval = arguments.metrics_interval
+
+    # ----------------------------- #
+    # --------- Methods ----------- #
+    # ----------------------------- #
+
+    # Scrapes a list of pdf's, returning the pdf's rendered and failures (see batchScraper.scrapePdfs). The renders
+    # are saved to the render directory, their extracts are not kept. The batch is scraped by the workers of pool when
+    # one is given.
+    def scrapePdfs(pdfPaths, pool=None):
+        return batchScraper.scrapePdfs(pdfPaths, workingDirectory, renderDirectoryName, resolution, workers,
+                                       cacheMaxBytes=arguments.cache_max_bytes,
+                                       cacheMaxAgeDays=arguments.cache_max_age_days,
+                                       collectExtracts=False, pool=pool)
+
+    # ----------------------------- #
+    # ---------- Script ----------- #
+    # ----------------------------- #
+
+    # Define the absolute path of all pdf directories
+    pdfDirectoryPaths = [os.path.join(workingDirectory, pdfDirectory) if pdfDirectory else workingDirectory
+                         for pdfDirectory in pdfDirectories]
+
+    # Store the start time of the process for logging
+    scrapeStart = datetime.now()
+
+    customLogger.log("Outputting rendered files to /" + renderDirectoryName)
+    customLogger.log("Render resolution set to " + str(resolution))
+    if pdfToTxt.adaptiveSettings:
+        customLogger.log("Scraping pages at " + str(pdfToTxt.adaptiveSettings['firstPassResolution'])
+                         + " first, then low confidence text at " + str(resolution))
+    if pdfToTxt.compiledTemplates:
+        customLogger.log("Scraping only the regions of pages matching " + str(len(pdfToTxt.compiledTemplates))
+                         + " form templates")
+    if pdfToTxt.dedupSettings:
+        customLogger.log("Skipping blank pages and reusing the text of duplicate pages")
+    customLogger.log("Scraping with " + str(workers) + " worker processes")
+    customLogger.log("Recognising text with the " + pdfToTxt.ocrBackendName + " OCR backend")
+    customLogger.startPeriodicSummary(metricsInterval, os.path.join(workingDirectory, metricsFileName))
+
+    failures = {}
+    if arguments.watch:
+        # Scrape new and changed pdf's as they arrive until stopped. Workers ignore ctrl+c so the current batch
+        # finishes, a first ctrl+c finishes the queued pdf's and a second stops after the current batch. The workers
+        # are kept for the whole watch, so they keep their OCR engines and page caches between batches.
+        with batchScraper.WorkerPool(workers, ignoreInterrupts=True) as pool:
+            folderWatcher.watchDirectories(pdfDirectoryPaths, os.path.join(workingDirectory, arguments.state_file),
+                                           lambda pdfPaths: scrapePdfs(pdfPaths, pool=pool),
+                                           arguments.recursive, arguments.interval, arguments.queue_size,
+                                           arguments.batch_size)
+    else:
+        # Define the absolute path of all pdf's in the given directories
+        pdfPaths = [pdfPath for pdfDirectoryPath in pdfDirectoryPaths
+                    for pdfPath in pdfToTxt.getPdfFileNamesFromDirectory(pdfDirectoryPath, arguments.recursive)]
+
+        customLogger.log("Beginning scrape of " + str(len(pdfPaths)) + " pdf files in '"
+                         + "', '".join(pdfDirectories) + "'")
+
+        # Scrape the pdf's, saving each render to /renders.
+        # Pdf's that fail to scrape are logged and returned as failures rather than stopping the run.
+        _, failures = scrapePdfs(pdfPaths)
+
+    customLogger.log("Completed scrape of pdf files in '" + "', '".join(pdfDirectories) + "' in "
+                     + customLogger.duration(scrapeStart))
+    customLogger.stopPeriodicSummary()
+    customLogger.writeMetrics(os.path.join(workingDirectory, metricsFileName))
+
+    # Terminate the script
+    sys.exit(1 if failures else 0)